@@ -15,6 +15,7 @@ from api.base.exceptions import InvalidQueryStringError, Conflict, JSONAPIExcept
 from api.base.settings import BULK_SETTINGS
 from api.base.utils import extend_querystring_params
 from framework.auth import core as auth_core
+from framework.mongo.utils import prefetch
 from website import settings
 from website import util as website_utils
 from website.util.sanitize import strip_html
@@ -829,6 +830,16 @@ class JSONAPIListSerializer(ser.ListSerializer):
                 self.child.to_esi_representation(item, envelope=None) for item in data
             ]
         else:
+            # Load the records referenced by every item up front
+            prefetch_fields = getattr(getattr(self.child, 'Meta', None), 'prefetch_fields', None)
+            if prefetch_fields:
+                data = list(data)
+                prefetch(data, *prefetch_fields)
+            # Let the serializer look up data of the whole page at once
+            prefetch_items = getattr(self.child, 'prefetch_items', None)
+            if prefetch_items:
+                data = list(data)
+                prefetch_items(data)
             ret = [
                 self.child.to_representation(item, envelope=envelope) for item in data
             ]
@@ -15,6 +15,7 @@ urlpatterns = [
                 url(r'^$', views.root, name='root'),
                 url(r'^applications/', include('api.applications.urls', namespace='applications')),
                 url(r'^comments/', include('api.comments.urls', namespace='comments')),
+                url(r'^copy_jobs/', include('api.copy_jobs.urls', namespace='copy_jobs')),
                 url(r'^nodes/', include('api.nodes.urls', namespace='nodes')),
                 url(r'^registrations/', include('api.registrations.urls', namespace='registrations')),
                 url(r'^metaschemas/', include('api.metaschemas.urls', namespace='metaschemas')),
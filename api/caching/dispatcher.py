@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Coalescing dispatcher for Varnish bans.
+
+Paths banned within ``VARNISH_BAN_WINDOW`` seconds of each other, which
+includes every ban of a request, are merged into as few regular expressions as
+fit in a URL. Every regular expression is sent to each Varnish server as one
+BAN request, in parallel, over keep-alive connections.
+
+Bans are added from postcommit tasks, which wait for the bans to be sent, so
+the postcommit executor of the request accounts for every ban it made.
+"""
+import collections
+import logging
+import os
+import re
+import weakref
+
+import gevent
+import urllib3
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+_REGEX_SPECIAL_CHARACTERS = re.compile(r'([.^$*+?{}\[\]\\|()])')
+
+
+def _escape(path):
+    # re.escape would also escape slashes, which Varnish receives verbatim
+    return _REGEX_SPECIAL_CHARACTERS.sub(r'\\\1', path)
+
+
+def get_ban_patterns(paths, max_length=None):
+    """Merge URL paths into regular expressions that match every URL under
+    any of them.
+
+    :param iterable paths: Paths to ban, e.g. ``/v2/nodes/abc12/``
+    :param int max_length: Maximum length of a regular expression
+    :returns: list of regular expressions
+    """
+    max_length = max_length or settings.VARNISH_BAN_MAX_URL_LENGTH
+    # A ban on a path also bans everything below it
+    kept = []
+    for path in sorted(set(paths)):
+        if not kept or not path.startswith(kept[-1]):
+            kept.append(path)
+    if len(kept) == 1:
+        return [_escape(kept[0]) + '.*']
+
+    prefix = os.path.commonprefix(kept)
+    prefix = prefix[:prefix.rfind('/') + 1]
+    patterns = []
+    alternatives = []
+    length = len(prefix) + len('().*')
+    for path in kept:
+        alternative = _escape(path[len(prefix):])
+        if alternatives and length + len(alternative) + 1 > max_length:
+            patterns.append(alternatives)
+            alternatives = []
+            length = len(prefix) + len('().*')
+        alternatives.append(alternative)
+        length += len(alternative) + 1
+    patterns.append(alternatives)
+    return [
+        '{0}({1}).*'.format(_escape(prefix), '|'.join(group))
+        for group in patterns
+    ]
+
+
+class BanDispatcher(object):
+    """Collect bans and send them to Varnish in batches.
+
+    :param list servers: Base URLs of the Varnish servers
+    :param float window: Seconds to collect bans for before sending them. If
+        0, bans are sent as soon as they are added.
+    :param float timeout: Timeout of a BAN request
+    :param int pool_size: Connections kept open to every server
+    """
+
+    def __init__(self, servers, window, timeout, pool_size):
+        self.servers = list(servers)
+        self.window = window
+        self.timeout = timeout
+        self.http = urllib3.PoolManager(num_pools=max(len(self.servers), 1), maxsize=pool_size)
+        self.counters = collections.Counter()
+        # Host header -> paths to ban
+        self._pending = collections.defaultdict(set)
+        self._pending_count = 0
+        self._flusher = None
+
+    def add(self, hostname, paths):
+        """Ban every URL under ``paths`` of the API served at ``hostname``.
+
+        :returns: Greenlet that sends the bans once the window closes, for the
+            caller to join; None if the bans were sent already
+        """
+        paths = list(paths)
+        self._pending[hostname].update(paths)
+        self._pending_count += len(paths)
+        self.counters['requested'] += len(paths)
+        if self.window <= 0:
+            self.flush()
+            return None
+        if self._flusher is None:
+            self._flusher = gevent.spawn_later(self.window, self.flush)
+        return self._flusher
+
+    def flush(self):
+        """Send the pending bans and wait for the responses."""
+        self._flusher = None
+        pending, self._pending = self._pending, collections.defaultdict(set)
+        pending_count, self._pending_count = self._pending_count, 0
+        greenlets = []
+        n_patterns = 0
+        for hostname, paths in pending.items():
+            patterns = get_ban_patterns(paths)
+            n_patterns += len(patterns)
+            for server in self.servers:
+                for pattern in patterns:
+                    greenlets.append(gevent.spawn(self._send, server, hostname, pattern))
+        self.counters['coalesced'] += pending_count - n_patterns
+        gevent.joinall(greenlets)
+
+    def _send(self, server, hostname, pattern):
+        parsed = urllib3.util.parse_url(server)
+        # The pattern is passed through as is; requests would percent-encode it
+        url = '{0}://{1}{2}'.format(parsed.scheme, parsed.netloc, pattern)
+        try:
+            response = self.http.urlopen(
+                'BAN', url,
+                headers={'Host': hostname},
+                timeout=self.timeout,
+                retries=False,
+            )
+        except Exception as ex:
+            self.counters['failed'] += 1
+            logger.error('Banning {} failed: {}'.format(url, ex))
+            return
+        if response.status >= 400:
+            self.counters['failed'] += 1
+            logger.error('Banning {} failed: {}'.format(url, response.data))
+        else:
+            self.counters['sent'] += 1
+            logger.info('Banning {} succeeded'.format(url))
+
+    def stats(self):
+        """Totals since the dispatcher was created: paths requested, paths
+        that did not need a BAN of their own, and BAN requests sent and failed.
+        """
+        return {
+            'requested': self.counters['requested'],
+            'coalesced': self.counters['coalesced'],
+            'sent': self.counters['sent'],
+            'failed': self.counters['failed'],
+            'pending': self._pending_count,
+        }
+
+
+# Greenlets are bound to the hub of the thread that spawned them
+_dispatchers = weakref.WeakKeyDictionary()
+
+
+def get_dispatcher():
+    hub = gevent.get_hub()
+    dispatcher = _dispatchers.get(hub)
+    if dispatcher is None:
+        dispatcher = BanDispatcher(
+            servers=settings.VARNISH_SERVERS,
+            window=settings.VARNISH_BAN_WINDOW,
+            timeout=settings.VARNISH_BAN_TIMEOUT,
+            pool_size=settings.VARNISH_BAN_POOL_SIZE,
+        )
+        _dispatchers[hub] = dispatcher
+    return dispatcher
@@ -61,6 +61,7 @@ class CommentSerializer(JSONAPISerializer):
 
     class Meta:
         type_ = 'comments'
+        prefetch_fields = ('user', 'node')
 
     def get_is_ham(self, obj):
         if obj.spam_status == Comment.HAM:
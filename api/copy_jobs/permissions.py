@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from rest_framework import permissions
+
+from website.models import CopyJob
+
+from api.base.utils import get_user_auth
+
+
+class IsInitiator(permissions.BasePermission):
+
+    def has_object_permission(self, request, view, obj):
+        assert isinstance(obj, CopyJob), 'obj must be a CopyJob, got {}'.format(obj)
+        auth = get_user_auth(request)
+        return auth.user is not None and obj.initiator == auth.user
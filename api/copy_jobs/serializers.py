@@ -0,0 +1,34 @@
+from rest_framework import serializers as ser
+
+from api.base.serializers import JSONAPISerializer, RelationshipField, IDField, LinksField
+
+
+class CopyJobSerializer(JSONAPISerializer):
+
+    id = IDField(source='_id', read_only=True)
+    action = ser.CharField(read_only=True)
+    status = ser.CharField(read_only=True)
+    error = ser.CharField(read_only=True)
+    total = ser.IntegerField(read_only=True, help_text='Number of nodes to copy')
+    copied = ser.IntegerField(read_only=True, help_text='Number of nodes copied so far')
+    progress = ser.FloatField(read_only=True)
+    date_created = ser.DateTimeField(read_only=True, source='datetime_initiated')
+    date_modified = ser.DateTimeField(read_only=True, source='datetime_updated')
+
+    source = RelationshipField(
+        related_view='nodes:node-detail',
+        related_view_kwargs={'node_id': '<src_node._id>'},
+    )
+
+    dst_node = RelationshipField(
+        related_view=lambda n: 'registrations:registration-detail' if getattr(n, 'is_registration', False) else 'nodes:node-detail',
+        related_view_kwargs={'node_id': '<dst_node._id>'},
+    )
+
+    links = LinksField({'self': 'get_absolute_url'})
+
+    class Meta:
+        type_ = 'copy_jobs'
+
+    def get_absolute_url(self, obj):
+        return obj.absolute_api_v2_url
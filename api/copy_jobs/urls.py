@@ -0,0 +1,7 @@
+from django.conf.urls import url
+
+from api.copy_jobs import views
+
+urlpatterns = [
+    url(r'^(?P<job_id>\w+)/$', views.CopyJobDetail.as_view(), name=views.CopyJobDetail.view_name),
+]
@@ -0,0 +1,77 @@
+from rest_framework import generics, permissions as drf_permissions
+from rest_framework.exceptions import NotFound
+
+from framework.auth.oauth_scopes import CoreScopes
+
+from website.models import CopyJob
+
+from api.base import permissions as base_permissions
+from api.base.views import JSONAPIBaseView
+from api.copy_jobs.permissions import IsInitiator
+from api.copy_jobs.serializers import CopyJobSerializer
+
+
+class CopyJobDetail(JSONAPIBaseView, generics.RetrieveAPIView):
+    """Status of a fork or registration of a project tree. *Read-only*.
+
+    Large project trees are forked and registered in the background. Poll this endpoint until `status` is
+    `SUCCESS` or `FAILURE`. Only the user who started the fork or registration can view it.
+
+    ##Copy Job Attributes
+
+    OSF Copy Job entities have the "copy_jobs" `type`.
+
+        name           type                   description
+        ----------------------------------------------------------------------------
+        action         string                 'fork' or 'register'
+        status         string                 'PENDING', 'RUNNING', 'SUCCESS' or 'FAILURE'
+        error          string                 reason for the last failure, if any
+        total          integer                number of nodes to copy
+        copied         integer                number of nodes copied so far
+        progress       float                  fraction of the nodes copied so far
+        date_created   iso8601 timestamp      timestamp that the job was started
+        date_modified  iso8601 timestamp      timestamp of the last progress update
+
+    ##Relationships
+
+    ###Source
+
+    The node being forked or registered.
+
+    ###Copy
+
+    The fork or registration of the source node, once it has been created. Its components may still be being
+    copied until `status` is `SUCCESS`.
+
+    ##Links
+
+        self: this job's detail page
+
+    ##Actions
+
+    *None*.
+
+    #This Request/Response
+    """
+    permission_classes = (
+        drf_permissions.IsAuthenticated,
+        base_permissions.TokenHasScope,
+        IsInitiator,
+    )
+
+    required_read_scopes = [CoreScopes.NODE_BASE_READ]
+    required_write_scopes = [CoreScopes.NULL]
+
+    serializer_class = CopyJobSerializer
+    view_category = 'copy_jobs'
+    view_name = 'copy-job-detail'
+
+    # overrides RetrieveAPIView
+    def get_object(self):
+        job = CopyJob.load(self.kwargs['job_id'])
+        if not job:
+            raise NotFound(
+                detail='No copy job matching that job_id could be found.'
+            )
+        self.check_object_permissions(self.request, job)
+        return job
@@ -7,7 +7,7 @@ from django.core.urlresolvers import resolve, reverse
 
 from website import settings
 from framework.auth.core import User
-from website.files.models import FileNode
+from website.files.models import File, FileNode
 from website.project.model import Comment
 from api.base.utils import absolute_reverse
 from api.base.serializers import (
@@ -184,6 +184,10 @@ class FileSerializer(JSONAPISerializer):
 
         return creat_dt and creat_dt.replace(tzinfo=pytz.utc)
 
+    def prefetch_items(self, items):
+        files = [item for item in items if item.provider == 'osfstorage' and item.is_file]
+        self.context['download_counts'] = File.get_download_counts(files)
+
     def get_extra(self, obj):
         metadata = {}
         if obj.provider == 'osfstorage' and obj.versions:
@@ -196,6 +200,12 @@ class FileSerializer(JSONAPISerializer):
             'md5': metadata.get('md5', None),
             'sha256': metadata.get('sha256', None),
         }
+        if obj.provider == 'osfstorage' and obj.is_file:
+            download_counts = self.context.get('download_counts', {})
+            if obj._id in download_counts:
+                extras['downloads'] = download_counts[obj._id]
+            else:
+                extras['downloads'] = obj.get_download_count()
         return extras
 
     def get_unread_comments_count(self, obj):
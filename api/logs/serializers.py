@@ -140,6 +140,7 @@ class NodeLogSerializer(JSONAPISerializer):
 
     class Meta:
         type_ = 'logs'
+        prefetch_fields = ('user', 'node', 'original_node')
 
     node = RelationshipField(
         related_view=lambda n: 'registrations:registration-detail' if getattr(n, 'is_registration', False) else 'nodes:node-detail',
@@ -212,6 +212,7 @@ class NodeSerializer(JSONAPISerializer):
 
     class Meta:
         type_ = 'nodes'
+        prefetch_fields = ('nodes', 'parent_node', 'root')
 
     def get_absolute_url(self, obj):
         return obj.get_absolute_url()
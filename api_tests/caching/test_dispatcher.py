@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import gevent
+import mock
+from nose.tools import *  # noqa
+
+from api.caching.dispatcher import BanDispatcher, get_ban_patterns
+from api.caching.tasks import ban_url
+
+
+class TestGetBanPatterns(unittest.TestCase):
+
+    def test_single_path(self):
+        assert_equal(get_ban_patterns(['/v2/nodes/abc12/']), ['/v2/nodes/abc12/.*'])
+
+    def test_paths_are_merged(self):
+        patterns = get_ban_patterns(['/v2/nodes/abc12/', '/v2/users/def34/', '/v2/nodes/abc12/'])
+        assert_equal(patterns, ['/v2/(nodes/abc12/|users/def34/).*'])
+
+    def test_paths_under_banned_paths_are_dropped(self):
+        patterns = get_ban_patterns(['/v2/nodes/abc12/comments/', '/v2/nodes/abc12/'])
+        assert_equal(patterns, ['/v2/nodes/abc12/.*'])
+
+    def test_special_characters_are_escaped(self):
+        assert_equal(get_ban_patterns(['/v2/nodes/a.b/']), ['/v2/nodes/a\\.b/.*'])
+
+    def test_patterns_are_split_by_length(self):
+        paths = ['/v2/nodes/{:05d}/'.format(i) for i in range(100)]
+        patterns = get_ban_patterns(paths, max_length=200)
+        assert_greater(len(patterns), 1)
+        for pattern in patterns:
+            assert_less_equal(len(pattern), 200)
+            assert_true(pattern.startswith('/v2/nodes/('))
+        assert_equal(sum(pattern.count('|') + 1 for pattern in patterns), 100)
+
+
+class TestBanDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = BanDispatcher(
+            servers=['http://varnish1:8080', 'http://varnish2:8080'],
+            window=0.01,
+            timeout=0.3,
+            pool_size=2,
+        )
+        self.urlopen = mock.patch.object(self.dispatcher.http, 'urlopen', return_value=mock.Mock(status=200)).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_bans_in_window_are_coalesced(self):
+        first = self.dispatcher.add('api.osf.io', ['/v2/nodes/abc12/'])
+        second = self.dispatcher.add('api.osf.io', ['/v2/nodes/def34/', '/v2/nodes/abc12/'])
+        assert_false(self.urlopen.called)
+        assert_is(first, second)
+        first.join()
+
+        urls = sorted(call[0][1] for call in self.urlopen.call_args_list)
+        assert_equal(urls, [
+            'http://varnish1:8080/v2/nodes/(abc12/|def34/).*',
+            'http://varnish2:8080/v2/nodes/(abc12/|def34/).*',
+        ])
+        for call in self.urlopen.call_args_list:
+            assert_equal(call[0][0], 'BAN')
+            assert_equal(call[1]['headers'], {'Host': 'api.osf.io'})
+        assert_equal(self.dispatcher.stats(), {
+            'requested': 3,
+            'coalesced': 2,
+            'sent': 2,
+            'failed': 0,
+            'pending': 0,
+        })
+
+    def test_failures_are_counted(self):
+        self.urlopen.side_effect = [Exception('refused'), mock.Mock(status=500)]
+        self.dispatcher.add('api.osf.io', ['/v2/nodes/abc12/'])
+        self.dispatcher.flush()
+        assert_equal(self.dispatcher.stats()['failed'], 2)
+        assert_equal(self.dispatcher.stats()['sent'], 0)
+
+    def test_without_window_bans_are_sent_immediately(self):
+        self.dispatcher.window = 0
+        assert_is_none(self.dispatcher.add('api.osf.io', ['/v2/nodes/abc12/']))
+        assert_equal(self.urlopen.call_count, 2)
+
+
+class TestBanUrl(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = BanDispatcher(
+            servers=['http://varnish1:8080'],
+            window=0.01,
+            timeout=0.3,
+            pool_size=2,
+        )
+        self.urlopen = mock.patch.object(self.dispatcher.http, 'urlopen', return_value=mock.Mock(status=200)).start()
+        mock.patch('api.caching.tasks.get_dispatcher', return_value=self.dispatcher).start()
+        mock.patch('api.caching.tasks.settings.ENABLE_VARNISH', True).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_bans_are_sent_before_the_task_returns(self):
+        instance = mock.Mock(absolute_api_v2_url='https://api.osf.io/v2/nodes/abc12/')
+        ban_url(instance)
+        assert_equal(self.urlopen.call_count, 1)
+        assert_equal(self.urlopen.call_args[0][1], 'http://varnish1:8080/v2/nodes/abc12/.*')
+        assert_equal(self.dispatcher.stats()['pending'], 0)
+
+    def test_bans_of_concurrent_tasks_are_coalesced(self):
+        tasks = [
+            gevent.spawn(ban_url, mock.Mock(absolute_api_v2_url='https://api.osf.io/v2/nodes/{}/'.format(_id)))
+            for _id in ('abc12', 'def34')
+        ]
+        gevent.joinall(tasks, raise_error=True)
+        assert_equal(self.urlopen.call_count, 1)
+        assert_equal(self.urlopen.call_args[0][1], 'http://varnish1:8080/v2/nodes/(abc12/|def34/).*')
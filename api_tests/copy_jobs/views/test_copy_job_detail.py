@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # noqa
+
+from tests.base import ApiTestCase
+from tests.factories import (
+    ProjectFactory,
+    RegistrationFactory,
+    AuthUserFactory
+)
+
+from website.copier import COPY_FORK, COPY_REGISTER, COPY_RUNNING, COPY_SUCCESS
+from website.copier.model import CopyJob
+from api.base.settings.defaults import API_BASE
+
+
+class TestCopyJobDetail(ApiTestCase):
+
+    def setUp(self):
+        super(TestCopyJobDetail, self).setUp()
+        self.user = AuthUserFactory()
+        self.node = ProjectFactory(creator=self.user)
+        self.job = CopyJob(
+            action=COPY_FORK,
+            status=COPY_RUNNING,
+            src_node=self.node,
+            initiator=self.user,
+            sources=[self.node._id, 'abc12', 'def34'],
+            copies={self.node._id: 'xyz56'},
+        )
+        self.job.save()
+        self.url = '/{}copy_jobs/{}/'.format(API_BASE, self.job._id)
+
+    def tearDown(self):
+        super(TestCopyJobDetail, self).tearDown()
+        CopyJob.remove()
+
+    def test_initiator_can_view_progress(self):
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.status_code, 200)
+        data = res.json['data']
+        assert_equal(data['id'], self.job._id)
+        assert_equal(data['type'], 'copy_jobs')
+        assert_equal(data['attributes']['action'], COPY_FORK)
+        assert_equal(data['attributes']['status'], COPY_RUNNING)
+        assert_equal(data['attributes']['total'], 3)
+        assert_equal(data['attributes']['copied'], 1)
+        assert_in(self.node._id, data['relationships']['source']['links']['related']['href'])
+
+    def test_running_fork_links_to_fork(self):
+        fork = ProjectFactory(creator=self.user)
+        self.job.dst_node = fork
+        self.job.save()
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.status_code, 200)
+        href = res.json['data']['relationships']['dst_node']['links']['related']['href']
+        assert_in('/nodes/{}/'.format(fork._id), href)
+
+    def test_finished_registration_links_to_registration(self):
+        registration = RegistrationFactory(creator=self.user, project=self.node)
+        self.job.action = COPY_REGISTER
+        self.job.status = COPY_SUCCESS
+        self.job.dst_node = registration
+        self.job.save()
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.status_code, 200)
+        href = res.json['data']['relationships']['dst_node']['links']['related']['href']
+        assert_in('/registrations/{}/'.format(registration._id), href)
+
+    def test_other_user_cannot_view(self):
+        res = self.app.get(self.url, auth=AuthUserFactory().auth, expect_errors=True)
+        assert_equal(res.status_code, 403)
+
+    def test_logged_out_user_cannot_view(self):
+        res = self.app.get(self.url, expect_errors=True)
+        assert_equal(res.status_code, 401)
+
+    def test_missing_job(self):
+        res = self.app.get('/{}copy_jobs/missing/'.format(API_BASE), auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 404)
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import mock
 import pytz
 from nose.tools import *  # flake8: noqa
 
@@ -15,6 +16,7 @@ from tests.factories import (
     CommentFactory
 )
 from website.addons.osfstorage import settings as osfstorage_settings
+from website.addons.osfstorage.utils import update_analytics
 from website.project.signals import contributor_removed
 from website.project.model import NodeLog
 
@@ -64,6 +66,17 @@ class TestFileView(ApiTestCase):
         assert_equal(attributes['extra']['hashes']['sha256'], None)
         assert_equal(attributes['tags'], [])
 
+    def test_get_file_download_count(self):
+        url = '/{}files/{}/'.format(API_BASE, self.file._id)
+        res = self.app.get(url, auth=self.user.auth)
+        assert_equal(res.json['data']['attributes']['extra']['downloads'], 0)
+
+        with mock.patch('framework.analytics.session') as mock_session:
+            mock_session.data = {}
+            update_analytics(self.node, self.file._id, 0)
+        res = self.app.get(url, auth=self.user.auth)
+        assert_equal(res.json['data']['attributes']['extra']['downloads'], 1)
+
     def test_file_has_comments_link(self):
         res = self.app.get('/{}files/{}/'.format(API_BASE, self.file._id), auth=self.user.auth)
         assert_equal(res.status_code, 200)
@@ -9,32 +9,26 @@ from dateutil import parser
 from framework.mongo import database
 from framework.postcommit_tasks.handlers import run_postcommit
 from framework.sessions import session
-from framework.celery_tasks import app
 
 from flask import request
 
+from website import settings
+
+from .counters import BloomFilter, counter_buffer
+
 collection = database['pagecounters']
 
-@run_postcommit(once_per_request=False, celery=True)
-@app.task(max_retries=5, default_retry_delay=60)
+@run_postcommit(once_per_request=False, critical=False)
 def increment_user_activity_counters(user_id, action, date_string, db=None):
     db = db or database  # default to local proxy
-    collection = database['useractivitycounters']
+    collection = db['useractivitycounters']
     date = parser.parse(date_string).strftime('%Y/%m/%d')
-    query = {
-        '$inc': {
-            'total': 1,
-            'date.{0}.total'.format(date): 1,
-            'action.{0}.total'.format(action): 1,
-            'action.{0}.date.{1}'.format(action, date): 1,
-        }
-    }
-    collection.update(
-        {'_id': user_id},
-        query,
-        upsert=True,
-        manipulate=False,
-    )
+    counter_buffer.increment(collection, user_id, {
+        'total': 1,
+        'date.{0}.total'.format(date): 1,
+        'action.{0}.total'.format(action): 1,
+        'action.{0}.date.{1}'.format(action, date): 1,
+    })
     return True
 
 
@@ -75,6 +69,20 @@ def build_page(rex, kwargs):
     except KeyError:
         return None
 
+def _visited_pages(key, legacy_pages=None):
+    """Return the filter of pages stored in the session under ``key``. Pages
+    of the lists sessions used to keep are carried over.
+    """
+    visited = BloomFilter(
+        settings.ANALYTICS_BLOOM_BITS,
+        settings.ANALYTICS_BLOOM_HASHES,
+        session.data.get(key),
+    )
+    for page in legacy_pages or []:
+        visited.add(page)
+    return visited
+
+
 def update_counter(page, db=None):
     """Update counters for page.
 
@@ -89,35 +97,26 @@ def update_counter(page, db=None):
 
     page = clean_page(page)
 
-    d = {'$inc': {}}
+    d = {}
 
-    visited_by_date = session.data.get('visited_by_date')
-    if not visited_by_date:
-        visited_by_date = {'date': date, 'pages': []}
+    legacy_by_date = session.data.pop('visited_by_date', None) or {}
+    if session.data.get('visited_pages_date', legacy_by_date.get('date')) != date:
+        session.data.pop('visited_pages_by_date', None)
+        legacy_by_date = {}
+    visited_by_date = _visited_pages('visited_pages_by_date', legacy_by_date.get('pages'))
+    if visited_by_date.add(page):
+        d['date.%s.unique' % date] = 1
+    session.data['visited_pages_date'] = date
+    session.data['visited_pages_by_date'] = visited_by_date.dumps()
 
-    if date == visited_by_date['date']:
-        if page not in visited_by_date['pages']:
-            d['$inc']['date.%s.unique' % date] = 1
-            visited_by_date['pages'].append(page)
-            session.data['visited_by_date'] = visited_by_date
-    else:
-        visited_by_date['date'] = date
-        visited_by_date['pages'] = []
-        d['$inc']['date.%s.unique' % date] = 1
-        visited_by_date['pages'].append(page)
-        session.data['visited_by_date'] = visited_by_date
+    d['date.%s.total' % date] = 1
 
-    d['$inc']['date.%s.total' % date] = 1
-
-    visited = session.data.get('visited')  # '/project/x/, project/y/'
-    if not visited:
-        visited = []
-    if page not in visited:
-        d['$inc']['unique'] = 1
-        visited.append(page)
-        session.data['visited'] = visited
-    d['$inc']['total'] = 1
-    collection.update({'_id': page}, d, True, False)
+    visited = _visited_pages('visited_pages', session.data.pop('visited', None))
+    if visited.add(page):
+        d['unique'] = 1
+    session.data['visited_pages'] = visited.dumps()
+    d['total'] = 1
+    counter_buffer.increment(collection, page, d)
 
 
 def update_counters(rex, db=None):
@@ -157,3 +156,28 @@ def get_basic_counters(page, db=None):
         return unique, total
     else:
         return None, None
+
+
+def bulk_get_basic_counters(pages, db=None):
+    """Get the counters of many pages with a single query.
+
+    :param list pages: Page keys, as passed to `get_basic_counters`
+    :param db: MongoDB database or `None`
+    :return: dict mapping each page that has counters to a `(unique, total)`
+        tuple. Pages that were never counted are left out.
+    """
+    db = db or database
+    cleaned = {}
+    for page in pages:
+        cleaned.setdefault(clean_page(page), []).append(page)
+    if not cleaned:
+        return {}
+    results = db['pagecounters'].find(
+        {'_id': {'$in': list(cleaned)}},
+        {'total': 1, 'unique': 1}
+    )
+    counters = {}
+    for result in results:
+        for page in cleaned[result['_id']]:
+            counters[page] = (result.get('unique', 0), result.get('total', 0))
+    return counters
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Write-behind counters and compact uniqueness tracking for analytics.
+
+Counter increments are added up in memory per document and written every
+``ANALYTICS_FLUSH_INTERVAL`` seconds, with one ``$inc`` upsert per document
+however many times it was counted. Increments not yet written are lost if the
+process dies without exiting cleanly.
+
+The pages a session has visited are remembered in a :class:`BloomFilter` of
+fixed size. A page may occasionally be taken for visited when it was not, so
+unique counts can be slightly low, but a session never grows with the number
+of pages it visits.
+"""
+import atexit
+import base64
+import collections
+import hashlib
+import logging
+import struct
+import threading
+import time
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter(object):
+    """Set membership in a fixed number of bits, with false positives but no
+    false negatives.
+
+    :param int size: Number of bits
+    :param int hashes: Number of bits set per key
+    :param str data: Bits of a filter, as returned by :meth:`dumps`
+    """
+
+    def __init__(self, size, hashes, data=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+        if data:
+            bits = bytearray(base64.b64decode(data))
+            # Filters stored with another size start over
+            if len(bits) == len(self.bits):
+                self.bits = bits
+
+    def _positions(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        first, second = struct.unpack('<QQ', hashlib.md5(key).digest())
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._positions(key))
+
+    def add(self, key):
+        """Add ``key``. Returns False if it was already present."""
+        added = False
+        for position in self._positions(key):
+            mask = 1 << position % 8
+            if not self.bits[position // 8] & mask:
+                self.bits[position // 8] |= mask
+                added = True
+        return added
+
+    def dumps(self):
+        return base64.b64encode(bytes(self.bits))
+
+
+class CounterBuffer(object):
+    """Write-behind buffer of ``$inc`` updates.
+
+    :param float interval: Seconds between writes. If 0, increments are
+        written as soon as they are added. Defaults to
+        ``settings.ANALYTICS_FLUSH_INTERVAL``.
+    """
+
+    def __init__(self, interval=None):
+        self._interval = interval
+        # (collection name, document id) -> field -> delta
+        self._pending = collections.defaultdict(collections.Counter)
+        self._collections = {}
+        self._last_flush = time.time()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def interval(self):
+        return settings.ANALYTICS_FLUSH_INTERVAL if self._interval is None else self._interval
+
+    def increment(self, collection, _id, deltas):
+        """Add ``deltas`` to the fields of document ``_id`` of ``collection``,
+        creating the document if needed.
+        """
+        with self._lock:
+            self._collections[collection.full_name] = collection
+            self._pending[(collection.full_name, _id)].update(deltas)
+            due = time.time() - self._last_flush >= self.interval
+            if not due and self._timer is None:
+                # Write increments even if nothing is counted after them
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending increments."""
+        with self._lock:
+            pending, self._pending = self._pending, collections.defaultdict(collections.Counter)
+            collections_by_name = self._collections
+            self._last_flush = time.time()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for (name, _id), deltas in pending.items():
+            try:
+                collections_by_name[name].update(
+                    {'_id': _id},
+                    {'$inc': dict(deltas)},
+                    upsert=True,
+                    manipulate=False,
+                )
+            except Exception:
+                logger.exception('Could not write counters of {} in {}'.format(_id, name))
+                with self._lock:
+                    self._pending[(name, _id)].update(deltas)
+
+
+counter_buffer = CounterBuffer()
+atexit.register(counter_buffer.flush)
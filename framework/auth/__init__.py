@@ -3,8 +3,8 @@
 import uuid
 from datetime import datetime
 
-from framework.sessions import session, create_session, Session
-from modularodm import Q
+from framework.sessions import session, create_session
+from framework.sessions.utils import remove_session
 from framework import bcrypt
 from framework.auth import signals
 from framework.auth.exceptions import DuplicateEmailError
@@ -57,7 +57,7 @@ def logout():
             del session.data[key]
         except KeyError:
             pass
-    Session.remove(Q('_id', 'eq', session._id))
+    remove_session(session)
     return True
 
 
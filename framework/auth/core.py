@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import datetime as dt
-import itertools
+import heapq
 import logging
 import re
 import urlparse
@@ -24,9 +24,12 @@ from framework.auth.exceptions import (ChangePasswordError, ExpiredTokenError, I
 from framework.bcrypt import generate_password_hash, check_password_hash
 from framework.exceptions import PermissionsError
 from framework.guid.model import GuidStoredObject
+from framework.mongo import database
+from framework.mongo.utils import prefetch
 from framework.mongo.validators import string_required
 from framework.sentry import log_exception
 from framework.sessions import session
+from framework.sessions.backends import get_backend as get_session_backend
 from framework.sessions.model import Session
 from framework.sessions.utils import remove_sessions_for_user
 
@@ -509,7 +512,7 @@ class User(GuidStoredObject, AddonModelMixin):
         except itsdangerous.BadSignature:
             return None
 
-        user_session = Session.load(token)
+        user_session = get_session_backend().load(token)
 
         if user_session is None:
             return None
@@ -1241,8 +1244,29 @@ class User(GuidStoredObject, AddonModelMixin):
         watched_node_ids = set([config.node._id for config in self.watched])
         return node._id in watched_node_ids
 
+    def _get_watched_log_queries(self, since=None):
+        '''Return one query on the nodelog collection for each watched node.
+
+        Logs are selected by id: the first 4 bytes of Mongo's ObjectId encode
+        its creation time, so no log has to be loaded to check its date.
+        '''
+        # Default since to 60 days before today if since is None
+        # timezone aware utcnow
+        utcnow = dt.datetime.utcnow().replace(tzinfo=pytz.utc)
+        since_date = since or (utcnow - dt.timedelta(days=60))
+        since_id = str(bson.ObjectId.from_datetime(since_date))
+        prefetch([self], 'watched')
+        node_ids = {config.to_storage()['node'] for config in self.watched}
+        return [
+            {'node': node_id, '_id': {'$gt': since_id}}
+            for node_id in node_ids
+            if node_id
+        ]
+
     def get_recent_log_ids(self, since=None):
-        '''Return a generator of recent logs' ids.
+        '''Return a generator of recent logs' ids, newest first. The logs of
+        every watched node are read through an indexed cursor and merged
+        lazily, so only as many logs as are consumed are fetched.
 
         :param since: A datetime specifying the oldest time to retrieve logs
         from. If ``None``, defaults to 60 days before today. Must be a tz-aware
@@ -1250,22 +1274,18 @@ class User(GuidStoredObject, AddonModelMixin):
 
         :rtype: generator of log ids (strings)
         '''
-        log_ids = []
-        # Default since to 60 days before today if since is None
-        # timezone aware utcnow
-        utcnow = dt.datetime.utcnow().replace(tzinfo=pytz.utc)
-        since_date = since or (utcnow - dt.timedelta(days=60))
-        for config in self.watched:
-            # Extract the timestamps for each log from the log_id (fast!)
-            # The first 4 bytes of Mongo's ObjectId encodes time
-            # This prevents having to load each Log Object and access their
-            # date fields
-            node_log_ids = [log.pk for log in config.node.logs
-                                   if bson.ObjectId(log.pk).generation_time > since_date and
-                                   log.pk not in log_ids]
-            # Log ids in reverse chronological order
-            log_ids = _merge_into_reversed(log_ids, node_log_ids)
-        return (l_id for l_id in log_ids)
+        cursors = [
+            (log['_id'] for log in database['nodelog'].find(query, {'_id': True}).sort('_id', -1))
+            for query in self._get_watched_log_queries(since=since)
+        ]
+        return _merge_reversed(cursors)
+
+    def get_recent_log_count(self, since=None):
+        '''Return the number of logs ``get_recent_log_ids`` yields.'''
+        return sum(
+            database['nodelog'].find(query).count()
+            for query in self._get_watched_log_queries(since=since)
+        )
 
     def get_daily_digest_log_ids(self):
         '''Return a generator of log ids generated in the past day
@@ -1461,6 +1481,25 @@ class User(GuidStoredObject, AddonModelMixin):
         """Returns number of "shared projects" (projects that both users are contributors for)"""
         return len(self.get_projects_in_common(other_user, primary_keys=True))
 
+    def get_n_projects_in_common(self, user_ids):
+        """Returns a dict mapping each of ``user_ids`` to the number of "shared projects"
+        with this user, computed with a single query.
+        """
+        from website.project.model import Node
+        counts = dict.fromkeys(user_ids, 0)
+        counts.pop(self._id, None)
+        if not counts:
+            return counts
+        shared = Node.find(
+            Q('contributors', 'eq', self._id) &
+            Q('contributors', 'in', counts.keys())
+        )
+        for node in shared:
+            for contributor_id in node.contributors._to_primary_keys():
+                if contributor_id in counts:
+                    counts[contributor_id] += 1
+        return counts
+
     def is_affiliated_with_institution(self, inst):
         return inst in self.affiliated_institutions
 
@@ -1486,7 +1525,36 @@ class User(GuidStoredObject, AddonModelMixin):
         return self.comments_viewed_timestamp.get(target_id, default_timestamp)
 
 
-def _merge_into_reversed(*iterables):
-    '''Merge multiple sorted inputs into a single output in reverse order.
+class _Descending(object):
+    '''Heap key that orders values from largest to smallest.'''
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+
+def _merge_reversed(iterables):
+    '''Lazily merge inputs that are each sorted in reverse order into a single
+    output in reverse order, dropping duplicates.
     '''
-    return sorted(itertools.chain(*iterables), reverse=True)
+    heap = []
+    for position, iterable in enumerate(iterables):
+        iterator = iter(iterable)
+        for value in iterator:
+            heap.append((_Descending(value), position, iterator))
+            break
+    heapq.heapify(heap)
+
+    last = None
+    while heap:
+        key, position, iterator = heap[0]
+        if key.value != last:
+            last = key.value
+            yield last
+        try:
+            heapq.heapreplace(heap, (_Descending(next(iterator)), position, iterator))
+        except StopIteration:
+            heapq.heappop(heap)
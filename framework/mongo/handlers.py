@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import logging
+import os
 import threading
+import time
+import weakref
 
+import greenlet
 import pymongo
+from pymongo.errors import PyMongoError
 from werkzeug.local import LocalProxy
 
 from website import settings
@@ -13,43 +19,156 @@ logger = logging.getLogger(__name__)
 
 
 class ClientPool(object):
+    """Bounded pool of MongoDB clients.
+
+    Each client has a single socket, and is held by one owner at a time so
+    that a TokuMX transaction stays on its connection. An owner is identified
+    by ``_id`` if given, otherwise by the current greenlet, which under
+    gevent is one request and otherwise one thread. The clients of owners
+    that exit without releasing them are reclaimed.
+
+    :param int min_size: Idle clients to keep regardless of ``max_idle_time``
+    :param int max_size: Maximum number of clients
+    :param float max_idle_time: Seconds after which an idle client is closed
+    :param float wait_timeout: Seconds to wait for a client when all are in
+        use, or None to wait indefinitely
+    :param float check_interval: Seconds after which an idle client is pinged
+        before it is handed out again
+    """
 
     class ExtraneousReleaseError(Exception):
         message = 'no cached connection to release'
 
+    class AcquireTimeout(Exception):
+        message = 'no client became available'
+
     @property
     def thread_id(self):
-        return threading.current_thread().ident
-
-    def __init__(self, MAX_CLIENTS=100):
-        self._max_clients = MAX_CLIENTS
-        self._cache, self._local = [], {}
-        self._sem = threading.BoundedSemaphore(MAX_CLIENTS)
+        return id(greenlet.getcurrent())
+
+    def __init__(self, min_size=None, max_size=None, max_idle_time=None, wait_timeout=None, check_interval=None):
+        self.min_size = settings.DB_POOL_MIN_SIZE if min_size is None else min_size
+        self.max_size = settings.DB_POOL_MAX_SIZE if max_size is None else max_size
+        self.max_idle_time = settings.DB_POOL_MAX_IDLE_TIME if max_idle_time is None else max_idle_time
+        self.wait_timeout = settings.DB_POOL_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+        self.check_interval = settings.DB_POOL_CHECK_INTERVAL if check_interval is None else check_interval
+        self.counters = collections.Counter()
+        self.seconds = collections.Counter()
+        self.max_wait_seconds = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Condition()
+        # (client, time released, time last checked), most recently used last
+        self._idle = collections.deque()
+        # owner id -> (client, time last checked, weak reference to owner or
+        # None if the owner was given explicitly)
+        self._local = {}
+        self._size = 0
 
     def acquire(self, _id=None):
-        _id = _id or self.thread_id
+        if self._pid != os.getpid():
+            # Sockets inherited from the parent process must not be used
+            self._reset()
+        owner = None if _id else greenlet.getcurrent()
+        _id = _id or id(owner)
+        entry = self._local.get(_id)
+        # Greenlet ids are reused, so the owner must be the same object
+        if entry is not None and (entry[2] is None or entry[2]() is owner):
+            return entry[0]
+
+        started = time.time()
+        with self._lock:
+            self._reap()
+            if not self._idle and self._size >= self.max_size:
+                self.counters['waited'] += 1
+            while not self._idle and self._size >= self.max_size:
+                remaining = None
+                if self.wait_timeout is not None:
+                    remaining = self.wait_timeout - (time.time() - started)
+                    if remaining <= 0:
+                        self.counters['timed_out'] += 1
+                        logger.error('Timed out waiting for a MongoDB client; {} in use'.format(self._size))
+                        raise ClientPool.AcquireTimeout
+                self._lock.wait(remaining)
+                self._reap()
+            if self._idle:
+                client, _, checked = self._idle.pop()
+            else:
+                client, checked = None, None
+                self._size += 1
 
-        if _id not in self._local:
-            self._sem.acquire()
-            self._local[_id] = self._get_client()
-        return self._local[_id]
+        try:
+            client, checked = self._check(client, checked)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        waited = time.time() - started
+        self.counters['acquired'] += 1
+        self.seconds['waiting'] += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self._local[_id] = (client, checked, weakref.ref(owner) if owner is not None else None)
+        return client
 
     def release(self, _id=None):
         try:
-            self._cache.append(self._local.pop(_id or self.thread_id))
-            self._sem.release()
+            client, checked, _ = self._local.pop(_id or self.thread_id)
         except KeyError:
             raise ClientPool.ExtraneousReleaseError
+        with self._lock:
+            self._idle.append((client, time.time(), checked))
+            self._evict()
+            self._lock.notify()
 
     def transfer(self, to, from_):
-        self._local[to] = self._local.pop(from_ or self.thread_id)
+        client, checked, _ = self._local.pop(from_ or self.thread_id)
+        self._local[to] = (client, checked, None)
+
+    def _reap(self):
+        """Return the clients of greenlets and threads that have exited."""
+        now = time.time()
+        for _id, (client, checked, ref) in self._local.items():
+            if ref is None:
+                continue
+            owner = ref()
+            if owner is None or owner.dead:
+                del self._local[_id]
+                self._idle.append((client, now, checked))
+                self.counters['reclaimed'] += 1
+        self._evict()
+
+    def _evict(self):
+        """Close clients that have been idle longer than ``max_idle_time``."""
+        now = time.time()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle_time:
+            client = self._idle.popleft()[0]
+            self._size -= 1
+            self.counters['evicted'] += 1
+            client.close()
+
+    def _check(self, client, checked):
+        """Return a working client: ``client`` if it responds, else a new one."""
+        now = time.time()
+        if client is not None and now - checked > self.check_interval:
+            try:
+                client.admin.command('ping')
+            except PyMongoError as error:
+                self.counters['failed_checks'] += 1
+                logger.warning('Replacing MongoDB client that failed a health check: {}'.format(error))
+                client.close()
+                client = None
+            checked = now
+        if client is None:
+            client = self._get_client()
+            checked = now
+        return client, checked
 
     def _get_client(self):
-        try:
-            return self._cache.pop(0)
-        except IndexError:
-            pass
-        logger.warning('Creating new client instance. {} instances initialized.'.format(self._max_clients - self._sem._Semaphore__value))
+        self.counters['created'] += 1
+        logger.debug('Creating new client instance. {} instances initialized.'.format(self._size))
         client = pymongo.MongoClient(settings.DB_HOST, settings.DB_PORT, max_pool_size=1)
         db = client[settings.DB_NAME]
 
@@ -57,6 +176,27 @@ class ClientPool(object):
             db.authenticate(settings.DB_USER, settings.DB_PASS)
         return client
 
+    def stats(self):
+        """Current usage and totals since the pool was created."""
+        in_use = len(self._local)
+        acquired = self.counters['acquired']
+        return {
+            'size': self._size,
+            'in_use': in_use,
+            'idle': len(self._idle),
+            'max_size': self.max_size,
+            'utilization': float(in_use) / self.max_size if self.max_size else 0.0,
+            'acquired': acquired,
+            'created': self.counters['created'],
+            'waited': self.counters['waited'],
+            'timed_out': self.counters['timed_out'],
+            'reclaimed': self.counters['reclaimed'],
+            'evicted': self.counters['evicted'],
+            'failed_checks': self.counters['failed_checks'],
+            'mean_wait_seconds': self.seconds['waiting'] / acquired if acquired else 0.0,
+            'max_wait_seconds': self.max_wait_seconds,
+        }
+
 
 CLIENT_POOL = ClientPool()
 
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import collections
 import functools
 import httplib as http
 import re
@@ -7,6 +8,7 @@ import markupsafe
 import pymongo
 from modularodm import Q
 from modularodm.query import QueryBase
+from modularodm.storedobject import StoredObject as GenericStoredObject
 from modularodm.exceptions import ValidationValueError, NoResultsFound, MultipleResultsFound
 
 from framework.exceptions import HTTPError
@@ -172,3 +174,73 @@ def paginated(model, query=None, increment=200, each=True):
             if page:
                 yield page
                 last_id = page[-1]._id
+
+
+def bulk_load(model, keys):
+    """Load the records of ``model`` with the given primary keys. Records
+    already in the request's object cache are reused; all others are fetched
+    with a single ``$in`` query and land in the cache, so later calls to
+    ``model.load`` for them don't hit the database.
+
+    :param StoredObject model: Model to load
+    :param iterable keys: Primary keys
+    :return: dict mapping primary key to record; keys without a record are
+        left out
+    """
+    keys = {key for key in keys if key is not None}
+    cached = model._object_cache.data.get(model._name, {})
+    records = {key: cached[key] for key in keys if key in cached}
+    missing = [key for key in keys if key not in records]
+    if missing:
+        for record in model.find(Q('_id', 'in', missing)):
+            records[record._primary_key] = record
+    return records
+
+
+def prefetch(objects, *field_names):
+    """Load the records referenced by the foreign fields ``field_names`` of
+    every object in ``objects``, with one query per field and referenced
+    collection, instead of one query per object when the fields are read.
+    Supports single and list ``ForeignField`` and ``AbstractForeignField``
+    fields.
+
+    Example usage: ::
+
+      logs = list(node.logs)
+      prefetch(logs, 'user', 'original_node')
+      users = [log.user for log in logs]  # served from the cache
+
+    :param list objects: Instances of the same model
+    :param str field_names: Names of foreign fields on that model
+    :return: dict mapping field name to a dict of the records it references,
+        keyed by primary key
+    """
+    objects = [obj for obj in objects if obj is not None]
+    if not objects:
+        return {name: {} for name in field_names}
+    # Read the stored references so that no referenced record is loaded
+    storage = [obj.to_storage() for obj in objects]
+
+    loaded = {}
+    for name in field_names:
+        field = objects[0]._fields[name]
+        is_list = hasattr(field, '_field_instance')
+        field = getattr(field, '_field_instance', field)
+        is_abstract = getattr(field, '_is_abstract', False)
+
+        keys_by_model = collections.defaultdict(set)
+        for data in storage:
+            refs = data.get(name) if is_list else [data.get(name)]
+            for ref in refs or []:
+                if not ref:
+                    continue
+                if is_abstract:
+                    key, schema = ref
+                    keys_by_model[GenericStoredObject.get_collection(schema)].add(key)
+                else:
+                    keys_by_model[field.base_class].add(ref)
+
+        loaded[name] = {}
+        for model, keys in keys_by_model.items():
+            loaded[name].update(bulk_load(model, keys))
+    return loaded
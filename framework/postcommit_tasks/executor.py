@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Bounded greenlet executor shared by the requests a process serves.
+
+At most ``size`` tasks run at once. A request that submits a task while the
+executor is full waits for a free slot for up to ``spawn_timeout`` seconds,
+then runs the task itself; this keeps a burst of requests from queueing an
+unbounded number of greenlets, each holding a database connection.
+"""
+import collections
+import logging
+import time
+import weakref
+
+import gevent
+from gevent import Greenlet, Timeout
+from gevent.lock import BoundedSemaphore
+from gevent.pool import Group
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PostcommitTaskTimeout(Exception):
+    pass
+
+
+class PostcommitExecutor(object):
+    """Run postcommit tasks in a bounded set of greenlets.
+
+    :param int size: Maximum number of tasks running at once
+    :param float task_timeout: Seconds a task may run before it is killed
+    :param float spawn_timeout: Seconds to wait for a free slot before running
+        a task in the caller
+    """
+
+    def __init__(self, size, task_timeout, spawn_timeout):
+        self.size = size
+        self.task_timeout = task_timeout
+        self.spawn_timeout = spawn_timeout
+        self.group = Group()
+        self._slots = BoundedSemaphore(size)
+        self._waiting = 0
+        self.counters = collections.Counter()
+        self.seconds = collections.Counter()
+        self.max_run_seconds = 0.0
+
+    def submit(self, func):
+        """Start running ``func``.
+
+        :returns: Greenlet running ``func``; it has already finished if the
+            executor was full
+        """
+        submitted = time.time()
+        self.counters['submitted'] += 1
+        self._waiting += 1
+        try:
+            has_slot = self._slots.acquire(timeout=self.spawn_timeout)
+        finally:
+            self._waiting -= 1
+        if has_slot:
+            return self.group.spawn(self._run, func, submitted, True)
+        self.counters['ran_inline'] += 1
+        greenlet = Greenlet(self._run, func, submitted, False)
+        greenlet.start()
+        greenlet.join()
+        return greenlet
+
+    def _run(self, func, submitted, has_slot):
+        started = time.time()
+        self.seconds['waiting'] += started - submitted
+        try:
+            with Timeout(self.task_timeout, PostcommitTaskTimeout(func)):
+                result = func()
+        except PostcommitTaskTimeout:
+            self.counters['timed_out'] += 1
+            logger.error('Postcommit task {!r} timed out after {}s'.format(func, self.task_timeout))
+            raise
+        except Exception:
+            self.counters['failed'] += 1
+            raise
+        else:
+            self.counters['succeeded'] += 1
+            return result
+        finally:
+            elapsed = time.time() - started
+            self.seconds['running'] += elapsed
+            self.max_run_seconds = max(self.max_run_seconds, elapsed)
+            if has_slot:
+                self._slots.release()
+
+    def stats(self):
+        """Current load and totals since the executor was created."""
+        finished = self.counters['succeeded'] + self.counters['failed'] + self.counters['timed_out']
+        return {
+            'size': self.size,
+            'running': len(self.group),
+            'waiting': self._waiting,
+            'submitted': self.counters['submitted'],
+            'succeeded': self.counters['succeeded'],
+            'failed': self.counters['failed'],
+            'timed_out': self.counters['timed_out'],
+            'ran_inline': self.counters['ran_inline'],
+            'mean_wait_seconds': self.seconds['waiting'] / finished if finished else 0.0,
+            'mean_run_seconds': self.seconds['running'] / finished if finished else 0.0,
+            'max_run_seconds': self.max_run_seconds,
+        }
+
+
+# Greenlets can only be switched to from the thread of the hub they were
+# created in, so there is one executor per hub
+_executors = weakref.WeakKeyDictionary()
+
+
+def get_executor():
+    hub = gevent.get_hub()
+    executor = _executors.get(hub)
+    if executor is None:
+        executor = PostcommitExecutor(
+            size=settings.POSTCOMMIT_POOL_SIZE,
+            task_timeout=settings.POSTCOMMIT_TASK_TIMEOUT,
+            spawn_timeout=settings.POSTCOMMIT_SPAWN_TIMEOUT,
+        )
+        _executors[hub] = executor
+    return executor
@@ -1,18 +1,18 @@
 # -*- coding: utf-8 -*-
 import functools
-import hashlib
+import itertools
 import logging
 import threading
 
-import binascii
 from collections import OrderedDict
-import os
 
+import gevent
 from celery import chain
 from framework.celery_tasks import app
 from celery.local import PromiseProxy
-from gevent.pool import Pool
+from modularodm import StoredObject
 
+from framework.postcommit_tasks.executor import get_executor
 from website import settings
 
 _local = threading.local()
@@ -36,7 +36,9 @@ def postcommit_before_request():
 def postcommit_celery_task_wrapper(queue):
     # chain.apply calls the tasks synchronously without re-enqueuing each one
     # http://stackoverflow.com/questions/34177131/how-to-solve-python-celery-error-when-using-chain-encodeerrorruntimeerrormaxi?answertab=votes#tab-top
-    chain(*queue.values()).apply()
+    # queue used to be sent as a dict of task key -> signature
+    signatures = queue.values() if isinstance(queue, dict) else queue
+    chain(*signatures).apply()
 
 def postcommit_after_request(response, base_status_error_code=500):
     if response.status_code >= base_status_error_code:
@@ -45,16 +47,19 @@ def postcommit_after_request(response, base_status_error_code=500):
         return response
     try:
         if postcommit_queue():
-            number_of_threads = 30  # one db connection per greenlet, let's share
-            pool = Pool(number_of_threads)
-            for func in postcommit_queue().values():
-                pool.spawn(func)
-            pool.join(timeout=5.0, raise_error=True)  # 5 second timeout and reraise exceptions
+            executor = get_executor()
+            greenlets = []
+            for func, critical in postcommit_queue().values():
+                greenlet = executor.submit(func)
+                if critical or settings.POSTCOMMIT_WAIT_FOR_NONCRITICAL:
+                    greenlets.append(greenlet)
+            # reraise exceptions of the tasks waited for
+            gevent.joinall(greenlets, timeout=settings.POSTCOMMIT_JOIN_TIMEOUT, raise_error=True)
 
         if postcommit_celery_queue():
             if settings.USE_CELERY:
                 # delay pushes the wrapper task into celery
-                postcommit_celery_task_wrapper.delay(postcommit_celery_queue())
+                postcommit_celery_task_wrapper.delay(postcommit_celery_queue().values())
             else:
                 for task in postcommit_celery_queue().values():
                     task()
@@ -64,28 +69,51 @@ def postcommit_after_request(response, base_status_error_code=500):
             logger.error('Post commit task queue not initialized: {}'.format(ex))
     return response
 
-def enqueue_postcommit_task(fn, args, kwargs, celery=False, once_per_request=True):
-    # make a hash of the pertinent data
-    raw = [fn.__name__, fn.__module__, args, kwargs]
-    m = hashlib.md5()
-    m.update('-'.join([x.__repr__() for x in raw]))
-    key = m.hexdigest()
+_unique_ids = itertools.count()
+
+def _get_key_part(value):
+    """Hashable stand-in for a task argument. Records are identified by their
+    model and primary key rather than by their repr.
+    """
+    if isinstance(value, StoredObject):
+        return (value._name, value._primary_key)
+    if isinstance(value, (list, tuple)):
+        return tuple(_get_key_part(each) for each in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _get_key_part(each)) for key, each in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+def get_task_key(fn, args, kwargs):
+    return (fn.__module__, fn.__name__, _get_key_part(args), _get_key_part(kwargs))
+
+def enqueue_postcommit_task(fn, args, kwargs, celery=False, once_per_request=True, critical=True):
+    """Run ``fn`` after the current request's transaction has been committed.
+
+    :param bool once_per_request: Run ``fn`` once for identical arguments
+    :param bool critical: Whether the response waits for ``fn`` to finish
+        when POSTCOMMIT_WAIT_FOR_NONCRITICAL is disabled
+    """
+    key = get_task_key(fn, args, kwargs)
 
     if not once_per_request:
-        # we want to run it once for every occurrence, add a random string
-        key = '{}:{}'.format(key, binascii.hexlify(os.urandom(8)))
+        # we want to run it once for every occurrence, make the key unique
+        key = key + (next(_unique_ids), )
 
     if celery and isinstance(fn, PromiseProxy):
         postcommit_celery_queue().update({key: fn.si(*args, **kwargs)})
     else:
-        postcommit_queue().update({key: functools.partial(fn, *args, **kwargs)})
+        postcommit_queue().update({key: (functools.partial(fn, *args, **kwargs), critical)})
 
 handlers = {
     'before_request': postcommit_before_request,
     'after_request': postcommit_after_request,
 }
 
-def run_postcommit(once_per_request=True, celery=False):
+def run_postcommit(once_per_request=True, celery=False, critical=True):
     '''
     Delays function execution until after the request's transaction has been committed.
     If you set the celery kwarg to True args and kwargs must be JSON serializable
@@ -98,6 +126,6 @@ def run_postcommit(once_per_request=True, celery=False):
             return func
         @functools.wraps(func)
         def wrapped(*args, **kwargs):
-            enqueue_postcommit_task(func, args, kwargs, celery=celery, once_per_request=once_per_request)
+            enqueue_postcommit_task(func, args, kwargs, celery=celery, once_per_request=once_per_request, critical=critical)
         return wrapped
     return wrapper
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import furl
 import urllib
 import urlparse
 import bson.objectid
 import httplib as http
-from datetime import datetime
 
 import itsdangerous
 
@@ -14,10 +14,10 @@ from werkzeug.local import LocalProxy
 from weakref import WeakKeyDictionary
 
 from framework.flask import redirect
-from framework.mongo import database
 
 from website import settings
 
+from .backends import get_backend, last_login_recorder
 from .model import Session
 from .utils import remove_session
 
@@ -99,12 +99,12 @@ def create_session(response, data=None):
     current_session = get_session()
     if current_session:
         current_session.data.update(data or {})
-        current_session.save()
+        get_backend().save(current_session)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(current_session._id)
     else:
         session_id = str(bson.objectid.ObjectId())
         session = Session(_id=session_id, data=data or {})
-        session.save()
+        get_backend().save(session)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(session_id)
         set_session(session)
     if response is not None:
@@ -113,9 +113,23 @@ def create_session(response, data=None):
 
 
 sessions = WeakKeyDictionary()
+# Session data as loaded, to tell whether it changed during the request
+loaded_data = WeakKeyDictionary()
 session = LocalProxy(get_session)
 
 
+def is_modified(session):
+    """Whether ``session`` has to be saved at the end of the request."""
+    from website.util import time as util_time
+
+    if not session._is_loaded:
+        return True
+    if session.data != loaded_data.get(request._get_current_object()):
+        return True
+    # Save unchanged sessions now and then so they are not cleared as unused
+    return util_time.throttle_period_expired(session.date_modified, settings.SESSION_TOUCH_INTERVAL)
+
+
 # Request callbacks
 # NOTE: This gets attached in website.app.init_app to ensure correct callback order
 def before_request():
@@ -164,21 +178,22 @@ def before_request():
     if cookie:
         try:
             session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
-            session = Session.load(session_id) or Session(_id=session_id)
+            session = get_backend().load(session_id) or Session(_id=session_id)
         except itsdangerous.BadData:
             return
 
         if not util_time.throttle_period_expired(session.date_created, settings.OSF_SESSION_TIMEOUT):
             if session.data.get('auth_user_id') and 'api' not in request.url:
-                database['user'].update({'_id': session.data.get('auth_user_id')}, {'$set': {'date_last_login': datetime.utcnow()}}, w=0)
+                last_login_recorder.record(session.data['auth_user_id'])
+            loaded_data[request._get_current_object()] = copy.deepcopy(session.data)
             set_session(session)
         else:
             remove_session(session)
 
 
 def after_request(response):
-    if session.data.get('auth_user_id'):
-        session.save()
+    if session.data.get('auth_user_id') and is_modified(session):
+        get_backend().save(session)
 
     # Disallow embeding in frames
     response.headers['X-Frame-Options'] = 'SAMEORIGIN'
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Storage backends for sessions.
+
+Mongo is always the source of truth. :class:`CachedSessionBackend` also keeps
+the documents of recently used sessions in memory for ``SESSION_CACHE_TTL``
+seconds. A cached session is served without reading the database for
+``SESSION_CACHE_CHECK_INTERVAL`` seconds after it was read or checked; after
+that it is only used once its stored ``date_modified`` is found unchanged. A
+session removed or saved by another process, e.g. on logout or password change,
+is therefore served for at most that long. The check reads a single date
+instead of the whole session.
+"""
+import atexit
+import copy
+import datetime
+import threading
+import time
+
+from modularodm import Q
+
+from framework.mongo import database
+from framework.utils import LRUCache
+from website import settings
+
+from .model import Session
+
+
+class MongoSessionBackend(object):
+
+    def load(self, session_id):
+        """Return the stored session with ``session_id``, or None."""
+        return Session.load(session_id)
+
+    def save(self, session):
+        session.save()
+
+    def remove(self, session):
+        Session.remove(Q('_id', 'eq', session._id))
+
+    def remove_for_user(self, user):
+        Session.remove(Q('data.auth_user_id', 'eq', user._id))
+
+
+class CachedSessionBackend(MongoSessionBackend):
+
+    def __init__(self, maxsize, ttl, check_interval=None):
+        # Session id -> (document, time the document was read or checked)
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._check_interval = check_interval
+
+    @property
+    def check_interval(self):
+        return settings.SESSION_CACHE_CHECK_INTERVAL if self._check_interval is None else self._check_interval
+
+    def _is_current(self, document):
+        stored = database[Session._name].find_one({'_id': document['_id']}, {'date_modified': True})
+        return stored is not None and stored.get('date_modified') == document.get('date_modified')
+
+    def load(self, session_id):
+        document = None
+        entry = self.cache.get(session_id)
+        if entry is not None:
+            document, checked = entry
+            now = time.time()
+            if now - checked >= self.check_interval:
+                if self._is_current(document):
+                    self.cache.set(session_id, (document, now))
+                else:
+                    self.cache.delete(session_id)
+                    document = None
+        if document is None:
+            document = database[Session._name].find_one({'_id': session_id})
+            if document is None:
+                return None
+            self.cache.set(session_id, (document, time.time()))
+        # Every request gets its own copy to modify
+        fields = {
+            key: copy.deepcopy(value)
+            for key, value in document.items()
+            if key in Session._fields
+        }
+        return Session(_is_loaded=True, **fields)
+
+    def save(self, session):
+        super(CachedSessionBackend, self).save(session)
+        # Mongo stores dates with less precision than ``date_modified`` has
+        # here, so the next load reads the session as stored
+        self.cache.delete(session._id)
+
+    def remove(self, session):
+        self.cache.delete(session._id)
+        super(CachedSessionBackend, self).remove(session)
+
+    def remove_for_user(self, user):
+        for document in database[Session._name].find({'data.auth_user_id': user._id}, {'_id': True}):
+            self.cache.delete(document['_id'])
+        super(CachedSessionBackend, self).remove_for_user(user)
+
+
+BACKENDS = {
+    'mongo': MongoSessionBackend,
+    'cached': CachedSessionBackend,
+}
+
+_backends = {}
+
+
+def get_backend():
+    """Return the backend named by ``settings.SESSION_BACKEND``."""
+    name = settings.SESSION_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        if name == 'cached':
+            backend = CachedSessionBackend(maxsize=settings.SESSION_CACHE_SIZE, ttl=settings.SESSION_CACHE_TTL)
+        else:
+            backend = BACKENDS[name]()
+        _backends[name] = backend
+    return backend
+
+
+class LastLoginRecorder(object):
+    """Write-behind buffer for ``User.date_last_login``.
+
+    A user's login date is recorded at most once per ``interval`` seconds, and
+    the users recorded in that time are written with a single update. A timer
+    writes logins that no other login follows.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = set()
+        self._written = LRUCache(maxsize=settings.SESSION_CACHE_SIZE, ttl=interval)
+        self._last_flush = time.time()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record(self, user_id):
+        if self._written.get(user_id) is not None:
+            return
+        self._written.set(user_id, True)
+        with self._lock:
+            self._pending.add(user_id)
+            due = time.time() - self._last_flush >= self.interval
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            user_ids, self._pending = list(self._pending), set()
+            self._last_flush = time.time()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if user_ids:
+            database['user'].update(
+                {'_id': {'$in': user_ids}},
+                {'$set': {'date_last_login': datetime.datetime.utcnow()}},
+                multi=True,
+                w=0,
+            )
+
+
+last_login_recorder = LastLoginRecorder(interval=settings.SESSION_LAST_LOGIN_INTERVAL)
+atexit.register(last_login_recorder.flush)
@@ -1,6 +1,4 @@
-from modularodm import Q
-
-from .model import Session
+from .backends import get_backend
 
 
 def remove_sessions_for_user(user):
@@ -8,7 +6,7 @@ def remove_sessions_for_user(user):
 
     :param User user:
     """
-    Session.remove(Q('data.auth_user_id', 'eq', user._id))
+    get_backend().remove_for_user(user)
 
 
 def remove_session(session):
@@ -18,4 +16,4 @@ def remove_session(session):
     :return:
     """
 
-    Session.remove(Q('_id', 'eq', session._id))
+    get_backend().remove(session)
@@ -1,5 +1,8 @@
 from __future__ import absolute_import
 import re
+import time
+import threading
+import collections
 
 from werkzeug.utils import secure_filename as werkzeug_secure_filename
 
@@ -28,3 +31,57 @@ def secure_filename(filename):
         pass
 
     return secure
+
+
+class LRUCache(object):
+    """A small, thread-safe, in-process least-recently-used cache.
+
+    :param int maxsize: Maximum number of entries kept before the least
+        recently used one is evicted
+    :param ttl: Optional number of seconds after which an entry expires
+    """
+
+    def __init__(self, maxsize=1000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires < time.time():
+                return default
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Remove every entry whose key satisfies `predicate`."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
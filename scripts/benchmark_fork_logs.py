@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Benchmark forking and registering projects with many logs.
+
+For every log count, a project owned by the given user is created and filled
+with fake logs. The script then times:
+
+* cloning the logs one at a time with ``NodeLog.clone_node_log``, which is
+  what fork and registration used to do
+* cloning them in batches with ``NodeLog.clone_node_logs``
+* a full ``fork_node``
+* a full ``register_node``, with the archiver disabled
+
+Run it against a development database only; the projects it creates are not
+removed. ::
+
+    python -m scripts.benchmark_fork_logs -u fred@cos.io --logs 100 1000 20000
+"""
+from __future__ import print_function, absolute_import, division
+import argparse
+import datetime
+import time
+
+from modularodm import Q
+
+from framework.auth import Auth
+from framework.mongo import ObjectId, database
+from website import settings
+from website.app import init_app
+from website import models
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark fork and registration versus log count.')
+    parser.add_argument('-u', '--user', dest='user', required=True)
+    parser.add_argument('--logs', dest='log_counts', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--skip-single', dest='skip_single', action='store_true',
+                        help='Skip timing one-at-a-time cloning, which is slow for large counts')
+    return parser.parse_args()
+
+
+def add_fake_logs(node, user, count, batch_size=1000):
+    start = datetime.datetime.utcnow() - datetime.timedelta(seconds=count)
+    batch = []
+    for i in range(count):
+        batch.append({
+            '_id': str(ObjectId()),
+            'action': models.NodeLog.FILE_ADDED,
+            'params': {'node': node._id, 'project': node._id, 'path': '/file{}'.format(i)},
+            'date': start + datetime.timedelta(seconds=i),
+            'should_hide': False,
+            'node': node._id,
+            'original_node': node._id,
+            'user': user._id,
+            'node_tree_ids': [node._id],
+            'node_is_public': node.is_public,
+        })
+        if len(batch) >= batch_size:
+            database['nodelog'].insert(batch)
+            batch = []
+    if batch:
+        database['nodelog'].insert(batch)
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    func(*args, **kwargs)
+    return time.time() - start
+
+
+def clone_one_at_a_time(node, to_node):
+    for log in node.logs:
+        log.clone_node_log(to_node._id)
+
+
+def benchmark(user, n_logs, skip_single=False):
+    auth = Auth(user)
+    project = models.Node(title='Log benchmark ({} logs)'.format(n_logs), creator=user, category='project')
+    project.save()
+    add_fake_logs(project, user, n_logs)
+    schema = models.MetaSchema.find_one(
+        Q('name', 'eq', 'Open-Ended Registration') & Q('schema_version', 'eq', 2)
+    )
+
+    results = {}
+    if not skip_single:
+        target = models.Node(title='Single clone target', creator=user, category='project')
+        target.save()
+        results['clone_node_log'] = timed(clone_one_at_a_time, project, target)
+    target = models.Node(title='Bulk clone target', creator=user, category='project')
+    target.save()
+    results['clone_node_logs'] = timed(models.NodeLog.clone_node_logs, project, target)
+    results['fork_node'] = timed(project.fork_node, auth)
+    results['register_node'] = timed(project.register_node, schema, auth, {})
+    return results
+
+
+def main():
+    args = parse_args()
+    settings.ENABLE_ARCHIVER = False
+    user = models.User.find_one(Q('username', 'eq', args.user))
+    columns = ['clone_node_log', 'clone_node_logs', 'fork_node', 'register_node']
+    print('{:>8}'.format('logs') + ''.join('{:>17}'.format(column) for column in columns))
+    for n_logs in args.log_counts:
+        results = benchmark(user, n_logs, skip_single=args.skip_single)
+        print('{:>8}'.format(n_logs) + ''.join(
+            '{:>16.2f}s'.format(results[column]) if column in results else '{:>17}'.format('-')
+            for column in columns
+        ))
+        models.Node._clear_caches()
+
+
+if __name__ == '__main__':
+    init_app(set_backends=True, routes=False)
+    main()
@@ -0,0 +1,45 @@
+"""
+Populate `node_tree_ids` and `node_is_public` on all logs from the node each
+log belongs to. Requires `ancestor_ids` to be populated on nodes first (see
+migrate_node_ancestor_ids.py).
+"""
+import sys
+import logging
+from modularodm import Q
+from website.app import init_app
+from website import models
+from scripts import utils as script_utils
+from framework.mongo.utils import paginated
+from framework.transactions.context import TokuTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_node(node, dry=True):
+    """Update the logs of `node`. Returns the number of logs matched."""
+    query = Q('node', 'eq', node._id)
+    count = models.NodeLog.find(query).count()
+    if count and not dry:
+        models.NodeLog.update(query, data={
+            'node_tree_ids': list(node.ancestor_ids) + [node._id],
+            'node_is_public': node.is_public,
+        })
+    return count
+
+
+def main(dry=True):
+    init_app(routes=False)
+    count = 0
+    for node in paginated(models.Node, increment=100):
+        with TokuTransaction():
+            count += migrate_node(node, dry=dry)
+        models.Node._clear_caches()
+        models.NodeLog._clear_caches()
+    logger.info('{} logs migrated'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry_run)
@@ -0,0 +1,53 @@
+"""
+Populate the materialized `ancestor_ids` path on all nodes. Roots are walked
+top-down so that each subtree is written with one update per parent.
+"""
+import sys
+import logging
+from modularodm import Q
+from website.app import init_app
+from website import models
+from scripts import utils as script_utils
+from framework.mongo.utils import paginated
+from framework.transactions.context import TokuTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_tree(root, dry=True):
+    """Write `ancestor_ids` for every primary descendant of `root`. Returns
+    the number of nodes whose path was updated.
+    """
+    count = 0
+    stack = [(root, [])]
+    while stack:
+        node, path = stack.pop()
+        children = node.nodes_primary
+        if list(node.ancestor_ids) != path:
+            count += 1
+            if not dry:
+                models.Node.update(Q('_id', 'eq', node._id), data={'ancestor_ids': path})
+        child_path = path + [node._id]
+        stack.extend((child, child_path) for child in children)
+    return count
+
+
+def main(dry=True):
+    init_app(routes=False)
+    roots = Q('parent_node', 'eq', None)
+    count = 0
+    for root in paginated(models.Node, query=roots, increment=100):
+        with TokuTransaction():
+            updated = migrate_tree(root, dry=dry)
+        count += updated
+        if updated:
+            logger.info('Updated ancestor_ids for {} nodes under {}'.format(updated, root._id))
+        models.Node._clear_caches()
+    logger.info('{} nodes migrated'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry_run)
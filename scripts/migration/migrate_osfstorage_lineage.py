@@ -0,0 +1,60 @@
+"""
+Populate the stored `ancestor_ids` and `materialized_path` of all OsfStorage
+file nodes. Root folders are walked top-down so that each file node is
+written at most once.
+"""
+import sys
+import logging
+from modularodm import Q
+from website.app import init_app
+from website.files.models import StoredFileNode
+from scripts import utils as script_utils
+from framework.mongo.utils import paginated
+from framework.transactions.context import TokuTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_tree(root, dry=True):
+    """Write `ancestor_ids` and `materialized_path` for `root` and every file
+    node below it. Returns the number of file nodes that were updated.
+    """
+    count = 0
+    stack = [(root, [], '/')]
+    while stack:
+        file_node, ancestor_ids, materialized_path = stack.pop()
+        if list(file_node.ancestor_ids) != ancestor_ids or file_node.materialized_path != materialized_path:
+            count += 1
+            if not dry:
+                StoredFileNode.update(
+                    Q('_id', 'eq', file_node._id),
+                    data={'ancestor_ids': ancestor_ids, 'materialized_path': materialized_path}
+                )
+        if file_node.is_file:
+            continue
+        child_ancestor_ids = ancestor_ids + [file_node._id]
+        for child in StoredFileNode.find(Q('parent', 'eq', file_node._id)):
+            child_path = materialized_path + child.name + ('' if child.is_file else '/')
+            stack.append((child, child_ancestor_ids, child_path))
+    return count
+
+
+def main(dry=True):
+    init_app(routes=False)
+    roots = Q('provider', 'eq', 'osfstorage') & Q('parent', 'eq', None)
+    count = 0
+    for root in paginated(StoredFileNode, query=roots, increment=100):
+        with TokuTransaction():
+            updated = migrate_tree(root, dry=dry)
+        count += updated
+        if updated:
+            logger.info('Updated lineage of {} file nodes under {}'.format(updated, root._id))
+        StoredFileNode._clear_caches()
+    logger.info('{} file nodes migrated'.format(count))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if not dry_run:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry_run)
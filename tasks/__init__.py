@@ -401,6 +401,19 @@ def migrate_search(delete=False, index=settings.ELASTIC_INDEX):
     from website.search_migration.migrate import migrate
     migrate(delete, index=index)
 
+@task
+def reindex_search(workers=4, delete=False, index=settings.ELASTIC_INDEX):
+    """Reindex the search-enabled models in parallel into a new index version.
+    Resumes an interrupted run.
+    """
+    from website.app import init_app
+    from website.search_migration.reindex import reindex
+    app = init_app('website.settings', set_backends=True, routes=True)
+    ctx = app.test_request_context()
+    ctx.push()
+    reindex(alias=index, workers=int(workers), delete=delete)
+    ctx.pop()
+
 @task
 def rebuild_search():
     """Delete and recreate the index for elasticsearch"""
@@ -74,8 +74,10 @@ SILENT_LOGGERS = [
     'framework.auth.core',
     'website.mails',
     'website.search_migration.migrate',
+    'website.search_migration.reindex',
     'website.util.paths',
-    'api.caching.tasks'
+    'api.caching.tasks',
+    'api.caching.dispatcher',
 ]
 for logger_name in SILENT_LOGGERS:
     logging.getLogger(logger_name).setLevel(logging.CRITICAL)
@@ -134,6 +136,15 @@ class DbTestCase(unittest.TestCase):
 
         cls._original_bcrypt_log_rounds = settings.BCRYPT_LOG_ROUNDS
         settings.BCRYPT_LOG_ROUNDS = 1
+        # Tests remove sessions straight from the database
+        cls._original_session_cache_check_interval = settings.SESSION_CACHE_CHECK_INTERVAL
+        settings.SESSION_CACHE_CHECK_INTERVAL = 0
+        # Reindexes need not wait for other processes
+        cls._original_search_dual_write_check_interval = settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL
+        settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL = 0
+        # Tests read counters straight after counting
+        cls._original_analytics_flush_interval = settings.ANALYTICS_FLUSH_INTERVAL
+        settings.ANALYTICS_FLUSH_INTERVAL = 0
 
         teardown_database(database=database_proxy._get_current_object())
         # TODO: With `database` as a `LocalProxy`, we should be able to simply
@@ -157,6 +168,9 @@ class DbTestCase(unittest.TestCase):
         settings.PIWIK_HOST = cls._original_piwik_host
         settings.ENABLE_EMAIL_SUBSCRIPTIONS = cls._original_enable_email_subscriptions
         settings.BCRYPT_LOG_ROUNDS = cls._original_bcrypt_log_rounds
+        settings.SESSION_CACHE_CHECK_INTERVAL = cls._original_session_cache_check_interval
+        settings.ANALYTICS_FLUSH_INTERVAL = cls._original_analytics_flush_interval
+        settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL = cls._original_search_dual_write_check_interval
 
 
 class   AppTestCase(unittest.TestCase):
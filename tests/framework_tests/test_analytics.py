@@ -5,12 +5,16 @@ Unit tests for analytics logic in framework/analytics/__init__.py
 
 import unittest
 
+import mock
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
 from datetime import datetime
 
+from pymongo.collection import Collection
+
 from framework import analytics, sessions
+from framework.analytics.counters import BloomFilter, CounterBuffer
 from framework.sessions import session
 
 from tests.base import OsfTestCase
@@ -75,9 +79,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}'.format(self.node, self.fid)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=self.fid)
 
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
@@ -96,9 +97,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
         assert_equal(count, (1, 1))
 
-        page = 'download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid)
-
-        session.data['visited'].append(page)
         download_file_version_(node=self.node, fid=self.fid, vid=self.vid)
 
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
@@ -116,6 +114,36 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters(page, db=self.db)
         assert_equal(count, (3, 5))
 
+    def test_update_counter_counts_pages_visited_in_legacy_sessions(self):
+        page = 'download:{0}:{1}'.format(self.node, self.fid)
+        session.data['visited'] = [page]
+        analytics.update_counter(page, db=self.db)
+        assert_equal(analytics.get_basic_counters(page, db=self.db), (0, 1))
+        assert_not_in('visited', session.data)
+
+    def test_update_counter_counts_unique_visits_per_page(self):
+        page1 = 'download:{0}:{1}'.format(self.node, 'foo')
+        page2 = 'download:{0}:{1}'.format(self.node, 'bar')
+        analytics.update_counter(page1, db=self.db)
+        analytics.update_counter(page2, db=self.db)
+        analytics.update_counter(page1, db=self.db)
+        assert_equal(analytics.get_basic_counters(page1, db=self.db), (1, 2))
+        assert_equal(analytics.get_basic_counters(page2, db=self.db), (1, 1))
+
+    def test_bulk_get_basic_counters(self):
+        collection = self.db['pagecounters']
+        collection.update({'_id': 'node:abc12'}, {'$inc': {'total': 5, 'unique': 3}}, True, False)
+        collection.update({'_id': 'download:abc12:foo_txt'}, {'$inc': {'total': 2}}, True, False)
+        counters = analytics.bulk_get_basic_counters(
+            ['node:abc12', 'download:abc12:foo.txt', 'node:def34'],
+            db=self.db
+        )
+        assert_equal(counters, {
+            'node:abc12': (3, 5),
+            'download:abc12:foo.txt': (0, 2),
+        })
+        assert_equal(analytics.bulk_get_basic_counters([], db=self.db), {})
+
     @unittest.skip('Reverted the fix for #2281. Unskip this once we use GUIDs for keys in the download counts collection')
     def test_update_counters_different_files(self):
         # Regression test for https://github.com/CenterForOpenScience/osf.io/issues/2281
@@ -133,9 +161,6 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (None, None))
 
-        page = 'download:{0}:{1}'.format(self.node, fid1)
-
-        session.data['visited'].append(page)
         download_file_(node=self.node, fid=fid1)
         download_file_(node=self.node, fid=fid2)
 
@@ -143,3 +168,47 @@ class TestUpdateCounters(UpdateCountersTestCase):
         assert_equal(count, (1, 2))
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (1, 1))
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_add(self):
+        bloom = BloomFilter(1024, 4)
+        assert_true(bloom.add('download:abc12:foo'))
+        assert_false(bloom.add('download:abc12:foo'))
+        assert_in('download:abc12:foo', bloom)
+        assert_not_in('download:abc12:bar', bloom)
+
+    def test_dumps(self):
+        bloom = BloomFilter(1024, 4)
+        bloom.add(u'node:abc12')
+        loaded = BloomFilter(1024, 4, bloom.dumps())
+        assert_in(u'node:abc12', loaded)
+        assert_equal(len(bloom.dumps()), len(BloomFilter(1024, 4).dumps()))
+
+    def test_filters_of_another_size_start_over(self):
+        bloom = BloomFilter(1024, 4)
+        bloom.add('node:abc12')
+        assert_not_in('node:abc12', BloomFilter(2048, 4, bloom.dumps()))
+
+
+class TestCounterBuffer(OsfTestCase):
+
+    def test_increments_are_added_up_per_document(self):
+        buffer = CounterBuffer(interval=60)
+        collection = self.db['pagecounters']
+        with mock.patch.object(Collection, 'update') as mock_update:
+            buffer.increment(collection, 'node:abc12', {'total': 1, 'unique': 1})
+            buffer.increment(collection, 'node:abc12', {'total': 1})
+            buffer.increment(collection, 'node:def34', {'total': 1})
+            assert_false(mock_update.called)
+            buffer.flush()
+        assert_equal(mock_update.call_count, 2)
+        updates = {call[0][0]['_id']: call[0][1] for call in mock_update.call_args_list}
+        assert_equal(updates['node:abc12'], {'$inc': {'total': 2, 'unique': 1}})
+        assert_equal(updates['node:def34'], {'$inc': {'total': 1}})
+
+    def test_flush_writes_counters(self):
+        buffer = CounterBuffer(interval=0)
+        buffer.increment(self.db['pagecounters'], 'node:abc12', {'total': 3, 'unique': 2})
+        assert_equal(analytics.get_basic_counters('node:abc12', db=self.db), (2, 3))
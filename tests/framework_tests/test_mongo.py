@@ -1,13 +1,25 @@
 """
 Tests related to functions in framework.mongo
 """
+import threading
+import time
 from unittest import TestCase
 
 from nose.tools import *  # flake8: noqa
+import gevent
+import mock
 
 from modularodm.exceptions import ValidationError, ValidationValueError
+from pymongo.errors import AutoReconnect
 
-from framework.mongo import validators
+from framework.auth import Auth, User
+from framework.mongo import StoredObject, validators
+from framework.mongo.handlers import ClientPool
+from framework.mongo.utils import bulk_load, prefetch
+from website.models import Node
+
+from tests.base import OsfTestCase
+from tests.factories import NodeFactory, ProjectFactory, UserFactory
 
 class TestValidators(TestCase):
 
@@ -62,3 +74,132 @@ class TestValidators(TestCase):
 
         with assert_raises(ValidationError):
             new_validator({'k': 'v', 'k2': 'v2'})
+
+
+class TestPrefetch(OsfTestCase):
+
+    def setUp(self):
+        super(TestPrefetch, self).setUp()
+        self.user = UserFactory()
+        self.contributor = UserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.project.add_contributor(self.contributor, auth=Auth(self.user), save=True)
+        self.component = NodeFactory(parent=self.project, creator=self.user)
+        self.linked = ProjectFactory(creator=self.user)
+        self.project.add_pointer(self.linked, auth=Auth(self.user))
+        StoredObject._clear_caches()
+
+    def test_bulk_load(self):
+        users = bulk_load(User, [self.user._id, self.contributor._id, 'nope1', None])
+        assert_equal(set(users), {self.user._id, self.contributor._id})
+        with mock.patch.object(User, 'find') as mock_find:
+            assert_equal(bulk_load(User, [self.user._id]), {self.user._id: users[self.user._id]})
+        assert_false(mock_find.called)
+
+    def test_prefetch_foreign_list(self):
+        project = Node.load(self.project._id)
+        loaded = prefetch([project], 'contributors')
+        assert_equal(set(loaded['contributors']), {self.user._id, self.contributor._id})
+        assert_in(self.contributor._id, User._object_cache.data.get(User._name, {}))
+
+    def test_prefetch_foreign_field(self):
+        logs = list(Node.load(self.project._id).logs)
+        loaded = prefetch(logs, 'user', 'original_node')
+        assert_equal(set(loaded['user']), {self.user._id})
+        assert_equal(set(loaded['original_node']), {self.project._id})
+
+    def test_prefetch_abstract_foreign_list(self):
+        project = Node.load(self.project._id)
+        loaded = prefetch([project], 'nodes')
+        assert_equal(set(loaded['nodes']), {self.component._id, project.nodes_pointer[0]._id})
+
+    def test_prefetch_nothing(self):
+        assert_equal(prefetch([], 'user'), {'user': {}})
+
+
+class TestClientPool(TestCase):
+
+    def setUp(self):
+        super(TestClientPool, self).setUp()
+        patcher = mock.patch.object(ClientPool, '_get_client', side_effect=lambda: mock.Mock())
+        self.mock_get_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_pool(self, **kwargs):
+        options = dict(min_size=0, max_size=2, max_idle_time=60, wait_timeout=0.01, check_interval=60)
+        options.update(kwargs)
+        return ClientPool(**options)
+
+    def test_released_clients_are_reused(self):
+        pool = self.make_pool()
+        client = pool.acquire()
+        assert_is(pool.acquire(), client)
+        pool.release()
+        assert_is(pool.acquire(), client)
+        assert_equal(self.mock_get_client.call_count, 1)
+        assert_equal(pool.stats()['in_use'], 1)
+
+    def test_extraneous_release(self):
+        pool = self.make_pool()
+        with assert_raises(ClientPool.ExtraneousReleaseError):
+            pool.release()
+
+    def test_acquire_times_out_when_full(self):
+        pool = self.make_pool(max_size=1)
+        pool.acquire()
+        greenlet = gevent.spawn(pool.acquire)
+        greenlet.join()
+        assert_is_instance(greenlet.exception, ClientPool.AcquireTimeout)
+        stats = pool.stats()
+        assert_equal(stats['timed_out'], 1)
+        assert_equal(stats['utilization'], 1.0)
+
+    def test_waiter_gets_released_client(self):
+        pool = self.make_pool(max_size=1, wait_timeout=1)
+        client = pool.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        thread.start()
+        time.sleep(0.05)
+        pool.release()
+        thread.join()
+        assert_equal(acquired, [client])
+        assert_equal(pool.stats()['waited'], 1)
+
+    def test_clients_of_exited_greenlets_are_reclaimed(self):
+        pool = self.make_pool(max_size=1)
+        client = gevent.spawn(pool.acquire).get()
+        assert_is(pool.acquire(), client)
+        assert_equal(pool.stats()['reclaimed'], 1)
+
+    def test_idle_clients_are_closed(self):
+        pool = self.make_pool(max_idle_time=0)
+        client = pool.acquire()
+        gevent.sleep(0.01)
+        pool.release()
+        assert_true(client.close.called)
+        assert_equal(pool.stats()['size'], 0)
+
+    def test_min_size_idle_clients_are_kept(self):
+        pool = self.make_pool(min_size=1, max_idle_time=0)
+        client = pool.acquire()
+        gevent.sleep(0.01)
+        pool.release()
+        assert_false(client.close.called)
+
+    def test_unhealthy_client_is_replaced(self):
+        pool = self.make_pool(check_interval=0)
+        client = pool.acquire()
+        pool.release()
+        client.admin.command.side_effect = AutoReconnect
+        gevent.sleep(0.01)
+        assert_is_not(pool.acquire(), client)
+        assert_true(client.close.called)
+        assert_equal(pool.stats()['failed_checks'], 1)
+
+    def test_clients_are_not_shared_with_forked_processes(self):
+        pool = self.make_pool()
+        client = pool.acquire()
+        pool.release()
+        with mock.patch('framework.mongo.handlers.os.getpid', return_value=-1):
+            assert_is_not(pool.acquire(), client)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import gevent
+import mock
+from nose.tools import *  # noqa PEP8 asserts
+
+from framework.postcommit_tasks import handlers
+from framework.postcommit_tasks.executor import PostcommitExecutor, PostcommitTaskTimeout
+from website import settings
+
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+
+def noop(*args, **kwargs):
+    pass
+
+
+class TestPostcommitExecutor(unittest.TestCase):
+
+    def test_runs_tasks(self):
+        executor = PostcommitExecutor(size=2, task_timeout=1, spawn_timeout=1)
+        greenlets = [executor.submit(lambda: 42) for _ in range(3)]
+        gevent.joinall(greenlets)
+        assert_equal([greenlet.value for greenlet in greenlets], [42, 42, 42])
+        stats = executor.stats()
+        assert_equal(stats['submitted'], 3)
+        assert_equal(stats['succeeded'], 3)
+        assert_equal(stats['running'], 0)
+
+    def test_runs_task_in_caller_when_full(self):
+        executor = PostcommitExecutor(size=1, task_timeout=1, spawn_timeout=0.01)
+        blocker = executor.submit(lambda: gevent.sleep(0.2))
+        inline = executor.submit(lambda: 'done')
+        # The second task finished before submit returned
+        assert_true(inline.ready())
+        assert_equal(inline.value, 'done')
+        assert_false(blocker.ready())
+        assert_equal(executor.stats()['ran_inline'], 1)
+        blocker.join()
+
+    def test_kills_slow_tasks(self):
+        executor = PostcommitExecutor(size=1, task_timeout=0.01, spawn_timeout=1)
+        greenlet = executor.submit(lambda: gevent.sleep(1))
+        greenlet.join()
+        assert_is_instance(greenlet.exception, PostcommitTaskTimeout)
+        assert_equal(executor.stats()['timed_out'], 1)
+        # The slot is freed
+        assert_equal(executor.submit(lambda: 1).get(), 1)
+
+    def test_counts_failures(self):
+        executor = PostcommitExecutor(size=1, task_timeout=1, spawn_timeout=1)
+        greenlet = executor.submit(lambda: 1 / 0)
+        greenlet.join()
+        assert_is_instance(greenlet.exception, ZeroDivisionError)
+        assert_equal(executor.stats()['failed'], 1)
+
+
+class TestEnqueuePostcommitTask(OsfTestCase):
+
+    def setUp(self):
+        super(TestEnqueuePostcommitTask, self).setUp()
+        handlers.postcommit_before_request()
+
+    def test_records_are_deduplicated_by_primary_key(self):
+        node = ProjectFactory()
+        handlers.enqueue_postcommit_task(noop, (node, ), {})
+        handlers.enqueue_postcommit_task(noop, (node.load(node._id), ), {})
+        assert_equal(len(handlers.postcommit_queue()), 1)
+        handlers.enqueue_postcommit_task(noop, (ProjectFactory(), ), {})
+        assert_equal(len(handlers.postcommit_queue()), 2)
+
+    def test_unhashable_arguments(self):
+        handlers.enqueue_postcommit_task(noop, ([1, {'a': [2]}], ), {'b': {3}})
+        handlers.enqueue_postcommit_task(noop, ([1, {'a': [2]}], ), {'b': {3}})
+        assert_equal(len(handlers.postcommit_queue()), 1)
+
+    def test_not_once_per_request(self):
+        handlers.enqueue_postcommit_task(noop, (1, ), {}, once_per_request=False)
+        handlers.enqueue_postcommit_task(noop, (1, ), {}, once_per_request=False)
+        assert_equal(len(handlers.postcommit_queue()), 2)
+
+    def test_response_does_not_wait_for_noncritical_tasks(self):
+        finished = []
+
+        def slow():
+            gevent.sleep(0.05)
+            finished.append(True)
+
+        handlers.enqueue_postcommit_task(slow, (), {}, critical=False)
+        with mock.patch.object(settings, 'POSTCOMMIT_WAIT_FOR_NONCRITICAL', False):
+            handlers.postcommit_after_request(mock.Mock(status_code=200))
+        assert_equal(finished, [])
+        gevent.sleep(0.1)
+        assert_equal(finished, [True])
+
+    def test_response_waits_for_critical_tasks(self):
+        finished = []
+
+        def slow():
+            gevent.sleep(0.05)
+            finished.append(True)
+
+        handlers.enqueue_postcommit_task(slow, (), {})
+        with mock.patch.object(settings, 'POSTCOMMIT_WAIT_FOR_NONCRITICAL', False):
+            handlers.postcommit_after_request(mock.Mock(status_code=200))
+        assert_equal(finished, [True])
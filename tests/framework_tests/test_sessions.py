@@ -1,11 +1,18 @@
+import datetime
+
+import mock
 from nose.tools import *
+from pymongo.collection import Collection
 
-from framework.sessions import utils
+from framework.mongo import database
+from framework.sessions import backends, utils
 from tests import factories
-from tests.base import DbTestCase
-from tests.factories import SessionFactory
+from tests.base import DbTestCase, OsfTestCase
+from tests.factories import AuthUserFactory, SessionFactory
+from website import settings
 from website.models import User
 from website.models import Session
+from website.util import web_url_for
 
 
 class SessionUtilsTestCase(DbTestCase):
@@ -49,3 +56,145 @@ class SessionUtilsTestCase(DbTestCase):
         assert_equal(1, Session.find().count())
         utils.remove_session(session)
         assert_equal(0, Session.find().count())
+
+
+class TestCachedSessionBackend(DbTestCase):
+
+    def setUp(self):
+        super(TestCachedSessionBackend, self).setUp()
+        self.backend = backends.CachedSessionBackend(maxsize=10, ttl=60, check_interval=0)
+        self.session = SessionFactory(user=factories.UserFactory())
+
+    def tearDown(self):
+        super(TestCachedSessionBackend, self).tearDown()
+        User.remove()
+        Session.remove()
+
+    def test_load_is_cached(self):
+        loaded = self.backend.load(self.session._id)
+        assert_equal(loaded.data, self.session.data)
+        stored = database['session'].find_one({'_id': self.session._id}, {'date_modified': True})
+        with mock.patch.object(Collection, 'find_one', return_value=stored) as mock_find_one:
+            cached = self.backend.load(self.session._id)
+        # Only the date of the stored session is read
+        assert_equal(mock_find_one.call_count, 1)
+        assert_equal(mock_find_one.call_args[0][1], {'date_modified': True})
+        assert_equal(cached.data, self.session.data)
+        # Changes to one copy do not leak into the cache
+        cached.data['auth_user_id'] = 'abc12'
+        assert_equal(self.backend.load(self.session._id).data, self.session.data)
+
+    def test_recently_checked_session_is_not_read(self):
+        backend = backends.CachedSessionBackend(maxsize=10, ttl=60, check_interval=60)
+        backend.load(self.session._id)
+        with mock.patch.object(Collection, 'find_one') as mock_find_one:
+            cached = backend.load(self.session._id)
+        assert_false(mock_find_one.called)
+        assert_equal(cached.data, self.session.data)
+
+    def test_session_is_checked_after_interval(self):
+        backend = backends.CachedSessionBackend(maxsize=10, ttl=60, check_interval=60)
+        with mock.patch('framework.sessions.backends.time.time', return_value=1000):
+            backend.load(self.session._id)
+        database['session'].remove({'_id': self.session._id})
+        with mock.patch('framework.sessions.backends.time.time', return_value=1030):
+            assert_is_not_none(backend.load(self.session._id))
+        with mock.patch('framework.sessions.backends.time.time', return_value=1060):
+            assert_is_none(backend.load(self.session._id))
+
+    def test_missing_session(self):
+        assert_is_none(self.backend.load('nope'))
+
+    def test_save_updates_cache(self):
+        loaded = self.backend.load(self.session._id)
+        loaded.data['foo'] = 'bar'
+        self.backend.save(loaded)
+        assert_equal(self.backend.load(self.session._id).data['foo'], 'bar')
+        assert_equal(Session.load(self.session._id).data['foo'], 'bar')
+
+    def test_session_removed_by_another_process_is_not_served(self):
+        self.backend.load(self.session._id)
+        database['session'].remove({'_id': self.session._id})
+        assert_is_none(self.backend.load(self.session._id))
+
+    def test_session_saved_by_another_process_is_reloaded(self):
+        self.backend.load(self.session._id)
+        database['session'].update(
+            {'_id': self.session._id},
+            {'$set': {
+                'data.foo': 'bar',
+                'date_modified': datetime.datetime.utcnow() + datetime.timedelta(seconds=1),
+            }}
+        )
+        assert_equal(self.backend.load(self.session._id).data['foo'], 'bar')
+
+    def test_remove_invalidates_cache(self):
+        self.backend.load(self.session._id)
+        self.backend.remove(self.session)
+        assert_is_none(self.backend.load(self.session._id))
+
+    def test_remove_for_user_invalidates_cache(self):
+        self.backend.load(self.session._id)
+        self.backend.remove_for_user(User.load(self.session.data['auth_user_id']))
+        assert_is_none(self.backend.load(self.session._id))
+        assert_equal(Session.find().count(), 0)
+
+
+class TestLastLoginRecorder(DbTestCase):
+
+    def tearDown(self):
+        super(TestLastLoginRecorder, self).tearDown()
+        User.remove()
+
+    def test_logins_are_throttled_and_batched(self):
+        users = [factories.UserFactory(date_last_login=None) for _ in range(3)]
+        recorder = backends.LastLoginRecorder(interval=60)
+        with mock.patch.object(Collection, 'update') as mock_update:
+            for user in users:
+                recorder.record(user._id)
+                recorder.record(user._id)
+            assert_false(mock_update.called)
+            recorder.flush()
+        assert_equal(mock_update.call_count, 1)
+        query = mock_update.call_args[0][0]
+        assert_equal(set(query['_id']['$in']), {user._id for user in users})
+
+    def test_pending_logins_are_written_by_timer(self):
+        user = factories.UserFactory(date_last_login=None)
+        recorder = backends.LastLoginRecorder(interval=60)
+        with mock.patch('threading.Timer') as mock_timer:
+            recorder.record(user._id)
+        mock_timer.assert_called_once_with(60, recorder.flush)
+        # The timer fires flush once the interval has passed
+        mock_timer.call_args[0][1]()
+        user.reload()
+        assert_is_not_none(user.date_last_login)
+
+    def test_flush_writes_date_last_login(self):
+        user = factories.UserFactory(date_last_login=None)
+        recorder = backends.LastLoginRecorder(interval=0)
+        recorder.record(user._id)
+        user.reload()
+        assert_is_not_none(user.date_last_login)
+
+
+class TestSessionHooks(OsfTestCase):
+
+    def setUp(self):
+        super(TestSessionHooks, self).setUp()
+        self.user = AuthUserFactory()
+        self.app.set_cookie(settings.COOKIE_NAME, str(self.user.get_or_create_cookie()))
+
+    @mock.patch.object(backends.MongoSessionBackend, 'save')
+    def test_unchanged_session_is_not_saved(self, mock_save):
+        self.app.get(web_url_for('dashboard'))
+        assert_false(mock_save.called)
+
+    @mock.patch.object(backends.MongoSessionBackend, 'save')
+    def test_unchanged_session_is_saved_after_touch_interval(self, mock_save):
+        database['session'].update(
+            {'data.auth_user_id': self.user._id},
+            {'$set': {'date_modified': datetime.datetime.utcnow() - datetime.timedelta(days=2)}},
+        )
+        self.app.get(web_url_for('dashboard'))
+        assert_true(mock_save.called)
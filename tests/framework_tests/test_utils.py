@@ -1,3 +1,4 @@
+import mock
 import unittest  # noqa
 from nose.tools import *  # noqa
 
@@ -8,6 +9,7 @@ from tests import factories
 
 from framework.mongo.utils import get_or_http_error, autoload
 from framework.exceptions import HTTPError
+from framework.utils import LRUCache
 
 from website.models import Node
 
@@ -52,3 +54,42 @@ class MongoUtilsTestCase(DbTestCase):
         wrapped = autoload(Node, 'node_id', 'node', fn)
         found = wrapped(node_id=target._id)
         assert_equal(found, target)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        assert_equal(cache.get('a'), 1)
+        assert_is_none(cache.get('b'))
+        assert_equal(cache.get('b', 2), 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert_equal(cache.get('a'), 1)
+        assert_is_none(cache.get('b'))
+        assert_equal(cache.get('c'), 3)
+        assert_equal(len(cache), 2)
+
+    def test_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=10)
+        with mock.patch('framework.utils.time.time', return_value=100):
+            cache.set('a', 1)
+        with mock.patch('framework.utils.time.time', return_value=105):
+            assert_equal(cache.get('a'), 1)
+        with mock.patch('framework.utils.time.time', return_value=111):
+            assert_is_none(cache.get('a'))
+
+    def test_delete_where(self):
+        cache = LRUCache()
+        cache.set(('u1', 'n1'), 1)
+        cache.set(('u2', 'n1'), 2)
+        cache.set(('u1', 'n2'), 3)
+        cache.delete_where(lambda key: key[1] == 'n1')
+        assert_equal(len(cache), 1)
+        assert_equal(cache.get(('u1', 'n2')), 3)
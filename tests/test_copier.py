@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import mock
+from nose.tools import *  # noqa PEP8 asserts
+
+from framework.auth import Auth
+from framework.exceptions import PermissionsError
+from framework.mongo import database
+
+from website import settings
+from website.copier import COPY_FORK, COPY_REGISTER, COPY_PENDING, COPY_SUCCESS, COPY_FAILURE
+from website.copier import utils as copier_utils
+from website.copier.model import CopyJob
+from website.copier.tasks import copy_node, copy_node_tree
+from website.exceptions import NodeStateError
+from website.project.model import Node
+
+from tests.base import OsfTestCase, get_default_metaschema
+from tests.factories import (
+    AuthUserFactory,
+    DraftRegistrationFactory,
+    NodeFactory,
+    ProjectFactory,
+)
+
+
+class CopierTestCase(OsfTestCase):
+
+    def setUp(self):
+        super(CopierTestCase, self).setUp()
+        self.user = AuthUserFactory()
+        self.auth = Auth(self.user)
+        self.project = ProjectFactory(creator=self.user, title='Project')
+        self.component = NodeFactory(creator=self.user, parent=self.project, title='Component')
+        self.grandchild = NodeFactory(creator=self.user, parent=self.component, title='Grandchild')
+        self.sibling = NodeFactory(creator=self.user, parent=self.project, title='Sibling')
+
+
+class TestGetCopySources(CopierTestCase):
+
+    def test_parents_come_before_children(self):
+        assert_equal(
+            copier_utils.get_copy_sources(self.project),
+            [self.project._id, self.component._id, self.sibling._id, self.grandchild._id]
+        )
+
+    def test_deleted_nodes_are_skipped(self):
+        self.component.is_deleted = True
+        self.component.save()
+        assert_equal(
+            copier_utils.get_copy_sources(self.project),
+            [self.project._id, self.sibling._id]
+        )
+
+    def test_unreadable_nodes_are_skipped_with_their_children(self):
+        other = AuthUserFactory()
+        self.project.is_public = True
+        self.project.save()
+        assert_equal(
+            copier_utils.get_copy_sources(self.project, user=other),
+            [self.project._id]
+        )
+
+
+class TestShouldCopyAsync(CopierTestCase):
+
+    def test_small_tree(self):
+        with mock.patch.object(settings, 'COPY_ASYNC_MIN_NODES', 5):
+            assert_false(copier_utils.should_copy_async(self.project))
+
+    def test_large_tree(self):
+        with mock.patch.object(settings, 'COPY_ASYNC_MIN_NODES', 4):
+            assert_true(copier_utils.should_copy_async(self.project))
+
+
+class TestForkAsync(CopierTestCase):
+
+    def test_fork_tree(self):
+        pointed = ProjectFactory(creator=self.user)
+        self.project.add_pointer(pointed, auth=self.auth)
+        job = copier_utils.fork_async(self.project, self.auth)
+        job.reload()
+
+        assert_equal(job.status, COPY_SUCCESS)
+        assert_equal(job.copied, 4)
+        assert_equal(job.progress, 1.0)
+        fork = job.dst_node
+        assert_equal(fork.title, 'Fork of Project')
+        assert_true(fork.is_fork)
+        assert_equal(fork.forked_from, self.project)
+        assert_equal([node.title for node in fork.nodes_primary], ['Component', 'Sibling'])
+        assert_equal([pointer.node for pointer in fork.nodes_pointer], [pointed])
+
+        component = fork.nodes_primary[0]
+        assert_equal(component.forked_from, self.component)
+        assert_equal(component.parent_node, fork)
+        assert_equal(component.root, fork)
+        grandchild = component.nodes_primary[0]
+        assert_equal(grandchild.forked_from, self.grandchild)
+        assert_equal(grandchild.root, fork)
+        assert_equal(list(grandchild.ancestor_ids), [fork._id, component._id])
+
+    def test_cannot_fork_unreadable_node(self):
+        with assert_raises(PermissionsError):
+            copier_utils.fork_async(self.project, Auth(AuthUserFactory()))
+        assert_equal(CopyJob.find().count(), 0)
+
+    def test_resumes_after_copied_nodes(self):
+        job = CopyJob(
+            action=COPY_FORK,
+            src_node=self.project,
+            initiator=self.user,
+            sources=copier_utils.get_copy_sources(self.project, user=self.user),
+        )
+        job.save()
+        fork = copy_node(job, self.project, self.auth)
+
+        copy_node_tree(job._id)
+        job.reload()
+
+        assert_equal(job.status, COPY_SUCCESS)
+        assert_equal(job.dst_node, fork)
+        assert_equal(len(self.project.forks), 1)
+        assert_equal(len(fork.nodes_primary), 2)
+
+    def test_failure_is_recorded(self):
+        job = CopyJob(
+            action=COPY_FORK,
+            src_node=self.project,
+            initiator=AuthUserFactory(),
+            sources=[self.project._id],
+        )
+        job.save()
+        with assert_raises(PermissionsError):
+            copy_node_tree(job._id)
+        job.reload()
+        assert_equal(job.status, COPY_FAILURE)
+        assert_true(job.error)
+
+    def test_copies_are_deleted_when_job_fails(self):
+        job = CopyJob(
+            action=COPY_FORK,
+            src_node=self.project,
+            initiator=self.user,
+            sources=[self.project._id, self.component._id, ProjectFactory()._id],
+        )
+        job.save()
+        with assert_raises(PermissionsError):
+            copy_node_tree(job._id)
+        job.reload()
+        assert_equal(job.status, COPY_FAILURE)
+        assert_equal(len(job.copies), 2)
+        for copy_id in job.copies.values():
+            assert_true(Node.load(copy_id).is_deleted)
+
+    def test_finished_jobs_are_not_run_again(self):
+        job = CopyJob(
+            action=COPY_FORK,
+            src_node=self.project,
+            initiator=self.user,
+            status=COPY_SUCCESS,
+            sources=[self.project._id],
+        )
+        job.save()
+        copy_node_tree(job._id)
+        assert_equal(len(self.project.forks), 0)
+
+
+class TestRegisterDraftAsync(CopierTestCase):
+
+    def setUp(self):
+        super(TestRegisterDraftAsync, self).setUp()
+        self.draft = DraftRegistrationFactory(
+            branched_from=self.project,
+            initiator=self.user,
+            registration_schema=get_default_metaschema(),
+        )
+
+    @mock.patch('framework.celery_tasks.handlers.enqueue_task')
+    def test_register_tree(self, mock_enqueue):
+        job = copier_utils.register_draft_async(self.draft, self.auth)
+        job.reload()
+        self.draft.reload()
+
+        assert_equal(job.status, COPY_SUCCESS)
+        registration = job.dst_node
+        assert_true(registration.is_registration)
+        assert_equal(registration.registered_from, self.project)
+        assert_equal(self.draft.registered_node, registration)
+        assert_is_not_none(registration.registration_approval)
+        assert_equal([node.title for node in registration.nodes_primary], ['Component', 'Sibling'])
+        component = registration.nodes_primary[0]
+        assert_equal(component.root, registration)
+        assert_true(component.nodes_primary[0].is_registration)
+        # Archiving starts once, from the top-level registration
+        assert_equal(mock_enqueue.call_count, 1)
+
+    @mock.patch('framework.celery_tasks.handlers.enqueue_task')
+    def test_registrations_of_public_tree_are_private(self, mock_enqueue):
+        for node in (self.project, self.component, self.grandchild, self.sibling):
+            node.is_public = True
+            node.save()
+        with mock.patch.object(settings, 'COPY_ASYNC_MIN_NODES', 2):
+            assert_true(copier_utils.should_copy_async(self.project))
+            job = copier_utils.register_draft_async(self.draft, self.auth)
+        job.reload()
+
+        assert_equal(job.status, COPY_SUCCESS)
+        assert_equal(len(job.copies), 4)
+        for copy_id in job.copies.values():
+            stored = database['node'].find_one({'_id': copy_id})
+            assert_false(stored['is_public'])
+
+    def test_cannot_register_draft_twice(self):
+        CopyJob(
+            action=COPY_REGISTER,
+            src_node=self.project,
+            initiator=self.user,
+            draft=self.draft,
+            status=COPY_PENDING,
+        ).save()
+        with assert_raises(NodeStateError):
+            copier_utils.register_draft_async(self.draft, self.auth)
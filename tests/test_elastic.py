@@ -8,13 +8,15 @@ from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import mock
 from modularodm import Q
 
-from framework.auth.core import Auth
+from framework.auth.core import Auth, User
+from framework.mongo import database
 from website import settings
 import website.search.search as search
-from website.search import elastic_search
+from website.search import documents, elastic_search
 from website.search.util import build_query
+from website.search_migration import reindex
 from website.search_migration.migrate import migrate
-from website.models import Retraction, NodeLicense, Tag
+from website.models import Node, Retraction, NodeLicense, Tag
 
 from tests.base import OsfTestCase
 from tests.test_features import requires_search
@@ -214,6 +216,175 @@ class TestProject(SearchTestCase):
         assert_equal(len(docs), 1)
 
 
+@requires_search
+class TestSearchRequests(SearchTestCase):
+
+    def setUp(self):
+        super(TestSearchRequests, self).setUp()
+        elastic_search._search_cache.clear()
+        self.project = ProjectFactory(title='Killer Queen', is_public=True)
+
+    def test_search_is_one_request(self):
+        es = elastic_search.es
+        with mock.patch.object(es, 'msearch', wraps=es.msearch) as mock_msearch:
+            with mock.patch.object(es, 'search') as mock_search:
+                results = query(self.project.title)
+        assert_equal(mock_msearch.call_count, 1)
+        assert_false(mock_search.called)
+        assert_equal(len(results['results']), 1)
+        assert_equal(results['counts']['project'], 1)
+        assert_in('licenses', results['aggs'])
+
+    def test_search_does_not_modify_query(self):
+        original = build_query(self.project.title)
+        search_query = build_query(self.project.title)
+        search.search(search_query, index=elastic_search.INDEX)
+        assert_equal(search_query, original)
+
+    def test_cached_search(self):
+        es = elastic_search.es
+        with mock.patch.object(es, 'msearch', wraps=es.msearch) as mock_msearch:
+            first = search.search(build_query(self.project.title), index=elastic_search.INDEX, cache=True)
+            second = search.search(build_query(self.project.title), index=elastic_search.INDEX, cache=True)
+        assert_equal(mock_msearch.call_count, 1)
+        assert_equal(first['results'], second['results'])
+
+    def test_uncached_search(self):
+        es = elastic_search.es
+        with mock.patch.object(es, 'msearch', wraps=es.msearch) as mock_msearch:
+            query(self.project.title)
+            query(self.project.title)
+        assert_equal(mock_msearch.call_count, 2)
+
+
+@requires_search
+class TestIndexingPipeline(SearchTestCase):
+
+    def test_later_writes_replace_earlier_ones(self):
+        pipeline = elastic_search.IndexingPipeline()
+        pipeline.index(TEST_INDEX, 'project', 'abc12', {'title': 'old'})
+        pipeline.index(TEST_INDEX, 'project', 'abc12', {'title': 'new'})
+        pipeline.delete(TEST_INDEX, 'file', 'def34')
+        assert_equal(len(pipeline), 2)
+        pipeline.delete(TEST_INDEX, 'project', 'abc12')
+        assert_equal(len(pipeline), 2)
+        assert_equal(pipeline._actions.values()[-1]['_op_type'], 'delete')
+
+    def test_update_merges_into_pending_index(self):
+        pipeline = elastic_search.IndexingPipeline()
+        pipeline.index(TEST_INDEX, 'project', 'abc12', {'title': 'Q', 'contributors': []})
+        pipeline.update(TEST_INDEX, 'project', 'abc12', {'contributors': [{'fullname': 'Brian May'}]})
+        assert_equal(len(pipeline), 1)
+        action = pipeline._actions.values()[0]
+        assert_equal(action['_op_type'], 'index')
+        assert_equal(action['_source']['title'], 'Q')
+        assert_equal(action['_source']['contributors'], [{'fullname': 'Brian May'}])
+
+    def test_flushes_when_chunk_is_full(self):
+        pipeline = elastic_search.IndexingPipeline(chunk_size=2)
+        with mock.patch.object(pipeline, 'flush') as mock_flush:
+            pipeline.index(TEST_INDEX, 'user', 'abc12', {})
+            assert_false(mock_flush.called)
+            pipeline.index(TEST_INDEX, 'user', 'def34', {})
+            assert_true(mock_flush.called)
+
+    def test_bulk_indexing_buffers_until_exit(self):
+        user = UserFactory(fullname='Freddie Mercury')
+        with mock.patch.object(elastic_search.es, 'index') as mock_index:
+            with search.bulk_indexing(refresh=True) as pipeline:
+                search.update_user(user, index=TEST_INDEX)
+                assert_equal(len(pipeline), 1)
+        assert_false(mock_index.called)
+        assert_equal(pipeline.succeeded, 1)
+        docs = query_user(user.fullname)['results']
+        assert_equal(len(docs), 1)
+
+    def test_failures_are_reported(self):
+        failed = {'index': {'_id': 'abc12', 'status': 400, 'error': 'MapperParsingException'}}
+        missing = {'delete': {'_id': 'def34', 'status': 404, 'found': False}}
+        with mock.patch('website.search.elastic_search.helpers.streaming_bulk') as mock_bulk:
+            mock_bulk.return_value = iter([(False, failed), (False, missing)])
+            pipeline = elastic_search.IndexingPipeline()
+            pipeline.index(TEST_INDEX, 'project', 'abc12', {})
+            pipeline.delete(TEST_INDEX, 'project', 'def34')
+            pipeline.flush()
+        assert_equal(pipeline.failures, [failed])
+        assert_equal(pipeline.succeeded, 1)
+
+    def test_bulk_update_search(self):
+        project = ProjectFactory(title='Bohemian', is_public=True)
+        component = NodeFactory(title='Rhapsody', parent=project, is_public=True)
+        with mock.patch('website.search.elastic_search.helpers.streaming_bulk') as mock_bulk:
+            mock_bulk.return_value = iter([])
+            Node.bulk_update_search([project, component], index=TEST_INDEX)
+        assert_equal(mock_bulk.call_count, 1)
+        actions = list(mock_bulk.call_args[0][1])
+        assert_equal({action['_id'] for action in actions}, {project._id, component._id})
+        assert_true(all(action['_op_type'] == 'index' for action in actions))
+
+
+@requires_search
+class TestNodeDocuments(SearchTestCase):
+
+    def setUp(self):
+        super(TestNodeDocuments, self).setUp()
+        self.user = UserFactory(fullname='Roger Taylor')
+        self.project = ProjectFactory(title='Sheer Heart Attack', creator=self.user, is_public=True)
+        self.project.update_node_wiki('home', 'Killer Queen', Auth(self.user))
+
+    def test_get_sections(self):
+        assert_equal(documents.get_sections(['title', 'date_modified']), {'title'})
+        assert_equal(documents.get_sections(['tags', 'visible_contributor_ids']), {'tags', 'contributors'})
+        assert_equal(documents.get_sections(['date_modified']), set())
+        assert_is_none(documents.get_sections(['title', 'is_public']))
+        assert_is_none(documents.get_sections(None))
+        assert_is_none(documents.get_sections(['wiki_pages_current']))
+        assert_is_none(documents.get_sections(['title', 'node_license']))
+
+    def test_build_full_document(self):
+        doc = documents.NodeDocumentBuilder([self.project]).build(self.project)
+        assert_equal(doc['title'], self.project.title)
+        assert_equal(doc['category'], 'project')
+        assert_equal(doc['contributors'], [{'fullname': 'Roger Taylor', 'url': self.user.profile_url}])
+        assert_equal(doc['wikis'], {'home': 'Killer Queen'})
+
+    def test_related_records_are_loaded_once_per_batch(self):
+        other = ProjectFactory(creator=self.user, is_public=True)
+        builder = documents.NodeDocumentBuilder([self.project, other])
+        with mock.patch.object(User, 'find', wraps=User.find) as mock_find:
+            builder.build(self.project)
+            builder.build(other)
+        assert_equal(mock_find.call_count, 1)
+
+    def test_wiki_text_is_cached_by_version(self):
+        documents._wiki_text_cache.clear()
+        with mock.patch('website.addons.wiki.model.NodeWikiPage.raw_text', return_value='text') as mock_raw_text:
+            documents.NodeDocumentBuilder([self.project]).build(self.project)
+            documents.NodeDocumentBuilder([self.project]).build(self.project)
+        assert_equal(mock_raw_text.call_count, 1)
+
+    def test_title_change_updates_title_only(self):
+        self.project.title = 'A Night at the Opera'
+        with mock.patch('website.search.elastic_search.helpers.streaming_bulk') as mock_bulk:
+            mock_bulk.return_value = iter([])
+            with mock.patch('website.addons.wiki.model.NodeWikiPage.raw_text') as mock_raw_text:
+                self.project.save()
+        assert_false(mock_raw_text.called)
+        actions = list(mock_bulk.call_args[0][1])
+        assert_equal(len(actions), 1)
+        assert_equal(actions[0]['_op_type'], 'update')
+        assert_equal(set(actions[0]['doc']), {'title', 'normalized_title'})
+
+    def test_partial_update_of_missing_document_indexes_it(self):
+        search.delete_index(elastic_search.INDEX)
+        search.create_index(elastic_search.INDEX)
+        self.project.title = 'News of the World'
+        self.project.save()
+        docs = query(self.project.title)['results']
+        assert_equal(len(docs), 1)
+        assert_equal(docs[0]['n_wikis'], 1)
+
+
 @requires_search
 class TestNodeSearch(SearchTestCase):
 
@@ -480,6 +651,18 @@ class TestPublicNodes(SearchTestCase):
         docs = query(wiki_content)['results']
         assert_equal(len(docs), 0)
 
+    def test_delete_wiki_page(self):
+        # Add two wiki pages, then delete one, then verify that its text is no
+        # longer found while the other page's is.
+        self.project.update_node_wiki('home', 'Bicycle race', self.consolidate_auth)
+        self.project.update_node_wiki('lyrics', 'Fat bottomed girls', self.consolidate_auth)
+        assert_equal(len(query('"Fat bottomed girls"')['results']), 1)
+
+        self.project.delete_node_wiki('lyrics', self.consolidate_auth)
+
+        assert_equal(len(query('"Fat bottomed girls"')['results']), 0)
+        assert_equal(len(query('"Bicycle race"')['results']), 1)
+
     def test_add_contributor(self):
         # Add a contributor, then verify that project is found when searching
         # for contributor.
@@ -616,6 +799,28 @@ class TestAddContributor(SearchTestCase):
         contribs = search.search_contributor(self.name4.split(' ')[0][:-1])
         assert_equal(len(contribs['users']), 0)
 
+@requires_search
+class TestFormatResults(SearchTestCase):
+
+    def test_parents_are_loaded_in_one_query(self):
+        parent = ProjectFactory(title='Hot Space', is_public=True)
+        private_parent = ProjectFactory(title='Innuendo')
+        results = [
+            {'category': 'file', 'parent_id': parent._id},
+            {'category': 'file', 'parent_id': private_parent._id},
+            {'category': 'user', 'id': 'abc12'},
+            {'category': 'file', 'parent_id': None},
+        ]
+        with mock.patch.object(Node, 'load') as mock_load:
+            formatted = elastic_search.format_results(results)
+        assert_false(mock_load.called)
+        assert_equal(formatted[0]['parent_title'], parent.title)
+        assert_equal(formatted[0]['parent_url'], parent.url)
+        assert_equal(formatted[1]['parent_title'], '-- private project --')
+        assert_equal(formatted[2]['url'], '/profile/abc12')
+        assert_is_none(formatted[3]['parent_url'])
+
+
 @requires_search
 class TestProjectSearchResults(SearchTestCase):
     def setUp(self):
@@ -823,6 +1028,85 @@ class TestSearchMigration(SearchTestCase):
             assert_equal(var[settings.ELASTIC_INDEX + '_v{}'.format(n + 1)]['aliases'].keys()[0], settings.ELASTIC_INDEX)
             assert not var.get(settings.ELASTIC_INDEX + '_v{}'.format(n))
 
+
+class TestReindex(SearchTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestReindex, cls).tearDownClass()
+        search.create_index(settings.ELASTIC_INDEX)
+
+    def setUp(self):
+        super(TestReindex, self).setUp()
+        self.es = search.search_engine.es
+        search.delete_index(settings.ELASTIC_INDEX)
+        search.create_index(settings.ELASTIC_INDEX)
+        self.user = UserFactory(fullname='Brian May')
+        self.projects = [
+            ProjectFactory(title='Innuendo {}'.format(n), creator=self.user, is_public=True)
+            for n in range(6)
+        ]
+        self.private = ProjectFactory(title='Innuendo private', creator=self.user)
+
+    def test_shard_bounds_cover_keyspace(self):
+        bounds = reindex.get_shard_bounds(Node, 3)
+        assert_equal(len(bounds), 3)
+        assert_is_none(bounds[0][0])
+        assert_is_none(bounds[-1][1])
+        for (_, upper), (lower, _) in zip(bounds[:-1], bounds[1:]):
+            assert_equal(upper, lower)
+
+    def test_reindex_swaps_alias(self):
+        reindex.reindex(alias=settings.ELASTIC_INDEX, workers=1, shards_per_worker=3)
+        aliases = self.es.indices.get_aliases()
+        assert_equal(aliases[settings.ELASTIC_INDEX + '_v1']['aliases'].keys(), [settings.ELASTIC_INDEX])
+        assert_equal(reindex.checkpoints().find({'alias': settings.ELASTIC_INDEX}).count(), 0)
+        docs = query('category:project AND Innuendo')['results']
+        assert_equal(len(docs), 6)
+
+    def test_changes_during_reindex_are_kept(self):
+        changed = []
+
+        def change_after_indexing(nodes, index):
+            reindex.index_nodes(nodes, index)
+            if not changed and nodes:
+                # Saved while the reindex runs, after the node was indexed
+                nodes[0].set_title('Bohemian Rhapsody', auth=Auth(self.user), save=True)
+                changed.append(nodes[0]._id)
+
+        models = dict(reindex.MODELS)
+        models['node'] = models['node'][:2] + (change_after_indexing,)
+        with mock.patch.object(reindex, 'MODELS', models):
+            reindex.reindex(alias=settings.ELASTIC_INDEX, workers=1, shards_per_worker=2)
+
+        docs = query('category:project AND "Bohemian Rhapsody"')['results']
+        assert_equal([doc['id'] for doc in docs], changed)
+        assert_equal(len(query('category:project AND Innuendo')['results']), 5)
+        assert_is_none(database[elastic_search.REINDEX_TARGETS_COLLECTION].find_one({'_id': settings.ELASTIC_INDEX}))
+
+    def test_reindex_resumes_after_crash(self):
+        calls = []
+
+        def crash_once(nodes, index):
+            if not calls:
+                calls.append(index)
+                raise RuntimeError('crash')
+            reindex.index_nodes(nodes, index)
+
+        models = dict(reindex.MODELS)
+        models['node'] = models['node'][:2] + (crash_once,)
+        with mock.patch.object(reindex, 'MODELS', models):
+            with assert_raises(RuntimeError):
+                reindex.reindex(alias=settings.ELASTIC_INDEX, workers=1, shards_per_worker=2)
+            assert_equal(reindex.checkpoints().find({'alias': settings.ELASTIC_INDEX, 'done': True}).count(), 0)
+            reindex.reindex(alias=settings.ELASTIC_INDEX, workers=1, shards_per_worker=2)
+
+        aliases = self.es.indices.get_aliases()
+        assert_in(settings.ELASTIC_INDEX, aliases[calls[0]]['aliases'])
+        docs = query('category:project AND Innuendo')['results']
+        assert_equal(len(docs), 6)
+
+
 class TestSearchFiles(SearchTestCase):
 
     def setUp(self):
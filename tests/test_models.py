@@ -833,6 +833,17 @@ class TestUser(OsfTestCase):
         assert_equal(self.user.n_projects_in_common(user2), 1)
         assert_equal(self.user.n_projects_in_common(user3), 0)
 
+    def test_get_n_projects_in_common(self):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        for _ in range(2):
+            project = ProjectFactory(creator=self.user)
+            project.add_contributor(contributor=user2, auth=self.auth, save=True)
+        ProjectFactory(creator=user3)
+
+        counts = self.user.get_n_projects_in_common([user2._id, user3._id, self.user._id])
+        assert_equal(counts, {user2._id: 2, user3._id: 0})
+
     def test_user_get_cookie(self):
         user = UserFactory()
         super_secret_key = 'children need maps'
@@ -2335,6 +2346,105 @@ class TestNodeTraversals(OsfTestCase):
         descendants = list(point1.get_descendants_recursive())
         assert_equal(len(descendants), 1)
 
+    def test_ancestor_ids(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        assert_equal(self.root.ancestor_ids, [])
+        assert_equal(comp1.ancestor_ids, [self.root._id])
+        assert_equal(comp1a.ancestor_ids, [self.root._id, comp1._id])
+        assert_equal(comp1a.depth, 2)
+
+    def test_ancestor_ids_ignore_pointers(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        other = ProjectFactory(creator=self.user)
+        comp1.add_pointer(other, auth=self.auth)
+        other.reload()
+        assert_equal(other.ancestor_ids, [])
+        assert_not_in(other._id, [n._id for n in self.root.find_descendants()])
+
+    def test_find_descendants(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        comp2 = ProjectFactory(creator=self.user, parent=self.root)
+        ProjectFactory(creator=self.user)
+        ids = {n._id for n in self.root.find_descendants()}
+        assert_equal(ids, {comp1._id, comp1a._id, comp2._id})
+        assert_equal({n._id for n in comp1a.find_ancestors()}, {self.root._id, comp1._id})
+
+    def test_fork_tree_ancestor_ids(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        ProjectFactory(creator=self.user, parent=comp1)
+        fork = self.root.fork_node(auth=self.auth)
+        fork_comp1 = fork.nodes[0]
+        fork_comp1a = fork_comp1.nodes[0]
+        fork_comp1a.reload()
+        assert_equal(fork_comp1a.ancestor_ids, [fork._id, fork_comp1._id])
+        assert_equal(fork_comp1a.parents, [fork_comp1, fork])
+
+    def test_template_tree_ancestor_ids(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        ProjectFactory(creator=self.user, parent=comp1)
+        new = self.root.use_as_template(auth=self.auth)
+        new_comp1a = new.nodes[0].nodes[0]
+        new_comp1a.reload()
+        assert_equal(new_comp1a.ancestor_ids, [new._id, new.nodes[0]._id])
+
+    def test_has_permission_on_children(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        assert_false(self.root.has_permission_on_children(self.viewer, 'read'))
+        comp1a.add_contributor(self.viewer, auth=self.auth, permissions=['read'], save=True)
+        assert_true(self.root.has_permission_on_children(self.viewer, 'read'))
+        assert_false(self.root.has_permission_on_children(self.viewer, 'write'))
+        assert_false(self.root.has_permission_on_children(None, 'read'))
+
+    def test_has_permission_on_children_skips_components_of_deleted_components(self):
+        comp1 = ProjectFactory(creator=self.user, parent=self.root)
+        comp1a = ProjectFactory(creator=self.user, parent=comp1)
+        comp1a.add_contributor(self.viewer, auth=self.auth, permissions=['read'], save=True)
+        assert_true(self.root.has_permission_on_children(self.viewer, 'read'))
+        comp1.is_deleted = True
+        comp1.save()
+        assert_false(comp1a.is_deleted)
+        assert_false(self.root.has_permission_on_children(self.viewer, 'read'))
+
+    def test_log_node_tree_ids(self):
+        comp = ProjectFactory(creator=self.user, parent=self.root)
+        subcomp = ProjectFactory(creator=self.user, parent=comp)
+        assert_equal(subcomp.logs[-1].node_tree_ids, [self.root._id, comp._id, subcomp._id])
+        assert_false(subcomp.logs[-1].node_is_public)
+
+    def test_log_visibility_follows_privacy(self):
+        self.root.set_privacy('public', auth=self.auth)
+        for log in self.root.logs:
+            log.reload()
+            assert_true(log.node_is_public)
+
+    def test_aggregate_logs_visibility(self):
+        public = ProjectFactory(creator=self.user, parent=self.root, is_public=True)
+        private = ProjectFactory(creator=self.user, parent=self.root)
+        shared = ProjectFactory(creator=self.user, parent=private)
+        shared.add_contributor(self.viewer, auth=self.auth, permissions=['read'], save=True)
+        self.root.add_contributor(self.viewer, auth=self.auth, permissions=['read'], save=True)
+
+        def aggregate_node_ids(auth):
+            return {log.node._id for log in self.root.get_aggregate_logs_queryset(auth)}
+
+        assert_equal(aggregate_node_ids(Auth(self.viewer)), {self.root._id, public._id, shared._id})
+        assert_equal(aggregate_node_ids(self.auth), {self.root._id, public._id, private._id, shared._id})
+        assert_equal(aggregate_node_ids(Auth()), {self.root._id, public._id})
+
+        private.add_contributor(self.viewer, auth=self.auth, permissions=['read', 'write', 'admin'], save=True)
+        assert_equal(aggregate_node_ids(Auth(self.viewer)), {self.root._id, public._id, private._id, shared._id})
+
+    def test_aggregate_logs_cursor(self):
+        ProjectFactory(creator=self.user, parent=self.root)
+        for _ in range(3):
+            self.root.add_log('file_added', params={'node': self.root._id}, auth=self.auth)
+        logs = list(self.root.get_aggregate_logs_queryset(self.auth))
+        assert_greater(len(logs), 4)
+        assert_equal(list(self.root.get_aggregate_logs_queryset(self.auth, before=logs[2])), logs[3:])
+
 class TestRemoveNode(OsfTestCase):
 
     def setUp(self):
@@ -4275,6 +4385,27 @@ class TestNodeLog(OsfTestCase):
         assert_equal(project._id, log_node_forked.original_node._id)
         assert_equal(fork._id, log_node_forked.node._id)
 
+    def test_clone_node_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        for _ in range(4):
+            project.add_log('file_added', params={'node': project._id}, auth=Auth(user))
+        target = ProjectFactory(creator=user, is_public=True)
+        n_target_logs = len(target.logs)
+
+        n_cloned = NodeLog.clone_node_logs(project, target, batch_size=2)
+
+        original_logs = list(project.logs)
+        assert_equal(n_cloned, len(original_logs))
+        cloned_logs = [log for log in target.logs if log.original_node._id == project._id]
+        assert_equal(len(target.logs), n_target_logs + n_cloned)
+        assert_equal(len(cloned_logs), len(original_logs))
+        assert_equal([log.action for log in cloned_logs], [log.action for log in original_logs])
+        assert_equal([log.date for log in cloned_logs], [log.date for log in original_logs])
+        assert_true(all(log.user == user for log in cloned_logs))
+        assert_true(all(log.node_tree_ids == [target._id] and log.node_is_public for log in cloned_logs))
+        assert_false({log._id for log in cloned_logs} & {log._id for log in original_logs})
+
 
 class TestPermissions(OsfTestCase):
 
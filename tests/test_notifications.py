@@ -960,6 +960,49 @@ class TestCompileSubscriptions(NotificationTestCase):
         subs = emails.compile_subscriptions(node5, 'file_updated')
         assert_equal(subs, {'email_transactional': [], 'email_digest': [self.user_1._id], 'none': []})
 
+    def test_resolved_subscriptions_are_cached(self):
+        self.base_sub.email_transactional.append(self.user_1)
+        self.base_sub.save()
+        emails.compile_subscriptions(self.shared_node, 'file_updated')
+        with mock.patch.object(NotificationSubscription, 'find') as mock_find:
+            result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_false(mock_find.called)
+        assert_equal({'email_transactional': [self.user_1._id], 'none': [], 'email_digest': []}, result)
+
+    def test_cached_lists_are_not_shared(self):
+        self.base_sub.email_transactional.append(self.user_1)
+        self.base_sub.save()
+        emails.compile_subscriptions(self.shared_node, 'file_updated')['email_transactional'].pop()
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal(result['email_transactional'], [self.user_1._id])
+
+    def test_subscription_change_invalidates_cache(self):
+        self.base_sub.email_transactional.append(self.user_1)
+        self.base_sub.save()
+        emails.compile_subscriptions(self.shared_node, 'file_updated')
+        self.shared_sub.email_digest.append(self.user_1)
+        self.shared_sub.save()
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal({'email_transactional': [], 'none': [], 'email_digest': [self.user_1._id]}, result)
+
+    def test_contributor_change_invalidates_cache(self):
+        self.shared_sub.email_transactional.append(self.user_3)
+        self.shared_sub.save()
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal(result['email_transactional'], [self.user_3._id])
+        self.shared_node.remove_contributor(self.user_3, auth=Auth(self.user_1))
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal(result['email_transactional'], [])
+
+    def test_parent_admin_can_be_subscribed_to_child(self):
+        admin = factories.UserFactory()
+        self.base_project.add_contributor(admin, permissions=['read', 'write', 'admin'])
+        self.base_project.save()
+        self.private_sub.email_digest.append(admin)
+        self.private_sub.save()
+        result = emails.compile_subscriptions(self.private_node, 'file_updated')
+        assert_equal(result['email_digest'], [admin._id])
+
 
 class TestMoveSubscription(NotificationTestCase):
     def setUp(self):
@@ -1190,6 +1233,30 @@ class TestSendEmails(NotificationTestCase):
         mock_store.assert_called_with([self.project.creator._id], 'email_transactional', 'comments', user,
                                       self.node, time_now, target_user=user)
 
+    @mock.patch('website.mails.render_message')
+    def test_store_emails_renders_once_per_timezone_and_locale(self, mock_render):
+        mock_render.side_effect = lambda template, **context: context['localized_timestamp']
+        recipients = [factories.UserFactory(timezone='America/New_York', locale='en_US') for _ in range(3)]
+        recipients.append(factories.UserFactory(timezone='Europe/Berlin', locale='de_DE'))
+        time_now = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
+        emails.store_emails([each._id for each in recipients], 'email_digest', 'file_updated', self.user,
+                            self.node, time_now, message='updated', gravatar_url='', url='')
+
+        assert_equal(mock_render.call_count, 2)
+        digests = {digest.user_id: digest for digest in NotificationDigest.find()}
+        assert_equal(set(digests), {each._id for each in recipients})
+        for recipient in recipients:
+            digest = digests[recipient._id]
+            assert_equal(digest.message, emails.localize_timestamp(time_now, recipient))
+            assert_equal(digest.send_type, 'email_digest')
+            assert_equal(digest.node_lineage, [self.project._id, self.node._id])
+
+    def test_store_emails_skips_user_who_triggered_event(self):
+        time_now = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
+        emails.store_emails([self.user._id], 'email_transactional', 'file_updated', self.user,
+                            self.node, time_now, message='updated', gravatar_url='', url='')
+        assert_equal(NotificationDigest.find().count(), 0)
+
     def test_check_node_node_none(self):
         subs = emails.check_node(None, 'comments')
         assert_equal(subs, {'email_transactional': [], 'email_digest': [], 'none': []})
@@ -1345,6 +1412,9 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        # Users are grouped in the order of their ids
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1396,6 +1466,9 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        # Users are grouped in the order of their ids
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1429,7 +1502,82 @@ class TestSendDigest(OsfTestCase):
         assert_equal(kwargs['name'], user.fullname)
         message = group_by_node(user_groups[last_user_index]['info'])
         assert_equal(kwargs['message'], message)
-        assert_equal(kwargs['callback'], remove_notifications(email_notification_ids=email_notification_ids))
+        assert_equal(NotificationDigest.find(Q('_id', 'in', email_notification_ids)).count(), 0)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_skips_claimed_digests(self, mock_send_mail):
+        send_type = 'email_transactional'
+        d = factories.NotificationDigestFactory(
+            user_id=self.user_1._id,
+            send_type=send_type,
+            timestamp=self.timestamp,
+            message='Hello',
+            node_lineage=[self.project._id],
+            claimed_by='another-worker',
+            claimed_until=datetime.datetime.utcnow() + datetime.timedelta(minutes=5),
+        )
+        d.save()
+        assert_equal(get_users_emails(send_type), [])
+        send_users_email(send_type)
+        assert_false(mock_send_mail.called)
+        assert_equal(NotificationDigest.find(Q('_id', 'eq', d._id)).count(), 1)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_claims_digests_with_expired_lease(self, mock_send_mail):
+        send_type = 'email_transactional'
+        d = factories.NotificationDigestFactory(
+            user_id=self.user_1._id,
+            send_type=send_type,
+            timestamp=self.timestamp,
+            message='Hello',
+            node_lineage=[self.project._id],
+            claimed_by='crashed-worker',
+            claimed_until=datetime.datetime.utcnow() - datetime.timedelta(minutes=5),
+        )
+        d.save()
+        send_users_email(send_type)
+        assert_equal(mock_send_mail.call_count, 1)
+        assert_equal(NotificationDigest.find(Q('_id', 'eq', d._id)).count(), 0)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_digests_that_failed_to_send(self, mock_send_mail):
+        mock_send_mail.side_effect = Exception('SMTP is down')
+        send_type = 'email_transactional'
+        d = factories.NotificationDigestFactory(
+            user_id=self.user_1._id,
+            send_type=send_type,
+            timestamp=self.timestamp,
+            message='Hello',
+            node_lineage=[self.project._id]
+        )
+        d.save()
+        send_users_email(send_type)
+        d.reload()
+        assert_is_not_none(d.claimed_by)
+        assert_greater(d.claimed_until, datetime.datetime.utcnow())
+        # Another worker leaves the digest until the lease expires
+        assert_equal(get_users_emails(send_type), [])
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_in_batches(self, mock_send_mail):
+        send_type = 'email_digest'
+        users = [self.user_1, self.user_2, factories.UserFactory()]
+        for user in users:
+            for _ in range(2):
+                factories.NotificationDigestFactory(
+                    user_id=user._id,
+                    send_type=send_type,
+                    timestamp=self.timestamp,
+                    message='Hello',
+                    node_lineage=[self.project._id]
+                ).save()
+        with mock.patch.object(settings, 'NOTIFICATION_DIGEST_BATCH_SIZE', 1):
+            send_users_email(send_type)
+        assert_equal(
+            sorted(call[1]['to_addr'] for call in mock_send_mail.call_args_list),
+            sorted(user.username for user in users)
+        )
+        assert_equal(NotificationDigest.find(Q('send_type', 'eq', send_type)).count(), 0)
 
     def test_remove_sent_digest_notifications(self):
         d = factories.NotificationDigestFactory(
@@ -1442,3 +1590,14 @@ class TestSendDigest(OsfTestCase):
         remove_notifications(email_notification_ids=[digest_id])
         with assert_raises(NoResultsFound):
             NotificationDigest.find_one(Q('_id', 'eq', digest_id))
+
+    def test_remove_notifications_leased_to_another_worker(self):
+        d = factories.NotificationDigestFactory(
+            user_id=factories.UserFactory()._id,
+            timestamp=datetime.datetime.utcnow(),
+            message='Hello',
+            node_lineage=[factories.ProjectFactory()._id],
+            claimed_by='another-worker',
+        )
+        remove_notifications(email_notification_ids=[d._id], claimed_by='this-worker')
+        assert_equal(NotificationDigest.find(Q('_id', 'eq', d._id)).count(), 1)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Tests for website.project.permission_cache."""
+from nose.tools import *  # noqa (PEP8 asserts)
+
+from framework.auth import Auth
+
+from website.project import permission_cache
+from website.project.model import Node
+
+from tests.base import OsfTestCase
+from tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+
+
+class TestPermissionCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestPermissionCache, self).setUp()
+        self.admin = AuthUserFactory()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.admin)
+        self.child = NodeFactory(parent=self.project, creator=self.user)
+        self.grandchild = NodeFactory(parent=self.child, creator=self.user)
+
+    def test_is_admin_parent(self):
+        assert_true(self.grandchild.is_admin_parent(self.admin))
+        assert_true(self.grandchild.is_admin_parent(self.user))
+        assert_false(self.project.is_admin_parent(self.user))
+        assert_false(self.grandchild.is_admin_parent(None))
+
+    def test_admin_node_ids_are_cached(self):
+        project = Node.load(self.project._id)
+        first = permission_cache.get_admin_node_ids(self.admin, project)
+        second = permission_cache.get_admin_node_ids(self.admin, project)
+        assert_equal(first, {self.project._id})
+        assert_is(first, second)
+
+    def test_removing_parent_admin_invalidates_cache(self):
+        assert_true(self.grandchild.has_permission(self.admin, 'read'))
+        version = Node.load(self.project._id).permissions_version
+        self.project.set_permissions(self.admin, ['read', 'write'], save=True)
+        self.project.reload()
+        assert_not_equal(self.project.permissions_version, version)
+        assert_false(self.grandchild.has_permission(self.admin, 'read'))
+
+    def test_new_component_is_visible_to_its_admin_descendants(self):
+        other = AuthUserFactory()
+        assert_false(self.grandchild.is_admin_parent(other))
+        self.child.add_contributor(other, permissions=['read', 'write', 'admin'], auth=Auth(self.user), save=True)
+        assert_true(self.grandchild.is_admin_parent(other))
+
+
+    def test_get_subtree_permissions(self):
+        perms = self.project.get_subtree_permissions(self.admin)
+        assert_equal(perms[self.project._id], {'read', 'write', 'admin'})
+        assert_equal(perms[self.child._id], {'read'})
+        assert_equal(perms[self.grandchild._id], {'read'})
+
+        perms = self.child.get_subtree_permissions(self.user)
+        assert_equal(set(perms), {self.child._id, self.grandchild._id})
+        assert_equal(perms[self.child._id], {'read', 'write', 'admin'})
+        assert_equal(perms[self.grandchild._id], {'read', 'write', 'admin'})
+
+    def test_admin_is_not_inherited_through_deleted_nodes(self):
+        assert_true(self.grandchild.has_permission(self.admin, 'read'))
+        self.child.is_deleted = True
+        self.child.save()
+        grandchild = Node.load(self.grandchild._id)
+        assert_false(grandchild.is_admin_parent(self.admin))
+        assert_false(grandchild.has_permission(self.admin, 'read'))
+        assert_equal(self.project.get_subtree_permissions(self.admin)[self.grandchild._id], set())
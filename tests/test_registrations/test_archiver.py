@@ -28,6 +28,8 @@ from website.archiver import (
     ARCHIVER_NETWORK_ERROR,
     ARCHIVER_SIZE_EXCEEDED,
     NO_ARCHIVE_LIMIT,
+    StatResult,
+    AggregateStatResult,
 )
 from website.archiver import utils as archiver_utils
 from website.app import *  # noqa
@@ -41,6 +43,8 @@ from website import settings
 from website.util import waterbutler_url_for
 from website.project.model import Node, NodeLog, ensure_schemas, MetaSchema
 from website.addons.base import StorageAddonBase
+from website.addons.osfstorage import settings as osfstorage_settings
+from website.addons.base.crawler import TokenBucket, walk_file_tree
 
 from tests import factories
 from tests.base import OsfTestCase, fake
@@ -152,6 +156,9 @@ class MockAddon(mock.MagicMock, StorageAddonBase):
     def _get_file_tree(self, user, version):
         return FILE_TREE
 
+    def _crawl_file_tree(self, user, version):
+        return walk_file_tree(FILE_TREE)
+
     def after_register(self, *args):
         return None, None
 
@@ -387,6 +394,69 @@ class TestStorageAddonBase(ArchiverTestCase):
         for addon in [a for a in settings.ADDONS_ARCHIVABLE if a not in ['wiki']]:
             self._test_addon(addon)
 
+    def _register_listing(self, addon, responses):
+        url = waterbutler_url_for(
+            'metadata',
+            provider=addon.config.short_name,
+            path='/',
+            node=self.src,
+            user=self.user,
+            view_only=True,
+        )
+        httpretty.register_uri(httpretty.GET, url, responses=responses)
+
+    @httpretty.activate
+    @mock.patch('website.addons.base.crawler.get_bucket', mock.Mock(return_value=TokenBucket(1000)))
+    @mock.patch('website.addons.base.crawler.time.sleep')
+    def test_crawl_retries_throttled_listings(self, mock_sleep):
+        addon = self.src.get_or_add_addon('dropbox', auth=self.auth)
+        self._register_listing(addon, [
+            httpretty.Response(body='{}', status=429, adding_headers={'Retry-After': '2'}),
+            httpretty.Response(body='{}', status=503),
+            httpretty.Response(body=json.dumps({'data': FILE_TREE['children'][:1]}), status=200),
+        ])
+        listings = list(addon._crawl_file_tree(user=self.user))
+        assert_equal(len(listings), 1)
+        assert_equal(listings[0][1], FILE_TREE['children'][:1])
+        assert_equal(
+            [args[0][0] for args in mock_sleep.call_args_list],
+            [2.0, settings.WATERBUTLER_CRAWL_BACKOFF * 2]
+        )
+
+    @httpretty.activate
+    @mock.patch('website.addons.base.crawler.get_bucket', mock.Mock(return_value=TokenBucket(1000)))
+    @mock.patch('website.addons.base.crawler.time.sleep')
+    def test_crawl_raises_after_retries(self, mock_sleep):
+        addon = self.src.get_or_add_addon('dropbox', auth=self.auth)
+        self._register_listing(addon, [
+            httpretty.Response(body=json.dumps({'message': 'down'}), status=503),
+        ])
+        with assert_raises(HTTPError) as cm:
+            list(addon._crawl_file_tree(user=self.user))
+        assert_equal(cm.exception.code, 503)
+        assert_equal(cm.exception.data['error'], {'message': 'down'})
+        assert_equal(mock_sleep.call_count, settings.WATERBUTLER_CRAWL_MAX_RETRIES)
+
+    @httpretty.activate
+    @mock.patch('website.addons.base.crawler.get_bucket', mock.Mock(return_value=TokenBucket(1000)))
+    def test_crawl_unpublished_dataverse_dataset(self):
+        addon = self.src.get_or_add_addon('dataverse', auth=self.auth)
+        self._register_listing(addon, [
+            httpretty.Response(body=json.dumps({'message': 'not found'}), status=404),
+        ])
+        listings = list(addon._crawl_file_tree(user=self.user, version='latest-published'))
+        assert_equal(len(listings), 1)
+        assert_equal(listings[0][1], [])
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        with mock.patch('website.addons.base.crawler.time.sleep') as mock_sleep:
+            bucket.acquire()
+            assert_false(mock_sleep.called)
+            mock_sleep.side_effect = lambda seconds: setattr(bucket, 'tokens', 1)
+            bucket.acquire()
+            assert_true(mock_sleep.called)
+
 class TestArchiverTasks(ArchiverTestCase):
 
     @use_fake_addons
@@ -419,8 +489,8 @@ class TestArchiverTasks(ArchiverTestCase):
     @mock.patch('website.archiver.tasks.archive_addon.delay')
     def test_archive_node_pass(self, mock_archive_addon):
         settings.MAX_ARCHIVE_SIZE = 1024 ** 3
-        with mock.patch.object(StorageAddonBase, '_get_file_tree') as mock_file_tree:
-            mock_file_tree.return_value = FILE_TREE
+        with mock.patch.object(StorageAddonBase, '_crawl_file_tree') as mock_crawl:
+            mock_crawl.side_effect = lambda *args, **kwargs: walk_file_tree(FILE_TREE)
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage', 'dropbox']]
         with mock.patch.object(celery, 'group') as mock_group:
             archive_node(results, self.archive_job._id)
@@ -447,13 +517,13 @@ class TestArchiverTasks(ArchiverTestCase):
         with mock.patch.object(self.src, 'get_addon') as mock_get_addon:
             mock_addon = MockAddon()
             def empty_file_tree(user, version):
-                return {
+                return walk_file_tree({
                     'path': '/',
                     'kind': 'folder',
                     'name': 'Fake',
                     'children': []
-                }
-            setattr(mock_addon, '_get_file_tree', empty_file_tree)
+                })
+            setattr(mock_addon, '_crawl_file_tree', empty_file_tree)
             mock_get_addon.return_value = mock_addon
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage']]
             archive_node(results, job_pk=self.archive_job._id)
@@ -465,8 +535,8 @@ class TestArchiverTasks(ArchiverTestCase):
         settings.MAX_ARCHIVE_SIZE = 100
         self.archive_job.initiator.system_tags.append(NO_ARCHIVE_LIMIT)
         self.archive_job.initiator.save()
-        with mock.patch.object(StorageAddonBase, '_get_file_tree') as mock_file_tree:
-            mock_file_tree.return_value = FILE_TREE
+        with mock.patch.object(StorageAddonBase, '_crawl_file_tree') as mock_crawl:
+            mock_crawl.side_effect = lambda *args, **kwargs: walk_file_tree(FILE_TREE)
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage', 'dropbox']]
         with mock.patch.object(celery, 'group') as mock_group:
             archive_node(results, self.archive_job._id)
@@ -504,6 +574,97 @@ class TestArchiverTasks(ArchiverTestCase):
             )
         ))
 
+    @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    def test_archive_addon_incrementally(self, mock_make_copy_request):
+        src_provider = self.src.get_addon('osfstorage')
+        archived = src_provider.get_root().append_file('archived.txt')
+        version = archived.create_version(self.user, {
+            'object': '06d80e',
+            'service': 'cloud',
+            osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+        }, {
+            'size': 128,
+            'sha256': 'abc123',
+        })
+        stat_result = AggregateStatResult('/', 'osfstorage', targets=[
+            StatResult(archived._id, 'archived.txt', disk_usage=128, sha256='abc123'),
+            AggregateStatResult('qwerty/', 'A Folder', targets=[
+                StatResult('qwerty/asdfgh', 'coolphoto.png', disk_usage=256, sha256='def456'),
+            ]),
+        ])
+        assert_true(archive_addon_incrementally(self.archive_job, src_provider, 'Archive of OSF Storage', stat_result, 'cookie'))
+
+        archive_folder = self.dst.get_addon('osfstorage').get_root().children[0]
+        assert_equal(archive_folder.name, 'Archive of OSF Storage')
+        children = {child.name: child for child in archive_folder.children}
+        # Archived content is reused rather than copied
+        assert_equal(children['archived.txt'].versions, [version])
+        folder = children['A Folder']
+        assert_false(list(folder.children))
+        mock_make_copy_request.assert_called_once_with(
+            job_pk=self.archive_job._id,
+            url=settings.WATERBUTLER_URL + '/ops/copy',
+            data=make_waterbutler_payload(
+                self.src, self.dst, 'osfstorage', 'coolphoto.png', 'cookie',
+                src_path='/qwerty/asdfgh',
+                dst_path=folder.path,
+            ),
+        )
+        target = self.archive_job.get_target('osfstorage')
+        assert_equal(target.pending_copies, 1)
+        assert_equal(target.bytes_saved, 128)
+        assert_equal(self.archive_job.bytes_saved, 128)
+
+    @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    def test_archive_addon_incrementally_does_not_expose_other_nodes_versions(self, mock_make_copy_request):
+        other_user = factories.UserFactory()
+        other_node = factories.NodeFactory(creator=other_user)
+        location = {
+            'object': '06d80e',
+            'service': 'cloud',
+            osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+        }
+        foreign = other_node.get_addon('osfstorage').get_root().append_file('private.txt')
+        foreign_version = foreign.create_version(other_user, location, {'size': 128, 'sha256': 'abc123'})
+        src_provider = self.src.get_addon('osfstorage')
+        stat_result = AggregateStatResult('/', 'osfstorage', targets=[
+            StatResult('abc12', 'public.txt', disk_usage=128, sha256='abc123'),
+        ])
+        assert_true(archive_addon_incrementally(self.archive_job, src_provider, 'Archive of OSF Storage', stat_result, 'cookie'))
+
+        archive_folder = self.dst.get_addon('osfstorage').get_root().children[0]
+        version = list(archive_folder.children)[0].versions[0]
+        assert_not_equal(version, foreign_version)
+        assert_equal(version.location, foreign_version.location)
+        assert_equal(version.creator, self.archive_job.initiator)
+        assert_false(mock_make_copy_request.called)
+
+    def test_get_archived_versions_prefers_versions_of_node(self):
+        location = {
+            'object': '06d80e',
+            'service': 'cloud',
+            osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+        }
+        other_node = factories.NodeFactory()
+        other_node.get_addon('osfstorage').get_root().append_file('other.txt').create_version(
+            other_node.creator, location, {'size': 128, 'sha256': 'abc123'}
+        )
+        own_version = self.src.get_addon('osfstorage').get_root().append_file('own.txt').create_version(
+            self.user, location, {'size': 128, 'sha256': 'abc123'}
+        )
+        archived = archiver_utils.get_archived_versions(
+            [StatResult('abc12', 'own.txt', disk_usage=128, sha256='abc123')],
+            node=self.src,
+        )
+        assert_equal(archived, {'abc123': (own_version, True)})
+
+    @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    def test_archive_addon_incrementally_without_archived_content(self, mock_make_copy_request):
+        src_provider = self.src.get_addon('osfstorage')
+        result = archiver_utils.aggregate_file_tree_metadata('osfstorage', FILE_TREE, self.user)
+        assert_false(archive_addon_incrementally(self.archive_job, src_provider, 'Archive of OSF Storage', result, 'cookie'))
+        assert_false(mock_make_copy_request.called)
+
     def test_archive_success(self):
         node = factories.NodeFactory(creator=self.user)
         file_trees, selected_files, node_index = generate_file_tree([node])
@@ -803,6 +964,40 @@ class TestArchiverUtils(ArchiverTestCase):
         assert_equal(a_stat_result.num_files, 2)
         assert_equal(len(a_stat_result.targets), 2)
 
+    def test_aggregate_file_tree_listings(self):
+        listings = walk_file_tree(copy.deepcopy(FILE_TREE))
+        a_stat_result = archiver_utils.aggregate_file_tree_listings('dropbox', listings)
+        assert_equal(
+            a_stat_result._to_dict(),
+            archiver_utils.aggregate_file_tree_metadata('dropbox', FILE_TREE, self.user)._to_dict()
+        )
+
+    def test_aggregate_file_tree_metadata_with_sized_folder(self):
+        file_tree = {
+            'path': '/',
+            'name': '',
+            'kind': 'folder',
+            'children': [
+                {
+                    'path': '/bundle/',
+                    'name': 'bundle',
+                    'kind': 'folder',
+                    'size': 512,
+                    'children': [
+                        {'path': '/bundle/inner.txt', 'name': 'inner.txt', 'kind': 'file', 'size': 512},
+                    ],
+                },
+                {'path': '/top.txt', 'name': 'top.txt', 'kind': 'file', 'size': 64},
+            ],
+        }
+        assert_equal([folder['path'] for folder, _ in walk_file_tree(file_tree)], ['/'])
+        a_stat_result = archiver_utils.aggregate_file_tree_metadata('dropbox', file_tree, self.user)
+        assert_equal(len(a_stat_result.targets), 2)
+        assert_equal(a_stat_result.num_files, 1)
+
+    def test_aggregate_file_tree_listings_empty(self):
+        assert_is_none(archiver_utils.aggregate_file_tree_listings('dropbox', []))
+
     @use_fake_addons
     def test_archive_provider_for(self):
         provider = self.src.get_addon(settings.ARCHIVE_PROVIDER)
@@ -1261,6 +1456,48 @@ class TestArchiveJobModel(OsfTestCase):
         assert_equal(item['stat_result'], target.stat_result)
         assert_equal(item['errors'], target.errors)
 
+    def test_finish_copy(self):
+        target = ArchiveTarget(name='neon-archive', pending_copies=2)
+        target.save()
+        job = ArchiveJob()
+        job.target_addons.append(target)
+        assert_false(job.finish_copy('neon-archive'))
+        assert_true(job.finish_copy('neon-archive'))
+        assert_equal(target.pending_copies, 0)
+        # Targets copied whole have nothing to count down
+        assert_true(job.finish_copy('neon-archive'))
+
+    def test_record_copy_keeps_failure(self):
+        target = ArchiveTarget(name='neon-archive', pending_copies=2, status=ARCHIVER_INITIATED)
+        target.save()
+        # Another addon is still being archived
+        other = ArchiveTarget(name='dropbox', status=ARCHIVER_INITIATED)
+        other.save()
+        job = ArchiveJob()
+        job.target_addons.append(target)
+        job.target_addons.append(other)
+        job.save()
+        assert_true(job.record_copy('neon-archive', errors=['Copy failed']))
+        assert_equal(target.status, ARCHIVER_FAILURE)
+        assert_equal(target.pending_copies, 1)
+        # The last copy succeeding does not make up for the failed one
+        assert_false(job.record_copy('neon-archive'))
+        assert_equal(target.pending_copies, 0)
+        assert_equal(target.status, ARCHIVER_FAILURE)
+        assert_equal(target.errors, ['Copy failed'])
+        assert_false(job.done)
+
+    def test_record_copy_succeeds_after_last_copy(self):
+        target = ArchiveTarget(name='neon-archive', pending_copies=2, status=ARCHIVER_INITIATED)
+        target.save()
+        job = ArchiveJob()
+        job.target_addons.append(target)
+        job.save()
+        assert_false(job.record_copy('neon-archive'))
+        assert_equal(target.status, ARCHIVER_INITIATED)
+        assert_true(job.record_copy('neon-archive'))
+        assert_equal(target.status, ARCHIVER_SUCCESS)
+
     @use_fake_addons
     def test_get_target(self):
         proj = factories.ProjectFactory()
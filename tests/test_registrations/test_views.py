@@ -14,6 +14,8 @@ from modularodm import Q
 from framework.exceptions import HTTPError
 from framework.auth import Auth
 
+from website import settings
+from website.copier.model import CopyJob
 from website.models import Node, MetaSchema, DraftRegistration
 from website.project.metadata.schemas import ACTIVE_META_SCHEMAS, _name_to_id
 from website.util import permissions, api_url_for
@@ -158,6 +160,18 @@ class TestDraftRegistrationViews(RegistrationsTestBase):
         assert_equal(res.status_code, http.ACCEPTED)
         assert_equal(mock_register_draft.call_args[0][0]._id, self.draft._id)
 
+    @mock.patch('website.copier.utils.enqueue_task')
+    def test_register_draft_registration_in_background(self, mock_enqueue):
+        url = self.node.api_url_for('register_draft_registration', draft_id=self.draft._id)
+        with mock.patch.object(settings, 'COPY_ASYNC_MIN_NODES', 1):
+            res = self.app.post_json(url, self.immediate_payload, auth=self.user.auth)
+
+        assert_equal(res.status_code, http.ACCEPTED)
+        assert_true(mock_enqueue.called)
+        job = CopyJob.load(res.json['copy_job_id'])
+        assert_equal(job.draft, self.draft)
+        assert_equal(res.json['urls']['copy_job'], job.absolute_api_v2_url)
+
     @mock.patch('framework.celery_tasks.handlers.enqueue_task')
     def test_register_template_make_public_creates_pending_registration(self, mock_enqueue):
         url = self.node.api_url_for('register_draft_registration', draft_id=self.draft._id)
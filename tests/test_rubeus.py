@@ -5,15 +5,17 @@ import os
 from types import NoneType
 from xmlrpclib import DateTime
 
+import gevent
 import mock
 from nose.tools import *
 from webtest_plus import TestApp
 
 from tests.base import OsfTestCase
 from tests.factories import (UserFactory, ProjectFactory, NodeFactory,
-                             AuthFactory, PointerFactory, RegistrationFactory,
-                             PrivateLinkFactory)
+                             AuthFactory, AuthUserFactory, PointerFactory,
+                             RegistrationFactory, PrivateLinkFactory)
 from framework.auth import Auth
+from website import settings
 from website.util import rubeus
 from website.util.rubeus import sort_by_name
 
@@ -247,6 +249,18 @@ class TestRubeus(OsfTestCase):
         assert_equal(private_dummy['name'], 'Private Component')
         assert_equal(len(private_dummy['children']), 0)
 
+    def test_serialize_components_of_administered_project(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        component = NodeFactory(parent=project, is_public=False)
+        collector = rubeus.NodeFileCollector(node=project, auth=Auth(user=user))
+        assert_equal(collector._subtree_permissions[component._id], {'read'})
+
+        serialized = collector._serialize_folder(component)
+        # Admins on a project can read its components, but not edit them
+        assert_true(serialized['permissions']['view'])
+        assert_false(serialized['permissions']['edit'])
+
     def test_get_node_name(self):
         user = UserFactory()
         auth = Auth(user=user)
@@ -295,7 +309,7 @@ class TestRubeus(OsfTestCase):
         collector = rubeus.NodeFileCollector(
             self.project, Auth(user=UserFactory())
         )
-        nodes = collector._collect_components(self.project, visited=[])
+        nodes = collector._collect_components(self.project, visited=set())
         assert_equal(len(nodes), 0)
 
     def test_serialized_pointer_has_flag_indicating_its_a_pointer(self):
@@ -386,3 +400,75 @@ class TestSerializingNodeWithAddon(OsfTestCase):
                 'fetch': None,
             },
         )
+
+    def test_slow_addon_is_unavailable(self):
+        slow_addon = mock.Mock()
+        slow_addon.config.full_name = 'Slow Addon'
+        slow_addon.config.get_hgrid_data.side_effect = lambda *args, **kwargs: gevent.sleep(1)
+        self.project.get_addons.return_value = [mock_addon, slow_addon]
+        with mock.patch.object(settings, 'RUBEUS_ADDON_TIMEOUT', 0.01):
+            ret = self.serializer._collect_addons(self.project)
+        assert_equal(ret[0], serialized)
+        assert_true(ret[1]['unavailable'])
+        assert_equal(ret[1]['addonFullname'], 'Slow Addon')
+
+    def test_failing_addon_is_unavailable(self):
+        failing_addon = mock.Mock()
+        failing_addon.config.get_hgrid_data.side_effect = ValueError
+        self.project.get_addons.return_value = [failing_addon]
+        ret = self.serializer._collect_addons(self.project)
+        assert_equal(len(ret), 1)
+        assert_true(ret[0]['unavailable'])
+
+
+class TestLazyHgrid(OsfTestCase):
+
+    def setUp(self):
+        super(TestLazyHgrid, self).setUp()
+        self.user = AuthUserFactory()
+        self.auth = Auth(user=self.user)
+        self.project = ProjectFactory(creator=self.user)
+        self.components = [
+            NodeFactory(creator=self.user, parent=self.project)
+            for _ in range(3)
+        ]
+
+    def test_pages_of_children(self):
+        collector = rubeus.NodeFileCollector(node=self.project, auth=self.auth)
+        first = collector.to_hgrid_level(page_size=2)
+        children = first['data'][0]['children']
+        addon_roots = [child for child in children if child.get('isAddonRoot')]
+        folders = [child for child in children if 'nodeID' in child]
+        assert_true(addon_roots)
+        assert_equal([folder['nodeID'] for folder in folders], [node._id for node in self.components[:2]])
+        # Components are not expanded
+        assert_equal(folders[0]['children'], [])
+        assert_in(self.components[0]._id, folders[0]['urls']['fetch'])
+        assert_is_not_none(first['next'])
+
+        second = collector.to_hgrid_level(cursor=first['next'], page_size=2)
+        children = second['data'][0]['children']
+        assert_equal([child['nodeID'] for child in children], [self.components[2]._id])
+        assert_is_none(second['next'])
+
+    def test_private_node_has_no_children(self):
+        collector = rubeus.NodeFileCollector(node=self.project, auth=Auth(user=UserFactory()))
+        ret = collector.to_hgrid_level()
+        assert_false(ret['data'][0]['permissions']['view'])
+        assert_equal(ret['data'][0]['children'], [])
+
+    def test_permissions_are_computed_once_per_node(self):
+        collector = rubeus.NodeFileCollector(node=self.project, auth=self.auth)
+        with mock.patch('website.project.model.Node.can_view', return_value=True) as mock_can_view:
+            collector._serialize_folder(self.components[0])
+            collector._serialize_folder(self.components[0])
+            collector._get_node_name(self.components[0])
+        assert_equal(mock_can_view.call_count, 1)
+
+    def test_grid_data_view(self):
+        url = self.project.api_url_for('grid_data', lazy=True, page_size=1)
+        res = self.app.get(url, auth=self.user.auth)
+        assert_equal(len([
+            child for child in res.json['data'][0]['children'] if 'nodeID' in child
+        ]), 1)
+        assert_is_not_none(res.json['next'])
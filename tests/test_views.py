@@ -43,6 +43,7 @@ from tests.test_features import requires_search
 from website import mailchimp_utils
 from website import mails, settings
 from website.addons.github.tests.factories import GitHubAccountFactory
+from website.copier.model import CopyJob
 from website.models import Node, NodeLog, Pointer
 from website.profile.utils import add_contributor_json, serialize_unregistered
 from website.profile.views import fmt_date_or_none, update_osf_help_mails_subscription
@@ -765,6 +766,23 @@ class TestProjectViews(OsfTestCase):
         most_recent = data['logs'][0]
         assert_equal(most_recent['action'], 'file_added')
 
+    def test_get_logs_with_cursor(self):
+        for _ in range(5):
+            self.project.add_log('file_added', params={'node': self.project._id}, auth=self.consolidate_auth1)
+        self.project.save()
+        url = self.project.api_url_for('get_logs')
+        first = self.app.get(url, {'count': 3}, auth=self.auth).json
+        assert_equal(len(first['logs']), 3)
+        second = self.app.get(url, {'count': 3, 'cursor': first['cursor']}, auth=self.auth).json
+        ids = [log['id'] for log in first['logs'] + second['logs']]
+        assert_equal(len(set(ids)), len(ids))
+        assert_equal(len(ids), len(self.project.logs))
+
+    def test_get_logs_invalid_cursor(self):
+        url = self.project.api_url_for('get_logs')
+        res = self.app.get(url, {'cursor': 'nope'}, auth=self.auth, expect_errors=True)
+        assert_equal(res.status_code, 400)
+
     def test_get_logs_invalid_page_input(self):
         url = self.project.api_url_for('get_logs')
         invalid_input = 'invalid page'
@@ -4235,6 +4253,19 @@ class TestForkViews(OsfTestCase):
         res = self.app.post_json(url, auth=contributor.auth)
         assert_equal(res.status_code, 200)
 
+    @mock.patch('website.copier.utils.enqueue_task')
+    def test_fork_large_project_runs_in_background(self, mock_enqueue):
+        url = self.project.api_url_for('node_fork_page')
+        with mock.patch.object(settings, 'COPY_ASYNC_MIN_NODES', 1):
+            res = self.app.post_json(url, auth=self.user.auth)
+        assert_equal(res.status_code, 202)
+        assert_true(mock_enqueue.called)
+        job = CopyJob.load(res.json['copy_job_id'])
+        assert_equal(job.src_node, self.project)
+        assert_equal(res.json['urls']['forks'], self.project.web_url_for('node_forks'))
+        assert_equal(res.json['urls']['copy_job'], job.absolute_api_v2_url)
+        assert_equal(len(self.project.forks), 0)
+
     def test_registered_forks_dont_show_in_fork_list(self):
         fork = self.project.fork_node(self.consolidated_auth)
         RegistrationFactory(project=fork)
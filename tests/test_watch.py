@@ -8,6 +8,7 @@ import datetime as dt
 from pytz import utc
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 from framework.auth import Auth
+from framework.auth.core import _merge_reversed
 from framework.exceptions import HTTPError
 from tests.base import OsfTestCase
 from tests.factories import (UserFactory, ProjectFactory,
@@ -79,6 +80,32 @@ class TestWatching(OsfTestCase):
         log_ids = list(self.user.get_recent_log_ids(since=since))
         assert_equal(len(log_ids), 3)
 
+    def test_get_recent_log_ids_merges_watched_nodes(self):
+        other = ProjectFactory(creator=self.user)
+        other_log = other.add_log(
+            'tag_added',
+            params={'project': other._primary_key},
+            auth=self.consolidate_auth,
+            save=True,
+        )
+        self._watch_project(self.project)
+        self._watch_project(other)
+        self._watch_project(other)
+        log_ids = list(self.user.get_recent_log_ids())
+        assert_equal(log_ids, sorted(set(log_ids), reverse=True))
+        assert_equal(log_ids[0], other_log._id)
+        assert_in(self.last_log._id, log_ids)
+        assert_equal(self.user.get_recent_log_count(), len(log_ids))
+
+    def test_get_recent_log_count_without_watched_nodes(self):
+        assert_equal(self.user.get_recent_log_count(), 0)
+        assert_equal(list(self.user.get_recent_log_ids()), [])
+
+    def test_merge_reversed(self):
+        merged = _merge_reversed([iter([9, 5, 1]), iter([]), iter([8, 5, 2])])
+        assert_equal(next(merged), 9)
+        assert_equal(list(merged), [8, 5, 2, 1])
+
     def test_get_daily_digest_log_ids(self):
         self._watch_project(self.project)
         day_log_ids = list(self.user.get_daily_digest_log_ids())
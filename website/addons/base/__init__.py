@@ -3,29 +3,24 @@ import glob
 import importlib
 import mimetypes
 import os
-from time import sleep
 
 from bson import ObjectId
 from mako.lookup import TemplateLookup
 import markupsafe
-import requests
 
 from modularodm import fields
 from modularodm import Q
 
 from framework.auth import Auth
 from framework.auth.decorators import must_be_logged_in
-from framework.exceptions import (
-    PermissionsError,
-    HTTPError,
-)
+from framework.exceptions import PermissionsError
 from framework.mongo import StoredObject
 from framework.routing import process_rules
 
 from website import settings
 from website.addons.base import serializer, logger
+from website.addons.base.crawler import FileTreeCrawler
 from website.project.model import Node, User
-from website.util import waterbutler_url_for
 
 from website.oauth.signals import oauth_complete
 
@@ -754,30 +749,28 @@ class StorageAddonBase(object):
             name = name + ': {folder}'.format(folder=folder_name)
         return name
 
-    def _get_fileobj_child_metadata(self, filenode, user, cookie=None, version=None):
-        kwargs = dict(
-            provider=self.config.short_name,
-            path=filenode.get('path', ''),
-            node=self.owner,
-            user=user,
-            view_only=True,
-        )
-        if cookie:
-            kwargs['cookie'] = cookie
-        if version:
-            kwargs['version'] = version
-        metadata_url = waterbutler_url_for(
-            'metadata',
-            **kwargs
-        )
-        res = requests.get(metadata_url)
-        if res.status_code != 200:
-            raise HTTPError(res.status_code, data={
-                'error': res.json(),
-            })
-        # TODO: better throttling?
-        sleep(1.0 / 5.0)
-        return res.json().get('data', [])
+    def handle_listing_error(self, error, folder, version=None):
+        """Called when WaterButler could not list ``folder`` while crawling the
+        file tree. Return the children to use instead, or raise.
+
+        :param HTTPError error: Error of the listing
+        :param dict folder: Metadata of the folder
+        :param str version: Version of the files being listed
+        """
+        raise error
+
+    def _crawl_file_tree(self, filenode=None, user=None, cookie=None, version=None):
+        """
+        Yield (folder, children) for every folder of the file tree, fetching
+        folders in parallel
+        """
+        filenode = filenode or {
+            'path': '/',
+            'kind': 'folder',
+            'name': self.root_node.name,
+        }
+        crawler = FileTreeCrawler(self, user=user, cookie=cookie, version=version)
+        return crawler.crawl(filenode)
 
     def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None):
         """
@@ -788,18 +781,8 @@ class StorageAddonBase(object):
             'kind': 'folder',
             'name': self.root_node.name,
         }
-        if filenode.get('kind') == 'file':
-            return filenode
-        elif 'size' in filenode:
-            return filenode
-        kwargs = {
-            'version': version,
-            'cookie': cookie,
-        }
-        filenode['children'] = [
-            self._get_file_tree(child, user, cookie=cookie)
-            for child in self._get_fileobj_child_metadata(filenode, user, **kwargs)
-        ]
+        for folder, children in self._crawl_file_tree(filenode, user, cookie=cookie, version=version):
+            folder['children'] = children
         return filenode
 
 class AddonOAuthNodeSettingsBase(AddonNodeSettingsBase):
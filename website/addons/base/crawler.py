@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Concurrent traversal of addon file trees through WaterButler.
+
+Folders are listed by a bounded set of worker threads that share one HTTP
+session, so connections to WaterButler are reused. Requests to each provider
+are rate limited by a token bucket shared by every crawl in the process, and
+requests that fail with 429 or a 5xx status are retried with backoff.
+Listings are yielded as they arrive, so callers can aggregate them without
+holding the whole tree.
+"""
+import logging
+import Queue
+import threading
+import time
+
+import furl
+import requests
+from requests.adapters import HTTPAdapter
+
+from framework.exceptions import HTTPError
+
+from website import settings
+from website.util import waterbutler_url_for
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket(object):
+    """Allow ``rate`` acquisitions per second, in bursts of up to ``capacity``.
+
+    :param float rate: Tokens added per second
+    :param float capacity: Maximum number of tokens; defaults to ``rate``
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.time()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(provider):
+    """Return the token bucket shared by all crawls of ``provider``."""
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            limits = settings.WATERBUTLER_CRAWL_RATE_LIMITS
+            bucket = _buckets[provider] = TokenBucket(limits.get(provider, limits['default']))
+        return bucket
+
+
+def is_listable(filenode):
+    """Whether ``filenode`` is a folder whose children have to be fetched.
+    Folders that report a size are treated as files.
+    """
+    return filenode.get('kind') != 'file' and 'size' not in filenode
+
+
+def walk_file_tree(file_tree):
+    """Yield ``(folder, children)`` for every folder of an already fetched
+    tree, parents first, like :meth:`FileTreeCrawler.crawl`. Folders that
+    report a size are not descended into, as they would not be listed.
+    """
+    queue = [file_tree] if file_tree.get('kind') != 'file' else []
+    while queue:
+        folder = queue.pop(0)
+        children = folder.get('children', [])
+        queue.extend(child for child in children if is_listable(child))
+        yield folder, children
+
+
+class FileTreeCrawler(object):
+    """List the folders of an addon's file tree in parallel.
+
+    :param StorageAddonBase addon: Node settings of the addon to crawl
+    :param User user: User whose cookie authenticates the requests
+    :param str cookie: Cookie to use instead of the user's
+    :param str version: Version of the files to list, e.g. for Dataverse
+    :param int workers: Number of folders listed at once
+    """
+
+    def __init__(self, addon, user=None, cookie=None, version=None, workers=None):
+        self.addon = addon
+        self.provider = addon.config.short_name
+        self.version = version
+        self.workers = workers or settings.WATERBUTLER_CRAWL_WORKERS
+        self.bucket = get_bucket(self.provider)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        kwargs = {'view_only': True}
+        if cookie:
+            kwargs['cookie'] = cookie
+        if version:
+            kwargs['version'] = version
+        # Build the URL once; the user's cookie is looked up in the database
+        self._url = furl.furl(waterbutler_url_for(
+            'metadata',
+            provider=self.provider,
+            path='/',
+            node=addon.owner,
+            user=user,
+            **kwargs
+        ))
+        self._stopped = threading.Event()
+
+    def crawl(self, filenode):
+        """Yield ``(folder, children)`` for ``filenode`` and every folder below
+        it, in the order the listings arrive. A folder's listing always comes
+        before its children's.
+
+        :raises HTTPError: if WaterButler could not list a folder
+        """
+        if not is_listable(filenode):
+            return
+        tasks = Queue.Queue()
+        results = Queue.Queue()
+        threads = [
+            threading.Thread(target=self._work, args=(tasks, results))
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        tasks.put(filenode)
+        pending = 1
+        try:
+            while pending:
+                folder, children, error = results.get()
+                pending -= 1
+                if error is not None:
+                    raise error
+                for child in children:
+                    if is_listable(child):
+                        tasks.put(child)
+                        pending += 1
+                yield folder, children
+        finally:
+            self._stopped.set()
+            for _ in threads:
+                tasks.put(None)
+            self.session.close()
+
+    def _work(self, tasks, results):
+        while True:
+            folder = tasks.get()
+            if folder is None or self._stopped.is_set():
+                return
+            try:
+                results.put((folder, self._list(folder), None))
+            except Exception as error:
+                results.put((folder, None, error))
+
+    def _list(self, folder):
+        try:
+            return self._fetch(folder)
+        except HTTPError as error:
+            # Some providers answer errors for folders that are simply empty
+            return self.addon.handle_listing_error(error, folder, version=self.version)
+
+    def _fetch(self, folder):
+        url = self._url.copy()
+        url.args['path'] = folder.get('path', '')
+        url = url.url
+        for attempt in range(settings.WATERBUTLER_CRAWL_MAX_RETRIES + 1):
+            last_attempt = attempt == settings.WATERBUTLER_CRAWL_MAX_RETRIES
+            self.bucket.acquire()
+            try:
+                res = self.session.get(url, timeout=settings.WATERBUTLER_CRAWL_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_attempt:
+                    raise HTTPError(503, data={'error': str(error)})
+                self._backoff(attempt)
+                continue
+            if res.status_code in RETRY_STATUS_CODES and not last_attempt:
+                self._backoff(attempt, res.headers.get('Retry-After'))
+                continue
+            break
+        if res.status_code != 200:
+            try:
+                error = res.json()
+            except ValueError:
+                error = res.text
+            raise HTTPError(res.status_code, data={'error': error})
+        return res.json().get('data', [])
+
+    def _backoff(self, attempt, retry_after=None):
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = settings.WATERBUTLER_CRAWL_BACKOFF * 2 ** attempt
+        logger.info('Retrying {} folder listing in {}s'.format(self.provider, delay))
+        time.sleep(delay)
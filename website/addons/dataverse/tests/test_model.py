@@ -1,8 +1,11 @@
+import httplib as http
+
 from nose.tools import *  # noqa
 import mock
 
 from tests.base import get_default_metaschema
 from framework.auth.decorators import Auth
+from framework.exceptions import HTTPError
 
 from website.addons.base.testing import models
 
@@ -43,6 +46,16 @@ class TestNodeSettings(models.OAuthAddonNodeSettingsTestSuiteMixin, utils.Datave
         )
         assert_false(registration.has_addon('dataverse'))
 
+    def test_handle_listing_error_of_unpublished_dataset(self):
+        error = HTTPError(http.NOT_FOUND)
+        assert_equal(self.node_settings.handle_listing_error(error, {'path': '/'}, version='latest-published'), [])
+
+    def test_handle_listing_error_reraises(self):
+        with assert_raises(HTTPError):
+            self.node_settings.handle_listing_error(HTTPError(http.NOT_FOUND), {'path': '/'}, version='latest')
+        with assert_raises(HTTPError):
+            self.node_settings.handle_listing_error(HTTPError(http.FORBIDDEN), {'path': '/'}, version='latest-published')
+
     ## Overrides ##
 
     def test_create_log(self):
@@ -11,6 +11,8 @@ from website.addons.osfstorage.tests.utils import StorageTestCase
 
 import datetime
 
+from modularodm import Q
+from framework.mongo import database
 from modularodm import exceptions as modm_errors
 
 
@@ -178,6 +180,36 @@ class TestOsfstorageFileNode(StorageTestCase):
         assert_equals(child.get_download_count(1), 1)
         assert_equals(child.get_download_count(2), 1)
 
+    @mock.patch('framework.analytics.session')
+    def test_download_counts_of_files(self, mock_session):
+        mock_session.data = {}
+        root = self.node_settings.get_root()
+        downloaded = root.append_file('Downloaded')
+        never_downloaded = root.append_file('Never downloaded')
+
+        utils.update_analytics(self.project, downloaded._id, 0)
+        utils.update_analytics(self.project, downloaded._id, 0)
+
+        # Counts are not looked up one file at a time
+        with mock.patch('website.files.models.base.get_basic_counters') as mock_get_basic_counters:
+            counts = models.OsfStorageFile.get_download_counts([downloaded, never_downloaded])
+        assert_false(mock_get_basic_counters.called)
+        assert_equal(counts, {downloaded._id: 2, never_downloaded._id: 0})
+
+    @mock.patch('framework.analytics.session')
+    def test_download_counts_of_versions(self, mock_session):
+        mock_session.data = {}
+        child = self.node_settings.get_root().append_file('Test')
+        for _ in range(3):
+            child.versions.append(factories.FileVersionFactory())
+        child.save()
+
+        utils.update_analytics(self.project, child._id, 0)
+        utils.update_analytics(self.project, child._id, 2)
+        utils.update_analytics(self.project, child._id, 2)
+
+        assert_equal(child.get_version_download_counts(), [1, 0, 2])
+
     @unittest.skip
     def test_create_version(self):
         pass
@@ -237,6 +269,82 @@ class TestOsfstorageFileNode(StorageTestCase):
         child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
         assert_equals('/Cloud/Carp', child.materialized_path)
 
+    def test_materialized_path_is_stored(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        assert_equal(child.stored_object.materialized_path, '/Cloud/Carp')
+
+    def test_ancestor_ids(self):
+        root = self.node_settings.get_root()
+        folder = root.append_folder('Cloud')
+        child = folder.append_file('Carp')
+        assert_equal(root.ancestor_ids, [])
+        assert_equal(child.ancestor_ids, [root._id, folder._id])
+
+    def test_move_folder_updates_descendant_lineage(self):
+        root = self.node_settings.get_root()
+        to_move = root.append_folder('Carp')
+        child = to_move.append_folder('Trout').append_file('A dee um')
+        move_to = root.append_folder('Cloud')
+
+        to_move.move_under(move_to, name='Tuna')
+        child.reload()
+
+        assert_equal(child.materialized_path, '/Cloud/Tuna/Trout/A dee um')
+        assert_equal(child.ancestor_ids[:3], [root._id, move_to._id, to_move._id])
+
+    def test_find_descendants(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        nested = folder.append_folder('Trout')
+        files = [folder.append_file('Carp'), nested.append_file('Tuna')]
+        self.node_settings.get_root().append_file('Salmon')
+
+        assert_equal(set(each._id for each in folder.find_descendants()), {nested._id} | {each._id for each in files})
+        assert_equal(
+            [each._id for each in folder.find_descendants(Q('is_file', 'eq', True) & Q('name', 'eq', 'Tuna'))],
+            [files[1]._id]
+        )
+
+    def test_get_file_guids_of_folder(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        guid = folder.append_folder('Trout').append_file('Carp').get_guid(create=True)
+        folder.append_file('Tuna')
+
+        guids = models.OsfStorageFileNode.get_file_guids(folder.path, 'osfstorage', node=self.node)
+        assert_equal(guids, [guid._id])
+
+    def _forget_lineage(self, *file_nodes):
+        # Make the nodes look like they were saved before lineage was stored
+        database[models.StoredFileNode._name].update(
+            {'_id': {'$in': [each._id for each in file_nodes]}},
+            {'$set': {'ancestor_ids': [], 'materialized_path': ''}},
+            multi=True,
+        )
+        models.StoredFileNode._clear_caches()
+
+    def test_get_file_guids_of_folder_without_stored_lineage(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        nested = folder.append_folder('Trout')
+        carp = nested.append_file('Carp')
+        guid = carp.get_guid(create=True)
+        tuna = folder.append_file('Tuna')
+        self._forget_lineage(folder, nested, carp, tuna)
+
+        guids = models.OsfStorageFileNode.get_file_guids(folder.path, 'osfstorage', node=self.node)
+        assert_equal(guids, [guid._id])
+
+    def test_folder_without_stored_lineage_is_checked_out(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        nested = folder.append_folder('Trout')
+        carp = nested.append_file('Carp')
+        carp.checkout = self.user
+        carp.save()
+        self._forget_lineage(folder, nested, carp)
+
+        folder = models.OsfStorageFolder.load(folder._id)
+        assert_true(folder.is_checked_out)
+        with assert_raises(FileNodeCheckedOutError):
+            folder.delete()
+
     def test_copy(self):
         to_copy = self.node_settings.get_root().append_file('Carp')
         copy_to = self.node_settings.get_root().append_folder('Cloud')
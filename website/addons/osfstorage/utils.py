@@ -27,14 +27,17 @@ def update_analytics(node, file_id, version_idx):
     update_counter(u'download:{0}:{1}:{2}'.format(node._id, file_id, version_idx))
 
 
-def serialize_revision(node, record, version, index, anon=False):
+def serialize_revision(node, record, version, index, anon=False, downloads=None):
     """Serialize revision for use in revisions table.
 
     :param Node node: Root node
     :param FileRecord record: Root file record
     :param FileVersion version: The version to serialize
     :param int index: One-based index of version
+    :param int downloads: Download count of the version, if already looked up
     """
+    if downloads is None:
+        downloads = record.get_download_count(version=index)
 
     if anon:
         user = None
@@ -48,7 +51,7 @@ def serialize_revision(node, record, version, index, anon=False):
         'user': user,
         'index': index + 1,
         'date': version.date_created.isoformat(),
-        'downloads': record.get_download_count(version=index),
+        'downloads': downloads,
         'md5': version.metadata.get('md5'),
         'sha256': version.metadata.get('sha256'),
     }
@@ -78,11 +78,21 @@ def osfstorage_update_metadata(node_addon, payload, **kwargs):
 def osfstorage_get_revisions(file_node, node_addon, payload, **kwargs):
     is_anon = has_anonymous_link(node_addon.owner, Auth(private_key=request.args.get('view_only')))
 
+    versions = file_node.versions
+    download_counts = file_node.get_version_download_counts()
+
     # Return revisions in descending order
     return {
         'revisions': [
-            utils.serialize_revision(node_addon.owner, file_node, version, index=len(file_node.versions) - idx - 1, anon=is_anon)
-            for idx, version in enumerate(reversed(file_node.versions))
+            utils.serialize_revision(
+                node_addon.owner,
+                file_node,
+                versions[index],
+                index=index,
+                anon=is_anon,
+                downloads=download_counts[index],
+            )
+            for index in reversed(range(len(versions)))
         ]
     }
 
@@ -130,9 +140,13 @@ def osfstorage_get_metadata(file_node, **kwargs):
 @must_be_signed
 @decorators.autoload_filenode(must_be='folder')
 def osfstorage_get_children(file_node, **kwargs):
+    children = list(file_node.children)
+    download_counts = models.OsfStorageFile.get_download_counts(
+        [child for child in children if child.is_file]
+    )
     return [
-        child.serialize()
-        for child in file_node.children
+        child.serialize(downloads=download_counts.get(child._id))
+        for child in children
     ]
 
 
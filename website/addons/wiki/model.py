@@ -291,7 +291,7 @@ class NodeWikiPage(GuidStoredObject, Commentable):
     def save(self, *args, **kwargs):
         rv = super(NodeWikiPage, self).save(*args, **kwargs)
         if self.node:
-            self.node.update_search()
+            self.node.update_search(saved_fields={'wiki_pages_current'})
         return rv
 
     def rename(self, new_name, save=True):
@@ -28,20 +28,28 @@ class StatResult(object):
     """
     num_files = 1
 
-    def __init__(self, target_id, target_name, disk_usage=0):
+    def __init__(self, target_id, target_name, disk_usage=0, sha256=None):
         self.target_id = target_id
         self.target_name = target_name
         self.disk_usage = float(disk_usage)
+        # Content hash, if the provider reports one
+        self.sha256 = sha256
 
     def __str__(self):
         return str(self._to_dict())
 
     def _to_dict(self):
-        return {
+        ret = {
             'target_id': self.target_id,
             'target_name': self.target_name,
             'disk_usage': self.disk_usage,
         }
+        if self.sha256:
+            ret['sha256'] = self.sha256
+        return ret
+
+    def iter_files(self):
+        yield self
 
 
 class AggregateStatResult(object):
@@ -68,6 +76,12 @@ class AggregateStatResult(object):
             'disk_usage': self.disk_usage,
         }
 
+    def iter_files(self):
+        """Yield the StatResult of every file below this target"""
+        for target in self.targets:
+            for stat_file in target.iter_files():
+                yield stat_file
+
     @property
     def num_files(self):
         return sum([value.num_files for value in self.targets])
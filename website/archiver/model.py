@@ -4,6 +4,7 @@ from modularodm import fields
 
 from framework.mongo import ObjectId
 from framework.mongo import StoredObject
+from framework.mongo import database
 
 from website.archiver import (
     ARCHIVER_INITIATED,
@@ -39,6 +40,10 @@ class ArchiveTarget(StoredObject):
     # }
     stat_result = fields.DictionaryField()
     errors = fields.StringField(list=True)
+    # Copy requests sent to WaterButler that have not called back yet
+    pending_copies = fields.IntegerField(default=0)
+    # Bytes not copied because the archive provider already stored them
+    bytes_saved = fields.IntegerField(default=0)
 
     def __repr__(self):
         return '<{0}(_id={1}, name={2}, status={3})>'.format(
@@ -95,6 +100,13 @@ class ArchiveJob(StoredObject):
             if target.status not in (ARCHIVER_SUCCESS, ARCHIVER_FAILURE)
         ])
 
+    @property
+    def bytes_saved(self):
+        """Bytes that were not copied because the archive provider already
+        stored them
+        """
+        return sum(target.bytes_saved or 0 for target in self.target_addons)
+
     def info(self):
         return self.src_node, self.dst_node, self.initiator
 
@@ -104,7 +116,8 @@ class ArchiveJob(StoredObject):
                 'name': target.name,
                 'status': target.status,
                 'stat_result': target.stat_result,
-                'errors': target.errors
+                'errors': target.errors,
+                'bytes_saved': target.bytes_saved,
             }
             for target in self.target_addons
         ]
@@ -174,6 +187,43 @@ class ArchiveJob(StoredObject):
             self._set_target(addon)
         self.save()
 
+    def finish_copy(self, addon_short_name):
+        """Record that a copy request of the target succeeded.
+
+        :returns: whether the target has no copy requests left
+        """
+        target = self.get_target(addon_short_name)
+        if not target.pending_copies:
+            return True
+        # Copies call back concurrently
+        ret = database[ArchiveTarget._name].find_and_modify(
+            {'_id': target._id},
+            {'$inc': {'pending_copies': -1}},
+            new=True,
+        )
+        target.reload()
+        return ret['pending_copies'] <= 0
+
+    def record_copy(self, addon_short_name, errors=None):
+        """Record the outcome of a copy request of the target. A failed copy
+        fails the target at once; the target succeeds once every copy request
+        has called back without errors.
+
+        :returns: whether the status of the target changed
+        """
+        if errors:
+            self.update_target(addon_short_name, ARCHIVER_FAILURE, errors=errors)
+            # Failed copies are counted down too, or the target never finishes
+            self.finish_copy(addon_short_name)
+            return True
+        if not self.finish_copy(addon_short_name):
+            return False
+        if self.get_target(addon_short_name).status == ARCHIVER_FAILURE:
+            # A copy that called back earlier failed
+            return False
+        self.update_target(addon_short_name, ARCHIVER_SUCCESS)
+        return True
+
     def update_target(self, addon_short_name, status, stat_result=None, errors=None):
         stat_result = stat_result or {}
         errors = errors or []
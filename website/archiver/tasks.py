@@ -125,7 +125,10 @@ def stat_addon(addon_short_name, job_pk):
     src, dst, user = job.info()
     src_addon = src.get_addon(addon_name)
     try:
-        file_tree = src_addon._get_file_tree(user=user, version=version)
+        file_tree_result = utils.aggregate_file_tree_listings(
+            addon_short_name,
+            src_addon._crawl_file_tree(user=user, version=version),
+        )
     except HTTPError as e:
         dst.archive_job.update_target(
             addon_short_name,
@@ -136,7 +139,7 @@ def stat_addon(addon_short_name, job_pk):
     result = AggregateStatResult(
         src_addon._id,
         addon_short_name,
-        targets=[utils.aggregate_file_tree_metadata(addon_short_name, file_tree, user)],
+        targets=[file_tree_result],
     )
     return result
 
@@ -162,19 +165,19 @@ def make_copy_request(job_pk, url, data):
         raise HTTPError(res.status_code)
 
 
-def make_waterbutler_payload(src, dst, addon_short_name, rename, cookie, revision=None):
+def make_waterbutler_payload(src, dst, addon_short_name, rename, cookie, revision=None, src_path='/', dst_path='/'):
     ret = {
         'source': {
             'cookie': cookie,
             'nid': src._id,
             'provider': addon_short_name,
-            'path': '/',
+            'path': src_path,
         },
         'destination': {
             'cookie': cookie,
             'nid': dst._id,
             'provider': settings.ARCHIVE_PROVIDER,
-            'path': '/',
+            'path': dst_path,
         },
         'rename': rename.replace('/', '-')
     }
@@ -218,11 +221,96 @@ def archive_addon(addon_short_name, job_pk, stat_result):
         data = make_waterbutler_payload(src, dst, addon_name, '{0} ({1})'.format(folder_name, folder_name_suffix),
                                         cookie, revision=revision)
         make_copy_request.delay(job_pk=job_pk, url=copy_url, data=data)
-    else:
+    elif not archive_addon_incrementally(job, src_provider, folder_name, stat_result, cookie):
         data = make_waterbutler_payload(src, dst, addon_name, folder_name, cookie)
         make_copy_request.delay(job_pk=job_pk, url=copy_url, data=data)
 
 
+def archive_addon_incrementally(job, src_provider, folder_name, stat_result, cookie):
+    """Rebuild the file tree of an addon in the archive provider, reusing the
+    stored versions of files whose content is already archived and copying
+    only the other files through WaterButler.
+
+    :param job: ArchiveJob
+    :param src_provider: AddonNodeSettings instance of the addon being archived
+    :param folder_name: name of the archive folder of the addon
+    :param stat_result: AggregateStatResult of the addon's file tree
+    :param cookie: cookie of the archive initiator
+    :return: False if the addon should be copied whole instead
+    """
+    from website.files.models import FileVersion
+
+    if not settings.ARCHIVE_DEDUPLICATE or settings.ARCHIVE_PROVIDER != 'osfstorage':
+        return False
+    src, dst, user = job.info()
+    stat_files = list(stat_result.iter_files())
+    archived = utils.get_archived_versions(stat_files, node=src)
+    if not archived:
+        return False
+    new_files = [
+        stat_file for stat_file in stat_files
+        if getattr(stat_file, 'sha256', None) not in archived
+    ]
+    if len(new_files) > settings.ARCHIVE_DEDUPLICATE_MAX_COPIES:
+        return False
+
+    addon_short_name = src_provider.config.short_name
+    copy_url = settings.WATERBUTLER_URL + '/ops/copy'
+    copies = []
+    bytes_saved = 0
+    # (stat results, folder to create them in)
+    stack = []
+    archive_root = dst.get_addon(settings.ARCHIVE_PROVIDER).get_root().append_folder(folder_name)
+    # Results passed on by archive_node wrap the root folder of the addon
+    roots = stat_result.targets if stat_result.target_id == src_provider._id else [stat_result]
+    for root in roots:
+        stack.append((root.targets if isinstance(root, AggregateStatResult) else [root], archive_root))
+    while stack:
+        results, folder = stack.pop()
+        for result in results:
+            if isinstance(result, AggregateStatResult):
+                stack.append((result.targets, folder.append_folder(result.target_name)))
+            elif getattr(result, 'sha256', None) in archived:
+                version, is_own = archived[result.sha256]
+                if not is_own:
+                    # Versions of other nodes keep their creator and date
+                    # private; only the stored content is shared
+                    version = FileVersion(
+                        identifier='1',
+                        creator=user,
+                        location=version.location,
+                        metadata=dict(version.metadata),
+                        size=version.size,
+                        content_type=version.content_type,
+                        date_modified=version.date_modified,
+                    )
+                    version.save()
+                file_node = folder.append_file(result.target_name, save=False)
+                file_node.versions.append(version)
+                file_node.save()
+                bytes_saved += int(result.disk_usage)
+            else:
+                copies.append(make_waterbutler_payload(
+                    src, dst, addon_short_name, result.target_name, cookie,
+                    src_path='/' + result.target_id,
+                    dst_path=folder.path,
+                ))
+
+    target = job.get_target(addon_short_name)
+    target.pending_copies = len(copies)
+    target.bytes_saved = bytes_saved
+    target.save()
+    logger.info('Archiving {0} of {1} files of addon: {2} on node: {3}, {4} bytes already archived'.format(
+        len(copies), len(stat_files), addon_short_name, src._id, bytes_saved
+    ))
+    if not copies:
+        job.update_target(addon_short_name, ARCHIVER_SUCCESS)
+        project_signals.archive_callback.send(dst)
+    for data in copies:
+        make_copy_request.delay(job_pk=job._id, url=copy_url, data=data)
+    return True
+
+
 @celery_app.task(base=ArchiverTask, ignore_result=False)
 @logged('archive_node')
 def archive_node(stat_results, job_pk):
@@ -1,6 +1,9 @@
 import functools
 
+from modularodm import Q
+
 from framework.auth import Auth
+from framework.mongo import database
 
 from website.archiver import (
     StatResult, AggregateStatResult,
@@ -8,6 +11,7 @@ from website.archiver import (
     ARCHIVER_SIZE_EXCEEDED,
     ARCHIVER_FILE_NOT_FOUND,
 )
+from website.addons.base.crawler import is_listable, walk_file_tree
 from website.archiver.model import ArchiveJob
 
 from website import (
@@ -141,20 +145,90 @@ def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
     :param user: archive initatior
     :return: top-most recursive call returns AggregateStatResult containing addon file tree metadata
     """
-    disk_usage = fileobj_metadata.get('size')
     if fileobj_metadata['kind'] == 'file':
-        result = StatResult(
-            target_name=fileobj_metadata['name'],
-            target_id=fileobj_metadata['path'].lstrip('/'),
-            disk_usage=disk_usage or 0,
-        )
-        return result
-    else:
-        return AggregateStatResult(
-            target_id=fileobj_metadata['path'].lstrip('/'),
-            target_name=fileobj_metadata['name'],
-            targets=[aggregate_file_tree_metadata(addon_short_name, child, user) for child in fileobj_metadata.get('children', [])],
-        )
+        return _stat_file(fileobj_metadata)
+    return aggregate_file_tree_listings(addon_short_name, walk_file_tree(fileobj_metadata))
+
+def aggregate_file_tree_listings(addon_short_name, listings):
+    """Collect metadata in AggregateStatResult from folder listings as they are
+    fetched, keeping only the results rather than the file tree
+
+    :param addon_short_name: AddonConfig.short_name of the addon being examined
+    :param listings: iterable of (folder, children) pairs, parents first, as
+    yielded by StorageAddonBase._crawl_file_tree
+    :return: AggregateStatResult of the first folder, or None if there were no listings
+    """
+    root = None
+    # Folder path -> AggregateStatResult waiting for the folder's listing
+    results = {}
+    for folder, children in listings:
+        if root is None:
+            root = results[folder['path']] = _stat_folder(folder)
+        result = results.pop(folder['path'])
+        for child in children:
+            if child['kind'] == 'file':
+                result.targets.append(_stat_file(child))
+            else:
+                child_result = _stat_folder(child)
+                result.targets.append(child_result)
+                if is_listable(child):
+                    results[child['path']] = child_result
+    return root
+
+def _stat_file(fileobj_metadata):
+    return StatResult(
+        target_name=fileobj_metadata['name'],
+        target_id=fileobj_metadata['path'].lstrip('/'),
+        disk_usage=fileobj_metadata.get('size') or 0,
+        sha256=(fileobj_metadata.get('extra') or {}).get('hashes', {}).get('sha256'),
+    )
+
+def _stat_folder(fileobj_metadata):
+    return AggregateStatResult(
+        target_id=fileobj_metadata['path'].lstrip('/'),
+        target_name=fileobj_metadata['name'],
+        targets=[],
+    )
+
+def get_archived_versions(stat_files, node=None):
+    """Find the files whose content ARCHIVE_PROVIDER already stores. Versions
+    of the files of ``node`` are preferred over versions stored for other
+    nodes, whose creator and date are not to be shown on ``node``'s
+    registration.
+
+    :param stat_files: iterable of StatResult
+    :param Node node: Node being archived
+    :return: dict mapping the sha256 of every stored file to a tuple of a
+        FileVersion of it and whether the version belongs to ``node``
+    """
+    from website.files.models import FileVersion, StoredFileNode
+
+    hashes = list({
+        stat_file.sha256
+        for stat_file in stat_files
+        if getattr(stat_file, 'sha256', None)
+    })
+    if not hashes:
+        return {}
+    versions = list(FileVersion.find(
+        Q('metadata.sha256', 'in', hashes) &
+        Q('location', 'ne', None)
+    ))
+    own_ids = set()
+    if node is not None and versions:
+        version_ids = [version._id for version in versions]
+        for file_node in database[StoredFileNode._name].find(
+            {'node': node._id, 'versions': {'$in': version_ids}},
+            {'versions': True}
+        ):
+            own_ids.update(file_node['versions'])
+    archived = {}
+    for version in versions:
+        is_own = version._id in own_ids
+        sha256 = version.metadata['sha256']
+        if sha256 not in archived or (is_own and not archived[sha256][1]):
+            archived[sha256] = (version, is_own)
+    return archived
 
 def before_archive(node, user):
     link_archive_provider(node, user)
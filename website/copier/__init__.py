@@ -0,0 +1,12 @@
+COPY_FORK = 'fork'
+COPY_REGISTER = 'register'
+
+COPY_PENDING = 'PENDING'
+COPY_RUNNING = 'RUNNING'
+COPY_SUCCESS = 'SUCCESS'
+COPY_FAILURE = 'FAILURE'
+
+COPY_DONE_STATUSES = {
+    COPY_SUCCESS,
+    COPY_FAILURE,
+}
@@ -0,0 +1,100 @@
+import datetime
+
+from modularodm import fields
+
+from framework.mongo import ObjectId
+from framework.mongo import StoredObject
+
+from website.util import api_v2_url
+from website.copier import (
+    COPY_FORK,
+    COPY_PENDING,
+    COPY_SUCCESS,
+    COPY_DONE_STATUSES,
+)
+
+
+class CopyJob(StoredObject):
+    """Tracks the fork or registration of a project tree by a celery task.
+
+    The source nodes are copied one at a time, parents first, and every copy is
+    recorded as soon as it is saved. A task that is retried or run again skips
+    the nodes that were already copied.
+    """
+
+    _id = fields.StringField(
+        primary=True,
+        default=lambda: str(ObjectId())
+    )
+
+    # COPY_FORK or COPY_REGISTER
+    action = fields.StringField()
+    status = fields.StringField(default=COPY_PENDING)
+    error = fields.StringField()
+    datetime_initiated = fields.DateTimeField(default=datetime.datetime.utcnow)
+    datetime_updated = fields.DateTimeField(auto_now=datetime.datetime.utcnow)
+
+    src_node = fields.ForeignField('node')
+    # Copy of src_node; set once it has been created
+    dst_node = fields.ForeignField('node')
+    initiator = fields.ForeignField('user')
+
+    # Forks only
+    title = fields.StringField()
+
+    # Registrations only
+    schema = fields.ForeignField('metaschema')
+    data = fields.DictionaryField()
+    draft = fields.ForeignField('draftregistration')
+    # 'immediate' or 'embargo'
+    registration_choice = fields.StringField()
+    embargo_end_date = fields.DateTimeField()
+
+    # _ids of the nodes to copy, parents before their children
+    sources = fields.StringField(list=True)
+    # Source node _id -> _id of its copy
+    copies = fields.DictionaryField()
+    # _ids of the source nodes whose copies have their children attached
+    linked = fields.StringField(list=True)
+
+    def __repr__(self):
+        return (
+            '<{ClassName}(_id={self._id}, action={self.action}, status={self.status}, '
+            'src_node={self.src_node}, dst_node={self.dst_node})>'
+        ).format(ClassName=self.__class__.__name__, self=self)
+
+    @property
+    def absolute_api_v2_url(self):
+        path = '/copy_jobs/{}/'.format(self._id)
+        return api_v2_url(path)
+
+    # used by django and DRF
+    def get_absolute_url(self):
+        return self.absolute_api_v2_url
+
+    @property
+    def is_fork(self):
+        return self.action == COPY_FORK
+
+    @property
+    def done(self):
+        return self.status in COPY_DONE_STATUSES
+
+    @property
+    def success(self):
+        return self.status == COPY_SUCCESS
+
+    @property
+    def total(self):
+        return len(self.sources)
+
+    @property
+    def copied(self):
+        return len(self.copies)
+
+    @property
+    def progress(self):
+        """Fraction of the source nodes copied so far."""
+        if not self.total:
+            return 1.0 if self.done else 0.0
+        return self.copied / float(self.total)
@@ -0,0 +1,164 @@
+from celery.utils.log import get_task_logger
+from modularodm import Q
+from modularodm.exceptions import ValidationValueError
+
+from framework.auth import Auth
+from framework.celery_tasks import app as celery_app
+from framework.exceptions import PermissionsError
+
+from website import settings
+from website.archiver.tasks import create_app_context
+from website.copier import (
+    COPY_RUNNING,
+    COPY_SUCCESS,
+    COPY_FAILURE,
+)
+from website.copier.model import CopyJob
+from website.exceptions import NodeStateError
+from website.project import signals as project_signals
+from website.project.model import Node, DraftRegistrationLog
+
+
+logger = get_task_logger(__name__)
+
+
+def copy_node(job, source, auth):
+    """Fork or register ``source`` without its children and record the copy
+    on ``job``.
+    """
+    is_root = source._id == job.src_node._id
+    if job.is_fork:
+        copy = source._fork_one(auth, title=job.title if is_root else '')
+    else:
+        copy = source._register_one(job.schema, auth, job.data)
+    job.copies[source._id] = copy._id
+    if is_root:
+        job.dst_node = copy
+    job.save()
+    return copy
+
+
+def link_children(job, source, auth):
+    """Attach the copies of the children of ``source`` to its copy, in their
+    original order. Pointers are cloned as they are by ``Node.fork_node``.
+    """
+    copy = Node.load(job.copies[source._id])
+    # A copy starts out without children, so any it has were attached by an
+    # earlier run of this job
+    if not copy.nodes:
+        for child in source.nodes:
+            if not child.primary:
+                pointer = child.fork_node(auth) if job.is_fork else child.register_node(job.schema, auth, job.data)
+                if pointer is not None:
+                    copy.nodes.append(pointer)
+            elif child._id in job.copies:
+                copy.nodes.append(Node.load(job.copies[child._id]))
+        if copy.nodes:
+            copy.save()
+
+        # Children were saved before they had a parent; update their parent
+        # and root with one query instead of saving each of them again
+        children = list(copy.nodes_primary)
+        if children:
+            root = job.dst_node
+            for child in children:
+                child.parent_node = copy
+                child.root = root
+            Node.update(
+                Q('_id', 'in', [child._id for child in children]),
+                data={'parent_node': copy._id, 'root': root._id}
+            )
+    job.linked.append(source._id)
+    job.save()
+
+
+def finish_registration(job):
+    """Start the approval or embargo of the registration created by ``job``
+    if it was made from a draft, then start archiving the registration tree.
+    """
+    registration = job.dst_node
+    initiator = job.initiator
+    if job.draft is not None:
+        if registration.sanction is None:
+            if job.registration_choice == 'embargo':
+                registration.embargo_registration(initiator, job.embargo_end_date)
+            else:
+                registration.require_approval(initiator)
+            registration.save()
+        draft = job.draft
+        if draft.registered_node != registration:
+            draft.registered_node = registration
+            draft.add_status_log(initiator, DraftRegistrationLog.REGISTERED)
+            draft.save()
+
+    if settings.ENABLE_ARCHIVER:
+        # The archiver expects children to be registered before their parents
+        for source_id in reversed(job.sources):
+            copy = Node.load(job.copies[source_id])
+            if copy.archive_job is None:
+                project_signals.after_create_registration.send(
+                    Node.load(source_id), dst=copy, user=initiator
+                )
+
+
+def discard_copies(job):
+    """Delete the forks or registrations ``job`` created, so that a job that
+    failed for good does not leave a partial tree behind.
+    """
+    for copy_id in job.copies.values():
+        copy = Node.load(copy_id)
+        if copy is None or copy.is_deleted:
+            continue
+        copy.is_deleted = True
+        if copy.is_registration:
+            copy.registered_from = None
+        copy.save()
+
+
+def run_copy_job(job):
+    """Copy the nodes of ``job`` that have not been copied yet, then attach
+    every copy to its parent.
+    """
+    job.status = COPY_RUNNING
+    job.save()
+    auth = Auth(job.initiator)
+    for source_id in job.sources:
+        if source_id not in job.copies:
+            copy_node(job, Node.load(source_id), auth)
+            logger.info('{0!r}: copied {1} of {2} nodes'.format(job, job.copied, job.total))
+    for source_id in job.sources:
+        if source_id not in job.linked:
+            link_children(job, Node.load(source_id), auth)
+    if not job.is_fork:
+        finish_registration(job)
+    job.status = COPY_SUCCESS
+    job.error = None
+    job.save()
+
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=60, ignore_result=True)
+def copy_node_tree(self, job_pk):
+    """Run a :class:`CopyJob`. A job that failed part way resumes from the last
+    node it copied when the task is retried.
+    """
+    create_app_context()
+    job = CopyJob.load(job_pk)
+    if job is None or job.done:
+        return
+    try:
+        run_copy_job(job)
+    except (PermissionsError, NodeStateError, ValidationValueError) as err:
+        # Retrying won't help
+        job.status = COPY_FAILURE
+        job.error = str(err)
+        job.save()
+        discard_copies(job)
+        raise
+    except Exception as err:
+        job.error = str(err)
+        if self.request.retries >= self.max_retries:
+            job.status = COPY_FAILURE
+        job.save()
+        if job.status == COPY_FAILURE:
+            discard_copies(job)
+        raise self.retry(exc=err)
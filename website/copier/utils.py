@@ -0,0 +1,106 @@
+import collections
+
+from modularodm import Q
+
+from framework.celery_tasks.handlers import enqueue_task
+from framework.exceptions import PermissionsError
+
+from website import settings
+from website.copier import COPY_FORK, COPY_REGISTER, COPY_DONE_STATUSES
+from website.copier.model import CopyJob
+from website.exceptions import NodeStateError
+
+
+def get_copy_sources(node, user=None):
+    """Return the _ids of ``node`` and the descendants that are copied with it,
+    parents before their children. Deleted nodes are skipped, and so are nodes
+    that ``user`` can't read if ``user`` is given.
+    """
+    sources = []
+    queue = collections.deque([node])
+    while queue:
+        current = queue.popleft()
+        sources.append(current._id)
+        for child in current.nodes_primary:
+            if child.is_deleted:
+                continue
+            if user is not None and not (child.is_public or child.has_permission(user, 'read')):
+                continue
+            queue.append(child)
+    return sources
+
+
+def should_copy_async(node):
+    """Whether forking or registering ``node`` should run as a :class:`CopyJob`
+    instead of in the current request.
+    """
+    n_nodes = node.find_descendants(Q('is_deleted', 'eq', False)).count() + 1
+    return n_nodes >= settings.COPY_ASYNC_MIN_NODES
+
+
+def fork_async(node, auth, title=None):
+    """Queue the fork of ``node`` and its children.
+
+    :raises: PermissionsError if the user can't read ``node``
+    :raises: NodeStateError if ``node`` is deleted
+    :returns: CopyJob
+    """
+    from website.copier import tasks
+
+    user = auth.user
+    if not (node.is_public or node.has_permission(user, 'read')):
+        raise PermissionsError('{0!r} does not have permission to fork node {1!r}'.format(user, node._id))
+    if node.is_deleted:
+        raise NodeStateError('Cannot fork deleted node.')
+
+    job = CopyJob(
+        action=COPY_FORK,
+        src_node=node,
+        initiator=user,
+        title=title,
+        sources=get_copy_sources(node, user=user),
+    )
+    job.save()
+    enqueue_task(tasks.copy_node_tree.si(job._id))
+    return job
+
+
+def register_draft_async(draft, auth, registration_choice='immediate', embargo_end_date=None):
+    """Queue the registration of the node ``draft`` was branched from, and
+    the approval or embargo of the registration once it has been created.
+
+    :raises: PermissionsError if the user can't register the node
+    :raises: NodeStateError if the node is deleted or a collection, or the
+        draft is already being registered
+    :returns: CopyJob
+    """
+    from website.copier import tasks
+
+    node = draft.branched_from
+    if not node.can_edit(auth=auth) and not node.is_admin_parent(user=auth.user):
+        raise PermissionsError(
+            'User {} does not have permission '
+            'to register this node'.format(auth.user._id)
+        )
+    if node.is_collection:
+        raise NodeStateError('Folders may not be registered')
+    if node.is_deleted:
+        raise NodeStateError('Cannot register deleted node.')
+    pending = CopyJob.find(Q('draft', 'eq', draft) & Q('status', 'nin', list(COPY_DONE_STATUSES)))
+    if pending.count():
+        raise NodeStateError('This draft is already being registered.')
+
+    job = CopyJob(
+        action=COPY_REGISTER,
+        src_node=node,
+        initiator=auth.user,
+        schema=draft.registration_schema,
+        data=draft.registration_metadata,
+        draft=draft,
+        registration_choice=registration_choice,
+        embargo_end_date=embargo_end_date,
+        sources=get_copy_sources(node),
+    )
+    job.save()
+    enqueue_task(tasks.copy_node_tree.si(job._id))
+    return job
@@ -15,7 +15,7 @@ from dateutil.parser import parse as parse_date
 from framework.guid.model import Guid
 from framework.mongo import StoredObject
 from framework.mongo.utils import unique_on
-from framework.analytics import get_basic_counters
+from framework.analytics import get_basic_counters, bulk_get_basic_counters
 
 from website import util
 from website.files import utils
@@ -57,6 +57,7 @@ class TrashedFileNode(StoredObject, Commentable):
 
     node = fields.ForeignField('node', required=True)
     parent = fields.AbstractForeignField(default=None)
+    ancestor_ids = fields.StringField(list=True, index=True)
 
     is_file = fields.BooleanField(default=True)
     provider = fields.StringField(required=True)
@@ -171,6 +172,12 @@ class StoredFileNode(StoredObject, Commentable):
         'key_or_list': [
             ('parent', pymongo.ASCENDING),
         ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('node', pymongo.ASCENDING),
+            ('materialized_path', pymongo.ASCENDING),
+        ]
     }]
 
     _id = fields.StringField(primary=True, default=lambda: str(bson.ObjectId()))
@@ -186,6 +193,10 @@ class StoredFileNode(StoredObject, Commentable):
 
     node = fields.ForeignField('Node', required=True)
     parent = fields.ForeignField('StoredFileNode', default=None)
+    # Materialized path of ancestor ids, ordered from the root folder down to
+    # the immediate parent. Only maintained for OsfStorage, see
+    # OsfStorageFileNode.save
+    ancestor_ids = fields.StringField(list=True, index=True)
 
     is_file = fields.BooleanField(default=True)
     provider = fields.StringField(required=True)
@@ -536,6 +547,7 @@ class FileNode(object):
             path=self.path,
             node=self.node,
             parent=parent or self.parent,
+            ancestor_ids=self.ancestor_ids,
             history=self.history,
             is_file=self.is_file,
             checkout=self.checkout,
@@ -695,20 +707,48 @@ class File(FileNode):
         self.save()
         return version
 
+    def _get_download_page(self, version=None):
+        parts = ['download', self.node._id, self._id]
+        if version is not None:
+            parts.append(version)
+        return ':'.join([format(part) for part in parts])
+
     def get_download_count(self, version=None):
         """Pull the download count from the pagecounter collection
         Limit to version if specified.
         Currently only useful for OsfStorage
         """
-        parts = ['download', self.node._id, self._id]
-        if version is not None:
-            parts.append(version)
-        page = ':'.join([format(part) for part in parts])
-        _, count = get_basic_counters(page)
+        _, count = get_basic_counters(self._get_download_page(version))
 
         return count or 0
 
-    def serialize(self):
+    @classmethod
+    def get_download_counts(cls, files):
+        """Pull the download counts of many files with a single query.
+
+        :param list files: Files to count downloads of
+        :return: dict mapping file id to download count
+        """
+        pages = {file_node._id: file_node._get_download_page() for file_node in files}
+        counters = bulk_get_basic_counters(pages.values())
+        return {
+            file_id: counters.get(page, (None, 0))[1] or 0
+            for file_id, page in pages.items()
+        }
+
+    def get_version_download_counts(self):
+        """Pull the download counts of every version with a single query.
+
+        :return: list of download counts, indexed like `versions`
+        """
+        pages = [self._get_download_page(index) for index in range(len(self.versions))]
+        counters = bulk_get_basic_counters(pages)
+        return [counters.get(page, (None, 0))[1] or 0 for page in pages]
+
+    def serialize(self, downloads=None, **kwargs):
+        """:param int downloads: Download count, if already looked up"""
+        if downloads is None:
+            downloads = self.get_download_count()
         if not self.versions:
             return dict(
                 super(File, self).serialize(),
@@ -716,7 +756,7 @@ class File(FileNode):
                 version=None,
                 modified=None,
                 contentType=None,
-                downloads=self.get_download_count(),
+                downloads=downloads,
                 checkout=self.checkout._id if self.checkout else None,
             )
 
@@ -724,7 +764,7 @@ class File(FileNode):
         return dict(
             super(File, self).serialize(),
             size=version.size,
-            downloads=self.get_download_count(),
+            downloads=downloads,
             checkout=self.checkout._id if self.checkout else None,
             version=version.identifier if self.versions else None,
             contentType=version.content_type if self.versions else None,
@@ -783,6 +823,13 @@ class FileVersion(StoredObject):
     about where the file is located, hashes and datetimes
     """
 
+    __indices__ = [{
+        'unique': False,
+        'key_or_list': [
+            ('metadata.sha256', pymongo.ASCENDING),
+        ]
+    }]
+
     _id = fields.StringField(primary=True, default=lambda: str(bson.ObjectId()))
 
     creator = fields.ForeignField('user')
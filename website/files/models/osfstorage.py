@@ -8,13 +8,31 @@ from framework.auth import Auth
 from framework.guid.model import Guid
 from website.exceptions import InvalidTagError, NodeStateError, TagNotFoundError
 from website.files import exceptions
-from website.files.models.base import File, Folder, FileNode, FileVersion, TrashedFileNode
+from website.files.models.base import File, Folder, FileNode, FileVersion, StoredFileNode, TrashedFileNode
 from website.util import permissions
 
 
 __all__ = ('OsfStorageFile', 'OsfStorageFolder', 'OsfStorageFileNode')
 
 
+def _has_stored_lineage(file_node):
+    # Nodes saved before lineage was stored have no materialized_path
+    return bool(getattr(file_node, 'stored_object', file_node).materialized_path)
+
+
+def _walk_descendants(stored_class, folder_id):
+    """Yield every node below the folder ``folder_id`` by following `parent`,
+    one query per level. Used for subtrees whose `ancestor_ids` may not have
+    been stored yet; see scripts/migration/migrate_osfstorage_lineage.py.
+    """
+    parent_ids = [folder_id]
+    while parent_ids:
+        children = list(stored_class.find(Q('parent', 'in', parent_ids)))
+        parent_ids = [child._id for child in children if not child.is_file]
+        for child in children:
+            yield child
+
+
 class OsfStorageFileNode(FileNode):
     provider = 'osfstorage'
 
@@ -42,19 +60,26 @@ class OsfStorageFileNode(FileNode):
         guids = guids or []
         path = materialized_path.strip('/')
         file_obj = cls.load(path)
-        if not file_obj:
+        if file_obj:
+            stored_class = StoredFileNode
+        else:
             file_obj = TrashedFileNode.load(path)
-
-        if not file_obj.is_file:
-            for item in file_obj.children:
-                cls.get_file_guids(item.path, provider, node=node, guids=guids)
+            stored_class = TrashedFileNode
+
+        if file_obj.is_file:
+            file_ids = [file_obj._id]
+        elif _has_stored_lineage(file_obj):
+            # Deleted folders are trashed along with their subtree
+            file_ids = [
+                each._id for each in stored_class.find(
+                    Q('ancestor_ids', 'eq', file_obj._id) &
+                    Q('is_file', 'eq', True)
+                )
+            ]
         else:
-            try:
-                guid = Guid.find(Q('referent', 'eq', file_obj))[0]
-            except IndexError:
-                guid = None
-            if guid:
-                guids.append(guid._id)
+            file_ids = [each._id for each in _walk_descendants(stored_class, file_obj._id) if each.is_file]
+        if file_ids:
+            guids.extend(guid._id for guid in Guid.find(Q('referent', 'in', file_ids)))
         return guids
 
     @property
@@ -63,10 +88,12 @@ class OsfStorageFileNode(FileNode):
 
     @property
     def materialized_path(self):
-        """creates the full path to a the given filenode
-        Note: Possibly high complexity/ many database calls
-        USE SPARINGLY
+        """The full path to the given filenode, stored on save.
+        Filenodes last saved before it was stored fall back to walking their
+        parents, one load per ancestor
         """
+        if self.stored_object.materialized_path:
+            return self.stored_object.materialized_path
         if not self.parent:
             return '/'
         # Note: ODM cache can be abused here
@@ -147,9 +174,31 @@ class OsfStorageFileNode(FileNode):
 
     def save(self):
         self.path = ''
-        self.materialized_path = ''
+        self._update_lineage()
         return super(OsfStorageFileNode, self).save()
 
+    def _update_lineage(self):
+        """Store ancestor_ids and materialized_path, computed from the parent.
+        move_under saves the moved subtree parents first, so renames and moves
+        reach every descendant.
+        """
+        parent = self.parent
+        if parent is None:
+            self.ancestor_ids = []
+            self.materialized_path = '/'
+            return
+        if parent.stored_object.materialized_path:
+            self.ancestor_ids = list(parent.ancestor_ids) + [parent._id]
+        else:
+            # The parent predates stored lineage
+            lineage = []
+            while parent:
+                lineage.append(parent._id)
+                parent = parent.parent
+            self.ancestor_ids = list(reversed(lineage))
+            parent = self.parent
+        self.materialized_path = parent.materialized_path + self.name + ('' if self.is_file else '/')
+
 
 class OsfStorageFile(OsfStorageFileNode, File):
 
@@ -163,8 +212,8 @@ class OsfStorageFile(OsfStorageFileNode, File):
     def history(self):
         return [v.metadata for v in self.versions]
 
-    def serialize(self, include_full=None, version=None):
-        ret = super(OsfStorageFile, self).serialize()
+    def serialize(self, include_full=None, version=None, downloads=None):
+        ret = super(OsfStorageFile, self).serialize(downloads=downloads)
         if include_full:
             ret['fullPath'] = self.materialized_path
 
@@ -275,12 +324,22 @@ class OsfStorageFolder(OsfStorageFileNode, Folder):
     def is_checked_out(self):
         if self.checkout:
             return True
-        for child in self.children:
-            if child.is_checked_out:
-                return True
-        return False
+        if not _has_stored_lineage(self):
+            return any(each.checkout for each in _walk_descendants(StoredFileNode, self._id))
+        return self.find_descendants(Q('checkout', 'ne', None)).count() > 0
+
+    def find_descendants(self, query=None):
+        """Return every file and folder below this folder with a single
+        indexed query on `ancestor_ids`.
+
+        :param Q query: Optional query to combine with the subtree lookup
+        """
+        combined_query = Q('ancestor_ids', 'eq', self._id)
+        if query is not None:
+            combined_query = combined_query & query
+        return FileNode.find(combined_query)
 
-    def serialize(self, include_full=False, version=None):
+    def serialize(self, include_full=False, version=None, **kwargs):
         # Versions just for compatability
         ret = super(OsfStorageFolder, self).serialize()
         if include_full:
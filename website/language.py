@@ -92,6 +92,11 @@ MERGE_CONFIRMATION_REQUIRED_LONG = (
 
 # Node Actions
 
+AFTER_FORK_COPYING = (
+    'Your fork is being created. It will be listed on this page once all of its '
+    'components have been copied.'
+)
+
 AFTER_REGISTER_ARCHIVING = (
     'Files are being copied to the newly created registration, and you will receive an email '
     'notification when the copying is finished.'
@@ -34,6 +34,7 @@ from website.conferences.model import Conference, MailRecord
 from website.notifications.model import NotificationDigest
 from website.notifications.model import NotificationSubscription
 from website.archiver.model import ArchiveJob, ArchiveTarget
+from website.copier.model import CopyJob
 from website.project.licenses import NodeLicense, NodeLicenseRecord
 
 # All models
@@ -46,7 +47,7 @@ MODELS = (
     NotificationSubscription, NotificationDigest, CitationStyle,
     CitationStyle, ExternalAccount, Identifier,
     Embargo, Retraction, RegistrationApproval, EmbargoTerminationApproval,
-    ArchiveJob, ArchiveTarget, BlacklistGuid,
+    ArchiveJob, ArchiveTarget, CopyJob, BlacklistGuid,
     QueuedMail, AlternativeCitation,
     DraftRegistration, DraftRegistrationApproval, DraftRegistrationLog,
     NodeLicense, NodeLicenseRecord
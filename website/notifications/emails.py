@@ -1,10 +1,17 @@
 from babel import dates, core, Locale
+from dateutil.parser import parse as parse_date
+from modularodm import Q
+
+from framework.celery_tasks import app as celery_app
+from framework.mongo import database
+from framework.postcommit_tasks.handlers import run_postcommit
 
 from website import mails
 from website import models as website_models
 from website.notifications import constants
+from website.notifications import resolver
 from website.notifications import utils
-from website.notifications.model import NotificationDigest
+from website.notifications.model import NotificationDigest, validate_subscription_type
 from website.notifications.model import NotificationSubscription
 from website.util import web_url_for
 
@@ -48,7 +55,8 @@ def notify(event, user, node, timestamp, **context):
 def store_emails(recipient_ids, notification_type, event, user, node, timestamp, **context):
     """Store notification emails
 
-    Emails are sent via celery beat as digests
+    Emails are sent via celery beat as digests. They are rendered and stored
+    by a celery task once the request has been committed.
     :param recipient_ids: List of user ids to send mail to.
     :param notification_type: from constants.Notification_types
     :param event: event that triggered notification
@@ -61,56 +69,72 @@ def store_emails(recipient_ids, notification_type, event, user, node, timestamp,
     if notification_type == 'none':
         return
 
+    # Only used to route comment replies, and not serializable
+    context.pop('target_user', None)
+    recipient_ids = [getattr(recipient_id, '_id', recipient_id) for recipient_id in recipient_ids]
+    store_emails_task(
+        [recipient_id for recipient_id in recipient_ids if recipient_id != user._id],
+        notification_type,
+        event,
+        user._id,
+        node._id if node else None,
+        timestamp.isoformat(),
+        **context
+    )
+
+
+@run_postcommit(once_per_request=False, celery=True)
+@celery_app.task(max_retries=5, default_retry_delay=60)
+def store_emails_task(recipient_ids, notification_type, event, user_id, node_id, timestamp, **context):
+    """Render the notification emails of an event and insert them as
+    NotificationDigests. A message is rendered once for all recipients who
+    share a timezone and locale.
+
+    :param timestamp: ISO 8601 time the event happened
+    See store_emails for the other parameters.
+    """
+    validate_subscription_type(notification_type)
+    if not recipient_ids:
+        return
+
     template = event + '.html.mako'
-    context['user'] = user
+    timestamp = parse_date(timestamp)
+    context['user'] = website_models.User.load(user_id)
+    node = website_models.Node.load(node_id) if node_id else None
     node_lineage_ids = get_node_lineage(node) if node else []
 
-    for user_id in recipient_ids:
-        if user_id == user._id:
-            continue
-        recipient = website_models.User.load(user_id)
-        context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
-        message = mails.render_message(template, **context)
+    # (timezone, locale) -> rendered message
+    messages = {}
+    digests = []
+    for recipient in website_models.User.find(Q('_id', 'in', recipient_ids)):
+        key = (recipient.timezone, recipient.locale)
+        if key not in messages:
+            context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
+            messages[key] = mails.render_message(template, **context)
 
         digest = NotificationDigest(
             timestamp=timestamp,
             send_type=notification_type,
             event=event,
-            user_id=user_id,
-            message=message,
+            user_id=recipient._id,
+            message=messages[key],
             node_lineage=node_lineage_ids
         )
-        digest.save()
+        digests.append(digest.to_storage())
+    if digests:
+        database[NotificationDigest._name].insert(digests)
 
 
-def compile_subscriptions(node, event_type, event=None, level=0):
-    """Recurse through node and parents for subscriptions.
+def compile_subscriptions(node, event_type, event=None):
+    """Find the users subscribed to an event on node, through its own and its
+    parents' subscriptions. See website.notifications.resolver.
 
     :param node: current node
     :param event_type: Generally node_subscriptions_available
     :param event: Particular event such a file_updated that has specific file subs
-    :param level: How deep the recursion is
     :return: a dict of notification types with lists of users.
     """
-    subscriptions = check_node(node, event_type)
-    if event:
-        subscriptions = check_node(node, event)  # Gets particular event subscriptions
-        parent_subscriptions = compile_subscriptions(node, event_type, level=level + 1)  # get node and parent subs
-    elif node.parent_id:
-        parent_subscriptions = \
-            compile_subscriptions(website_models.Node.load(node.parent_id), event_type, level=level + 1)
-    else:
-        parent_subscriptions = check_node(None, event_type)
-    for notification_type in parent_subscriptions:
-        p_sub_n = parent_subscriptions[notification_type]
-        p_sub_n.extend(subscriptions[notification_type])
-        for nt in subscriptions:
-            if notification_type != nt:
-                p_sub_n = list(set(p_sub_n).difference(set(subscriptions[nt])))
-        if level == 0:
-            p_sub_n, removed = utils.separate_users(node, p_sub_n)
-        parent_subscriptions[notification_type] = p_sub_n
-    return parent_subscriptions
+    return resolver.resolve(node, event_type, event)
 
 
 def check_node(node, event):
@@ -135,13 +159,7 @@ def get_node_lineage(node):
     """ Get a list of node ids in order from the node to top most project
         e.g. [parent._id, node._id]
     """
-    lineage = [node._id]
-
-    while node.parent_id:
-        node = website_models.Node.load(node.parent_id)
-        lineage = [node._id] + lineage
-
-    return lineage
+    return list(node.ancestor_ids) + [node._id]
 
 
 def get_settings_url(uid, user):
@@ -4,6 +4,7 @@ from framework.mongo import StoredObject, ObjectId
 from modularodm.exceptions import ValidationValueError
 
 from website.project.model import Node
+from website.notifications import resolver
 from website.notifications.constants import NOTIFICATION_TYPES
 
 
@@ -23,6 +24,12 @@ class NotificationSubscription(StoredObject):
     email_digest = fields.ForeignField('user', list=True)
     email_transactional = fields.ForeignField('user', list=True)
 
+    def save(self, *args, **kwargs):
+        ret = super(NotificationSubscription, self).save(*args, **kwargs)
+        if isinstance(self.owner, Node):
+            resolver.invalidate(self.owner)
+        return ret
+
     def add_user_to_subscription(self, user, notification_type, save=True):
         for nt in NOTIFICATION_TYPES:
             if user in getattr(self, nt):
@@ -67,3 +74,6 @@ class NotificationDigest(StoredObject):
     event = fields.StringField()
     message = fields.StringField()
     node_lineage = fields.StringField(list=True)
+    # Lease of the task sending this digest; see website/notifications/tasks.py
+    claimed_by = fields.StringField()
+    claimed_until = fields.DateTimeField()
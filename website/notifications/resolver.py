@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Resolution of the users subscribed to an event on a node.
+
+A user's subscription on the nearest node of the lineage overrides the ones
+above it, and only counts if the user can read the node it was made on and
+the node the event happened on. The subscriptions of the whole lineage are
+loaded with a single query, and read access is worked out from the
+``permissions`` of the lineage, which holds every admin who can read a node
+through an ancestor, so no user is loaded.
+
+Resolved recipients are kept in a process-wide LRU keyed by the root's
+``permissions_version`` and ``subscriptions_version``. Contributor changes
+replace the former, see website.project.permission_cache, and saving a
+subscription replaces the latter, so stale entries are never served by any
+process.
+"""
+import collections
+
+from modularodm import Q
+
+from framework.mongo import ObjectId, database
+from framework.utils import LRUCache
+
+from website import settings
+from website.notifications import constants
+from website.project import signals
+from website.util.permissions import READ, ADMIN
+
+
+_shared_cache = LRUCache(maxsize=settings.SUBSCRIPTION_CACHE_SIZE)
+
+
+def _root_id(node):
+    return node.ancestor_ids[0] if node.ancestor_ids else node._id
+
+
+def _to_subscription_key(uid, event):
+    return u'{}_{}'.format(uid, event)
+
+
+def get_lineage(node):
+    """Return the ancestors of ``node`` followed by ``node``, root first,
+    fetched in a single query.
+    """
+    if not node.ancestor_ids:
+        return [node]
+    ancestors = {each._id: each for each in node.find_ancestors()}
+    return [ancestors[_id] for _id in node.ancestor_ids if _id in ancestors] + [node]
+
+
+def _admin_ids(node):
+    return {user_id for user_id, perms in node.permissions.items() if ADMIN in perms}
+
+
+def _reader_ids(node, inherited_admin_ids):
+    return inherited_admin_ids | {
+        user_id
+        for user_id, perms in node.permissions.items()
+        if READ in perms or ADMIN in perms
+    }
+
+
+def get_reader_ids(node):
+    """Return the ids of all users who can read ``node``, including admins of
+    its ancestors.
+    """
+    inherited_admin_ids = set()
+    for each in get_lineage(node)[:-1]:
+        inherited_admin_ids |= _admin_ids(each)
+    return _reader_ids(node, inherited_admin_ids)
+
+
+def _resolve(node, event_type, event=None):
+    from website.notifications.model import NotificationSubscription
+
+    levels = [(each, _to_subscription_key(each._id, event_type)) for each in get_lineage(node)]
+    if event:
+        # Subscriptions to a particular event, e.g. updates of one file
+        levels.append((node, _to_subscription_key(node._id, event)))
+    subscriptions = {
+        subscription._id: subscription
+        for subscription in NotificationSubscription.find(Q('_id', 'in', [key for _, key in levels]))
+    }
+
+    # User id -> notification type of their nearest subscription
+    resolved = collections.OrderedDict()
+    inherited_admin_ids = set()
+    reader_ids = set()
+    for level_node, key in levels:
+        reader_ids = _reader_ids(level_node, inherited_admin_ids)
+        subscription = subscriptions.get(key)
+        if subscription:
+            for notification_type in constants.NOTIFICATION_TYPES:
+                for user_id in getattr(subscription, notification_type)._to_primary_keys():
+                    if user_id in reader_ids:
+                        resolved.pop(user_id, None)
+                        resolved[user_id] = notification_type
+        inherited_admin_ids |= _admin_ids(level_node)
+
+    ret = {notification_type: [] for notification_type in constants.NOTIFICATION_TYPES}
+    for user_id, notification_type in resolved.items():
+        # reader_ids are the readers of the node the event happened on
+        if user_id in reader_ids:
+            ret[notification_type].append(user_id)
+    return {key: tuple(value) for key, value in ret.items()}
+
+
+def resolve(node, event_type, event=None):
+    """Return the users subscribed to an event on ``node``.
+
+    :param Node node: Node the event happened on
+    :param str event_type: Generally one of NODE_SUBSCRIPTIONS_AVAILABLE
+    :param str event: Particular event such as file_updated that has specific file subs
+    :returns: dict mapping each notification type to a list of user ids
+    """
+    from website.project.model import Node
+
+    root_id = _root_id(node)
+    root = node if root_id == node._id else Node.load(root_id)
+    key = (root_id, root.permissions_version, root.subscriptions_version, node._id, event_type, event)
+    resolved = _shared_cache.get(key)
+    if resolved is None:
+        resolved = _resolve(node, event_type, event)
+        _shared_cache.set(key, resolved)
+    # Callers remove users from the lists they get
+    return {notification_type: list(user_ids) for notification_type, user_ids in resolved.items()}
+
+
+def invalidate(node):
+    """Discard resolved subscriptions for the tree containing ``node``. The new
+    version token is written directly so the node's pending changes are not
+    saved as a side effect.
+    """
+    root_id = _root_id(node)
+    database['node'].update(
+        {'_id': root_id},
+        {'$set': {'subscriptions_version': str(ObjectId())}},
+    )
+    clear_tree(node)
+
+
+@signals.contributor_added.connect
+@signals.contributor_removed.connect
+def clear_tree(node, **kwargs):
+    """Discard this process's resolved subscriptions for the tree containing
+    ``node``. Other processes see the root's new ``permissions_version``.
+    """
+    root_id = _root_id(node)
+    _shared_cache.delete_where(lambda key: key[0] == root_id)
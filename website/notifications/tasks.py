@@ -1,19 +1,29 @@
 """
 Tasks for making even transactional emails consolidated.
+
+Pending digests are read with a cursor sorted by ``user_id``, so each user's
+digests arrive together and only one batch of users is held at a time. Before
+a batch of digests is used it is claimed: the digests are marked with a token
+of the sending task and a lease that expires after
+``NOTIFICATION_DIGEST_LEASE`` seconds. Other tasks skip digests under a live
+lease, so several workers can send the same send type at once without emailing
+a digest twice. Digests whose email could not be sent are released when their
+lease expires, and are sent by a later run.
 """
-from bson.code import Code
+import datetime
+import itertools
+from multiprocessing.pool import ThreadPool
+
+from pymongo import ASCENDING
 from modularodm import Q
 
 from framework.celery_tasks import app as celery_app
-from framework.mongo import database as db
+from framework.mongo import ObjectId, database as db
 from framework.auth.core import User
 from framework.sentry import log_exception
 
-from framework.transactions.context import TokuTransaction
-
+from website import mails, settings
 from website.notifications.utils import NotificationsDict
-from website.notifications.model import NotificationDigest
-from website import mails
 
 
 @celery_app.task(name='website.notifications.tasks.send_users_email', max_retries=0)
@@ -23,26 +33,142 @@ def send_users_email(send_type):
     :param send_type
     :return:
     """
-    grouped_emails = get_users_emails(send_type)
-    if not grouped_emails:
-        return
-    for group in grouped_emails:
-        user = User.load(group['user_id'])
+    token = str(ObjectId())
+    grouped_emails = iter_users_emails(send_type, claimed_by=token)
+    batch_size = settings.NOTIFICATION_DIGEST_BATCH_SIZE
+    pool = ThreadPool(settings.NOTIFICATION_DIGEST_SEND_WORKERS)
+    try:
+        while True:
+            groups = list(itertools.islice(grouped_emails, batch_size))
+            if not groups:
+                break
+            send_batch(groups, pool=pool, claimed_by=token)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def send_batch(groups, pool, claimed_by=None):
+    """Email each user of ``groups`` their digest, then remove the digests
+    that were sent.
+
+    :param list groups: Groups as returned by :func:`get_users_emails`
+    :param ThreadPool pool: Threads the emails are sent from
+    :param str claimed_by: Token of the lease held on the digests
+    """
+    users = {
+        user._id: user
+        for user in User.find(Q('_id', 'in', [group['user_id'] for group in groups]))
+    }
+    emails = []
+    for group in groups:
+        user = users.get(group['user_id'])
         if not user:
             log_exception()
             continue
-        info = group['info']
-        notification_ids = [message['_id'] for message in info]
-        sorted_messages = group_by_node(info)
-        if sorted_messages:
+        emails.append((user, group['info']))
+    sent = pool.map(_send_user_email, emails)
+    notification_ids = [
+        message['_id']
+        for (_user, info), success in zip(emails, sent)
+        if success
+        for message in info
+    ]
+    remove_notifications(email_notification_ids=notification_ids, claimed_by=claimed_by)
+
+
+def _send_user_email(args):
+    user, info = args
+    sorted_messages = group_by_node(info)
+    if sorted_messages:
+        try:
             mails.send_mail(
                 to_addr=user.username,
                 mimetype='html',
                 mail=mails.DIGEST,
                 name=user.fullname,
                 message=sorted_messages,
-                callback=remove_notifications(email_notification_ids=notification_ids)
             )
+        except Exception:
+            # Leave the digests to be sent once their lease expires
+            log_exception()
+            return False
+    return True
+
+
+def _is_available(now):
+    return {'$or': [{'claimed_until': None}, {'claimed_until': {'$lt': now}}]}
+
+
+def _claim(digests, send_type, claimed_by):
+    """Lease the digests not leased by another task to ``claimed_by``, and
+    return them.
+    """
+    now = datetime.datetime.utcnow()
+    ids = [digest['_id'] for digest in digests]
+    query = _is_available(now)
+    query.update({'_id': {'$in': ids}, 'send_type': send_type})
+    db['notificationdigest'].update(
+        query,
+        {'$set': {
+            'claimed_by': claimed_by,
+            'claimed_until': now + datetime.timedelta(seconds=settings.NOTIFICATION_DIGEST_LEASE),
+        }},
+        multi=True,
+    )
+    claimed = {
+        each['_id']
+        for each in db['notificationdigest'].find({'_id': {'$in': ids}, 'claimed_by': claimed_by}, {'_id': True})
+    }
+    return [digest for digest in digests if digest['_id'] in claimed]
+
+
+def _iter_digests(send_type, claimed_by=None):
+    """Yield the pending digests of ``send_type`` in ``user_id`` order,
+    claiming them for ``claimed_by`` a batch at a time if given.
+    """
+    batch_size = settings.NOTIFICATION_DIGEST_BATCH_SIZE
+    query = _is_available(datetime.datetime.utcnow())
+    query['send_type'] = send_type
+    # Sending a batch can take longer than the server keeps an idle cursor
+    cursor = db['notificationdigest'].find(
+        query,
+        {'user_id': True, 'message': True, 'node_lineage': True},
+        timeout=False,
+    ).sort('user_id', ASCENDING).hint([('user_id', ASCENDING)]).batch_size(batch_size)
+    try:
+        while True:
+            digests = list(itertools.islice(cursor, batch_size))
+            if not digests:
+                return
+            if claimed_by:
+                digests = _claim(digests, send_type, claimed_by)
+            for digest in digests:
+                yield digest
+    finally:
+        cursor.close()
+
+
+def iter_users_emails(send_type, claimed_by=None):
+    """Yield the emails that need to be sent one user at a time, in the format
+    of :func:`get_users_emails`.
+
+    :param send_type: from NOTIFICATION_TYPES
+    :param str claimed_by: Token to lease the digests to. Digests leased by
+        others are skipped.
+    """
+    for user_id, digests in itertools.groupby(_iter_digests(send_type, claimed_by), lambda each: each['user_id']):
+        yield {
+            'user_id': user_id,
+            'info': [
+                {
+                    'message': digest['message'],
+                    'node_lineage': digest['node_lineage'],
+                    '_id': digest['_id'],
+                }
+                for digest in digests
+            ]
+        }
 
 
 def get_users_emails(send_type):
@@ -65,26 +191,7 @@ def get_users_emails(send_type):
                 'user_id': ...
               }]
     """
-    with TokuTransaction():
-        emails = db['notificationdigest'].group(
-            key={'user_id': 1},
-            condition={
-                'send_type': send_type
-            },
-            initial={'info': []},
-            reduce=Code(
-                """
-                function(curr, result) {
-                    result.info.push({
-                        'message': curr.message,
-                        'node_lineage': curr.node_lineage,
-                        '_id': curr._id
-                    });
-                };
-                """
-            )
-        )
-    return emails
+    return list(iter_users_emails(send_type))
 
 
 def group_by_node(notifications):
@@ -99,11 +206,16 @@ def group_by_node(notifications):
     return emails
 
 
-def remove_notifications(email_notification_ids=None):
+def remove_notifications(email_notification_ids=None, claimed_by=None):
     """Remove sent emails.
 
     :param email_notification_ids:
+    :param str claimed_by: Only remove digests still leased to this token
     :return:
     """
-    for email_id in email_notification_ids:
-        NotificationDigest.remove(Q('_id', 'eq', email_id))
+    if not email_notification_ids:
+        return
+    query = {'_id': {'$in': list(email_notification_ids)}}
+    if claimed_by:
+        query['claimed_by'] = claimed_by
+    db['notificationdigest'].remove(query)
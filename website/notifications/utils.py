@@ -7,6 +7,7 @@ from modularodm.exceptions import NoResultsFound
 from website.models import Node, User
 from website.notifications import constants
 from website.notifications import model
+from website.notifications import resolver
 from website.notifications.exceptions import InvalidSubscriptionError
 from website.notifications.model import NotificationSubscription
 from website.project import signals
@@ -80,6 +81,7 @@ def remove_subscription(node):
 def remove_subscription_task(node_id):
     node = Node.load(node_id)
     model.NotificationSubscription.remove(Q('owner', 'eq', node))
+    resolver.invalidate(node)
     parent = node.parent_node
 
     if parent and parent.child_node_subscriptions:
@@ -98,12 +100,9 @@ def separate_users(node, user_ids):
     """
     removed = []
     subbed = []
+    reader_ids = resolver.get_reader_ids(node)
     for user_id in user_ids:
-        try:
-            user = User.load(user_id)
-        except TypeError:
-            user = user_id
-        if node.has_permission(user, 'read'):
+        if getattr(user_id, '_id', user_id) in reader_ids:
             subbed.append(user_id)
         else:
             removed.append(user_id)
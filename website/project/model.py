@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import itertools
-import functools
 import os
 import re
 import logging
@@ -23,6 +22,7 @@ from modularodm.exceptions import ValidationValueError
 from framework import status
 from framework.mongo import ObjectId
 from framework.mongo import StoredObject
+from framework.mongo import database
 from framework.mongo import validators
 from framework.addons import AddonModelMixin
 from framework.auth import get_user, User, Auth
@@ -61,6 +61,7 @@ from website.project.licenses import (
     NodeLicenseRecord,
 )
 from website.project import signals as project_signals
+from website.project import permission_cache
 from website.project.spam.model import SpamMixin
 from website.project.sanctions import (
     DraftRegistrationApproval,
@@ -409,6 +410,17 @@ class NodeLog(StoredObject):
             ('should_hide', 1),
             ('date', -1)
         ]
+    }, {
+        'key_or_list': [
+            ('node', 1),
+            ('_id', -1),
+        ]
+    }, {
+        'key_or_list': [
+            ('node_tree_ids', 1),
+            ('date', -1),
+            ('_id', -1),
+        ]
     }]
 
     date = fields.DateTimeField(default=datetime.datetime.utcnow, index=True)
@@ -423,6 +435,12 @@ class NodeLog(StoredObject):
     user = fields.ForeignField('user', index=True)
     foreign_user = fields.StringField()
 
+    # Materialized path of `node`: the ids of its ancestors followed by its
+    # own id, so that the logs of a whole subtree can be read with one query
+    node_tree_ids = fields.StringField(list=True)
+    # Whether `node` is public. Both are kept in sync by `Node.save`.
+    node_is_public = fields.BooleanField(default=False)
+
     DATE_FORMAT = '%m/%d/%Y %H:%M UTC'
 
     # Log action constants -- NOTE: templates stored in log_templates.mako
@@ -527,6 +545,12 @@ class NodeLog(StoredObject):
     def pk(self):
         return self._id
 
+    def save(self, *args, **kwargs):
+        if self.node:
+            self.node_tree_ids = list(self.node.ancestor_ids) + [self.node._id]
+            self.node_is_public = self.node.is_public
+        return super(NodeLog, self).save(*args, **kwargs)
+
     def clone_node_log(self, node_id):
         """
         When a node is forked or registered, all logs on the node need to be cloned for the fork or registration.
@@ -542,6 +566,37 @@ class NodeLog(StoredObject):
         log_clone.save()
         return log_clone
 
+    @classmethod
+    def clone_node_logs(cls, node, to_node, batch_size=1000):
+        """Clone all logs of ``node`` for ``to_node``, as ``clone_node_log``
+        does for a single log, with one insert per ``batch_size`` logs. Logs
+        are copied in date order so that the new ids follow their dates.
+
+        :param Node node: Node whose logs are copied
+        :param Node to_node: Fork or registration receiving the copies
+        :return: Number of logs cloned
+        """
+        collection = database[cls._name]
+        node_tree_ids = list(to_node.ancestor_ids) + [to_node._id]
+        count = 0
+        batch = []
+        for data in collection.find({'node': node._id}).sort('date', 1):
+            data.update({
+                '_id': str(ObjectId()),
+                'node': to_node._id,
+                'node_tree_ids': node_tree_ids,
+                'node_is_public': to_node.is_public,
+            })
+            batch.append(data)
+            if len(batch) >= batch_size:
+                collection.insert(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            collection.insert(batch)
+            count += len(batch)
+        return count
+
     @property
     def tz_date(self):
         '''Return the timezone-aware date.
@@ -770,6 +825,13 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
                 ('registration_approval', pymongo.ASCENDING),
             ]
         },
+        {
+            'unique': False,
+            'key_or_list': [
+                ('ancestor_ids', pymongo.ASCENDING),
+                ('is_deleted', pymongo.ASCENDING),
+            ]
+        },
     ]
 
     # Node fields that trigger an update to Solr on save
@@ -814,6 +876,12 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
     # User mappings
     permissions = fields.DictionaryField()
+    # Token replaced whenever permissions in this node's tree change; only
+    # meaningful on root nodes. See website.project.permission_cache
+    permissions_version = fields.StringField()
+    # Token replaced whenever notification subscriptions in this node's tree
+    # change; only meaningful on root nodes. See website.notifications.resolver
+    subscriptions_version = fields.StringField()
     visible_contributor_ids = fields.StringField(list=True)
 
     # Project Organization
@@ -880,6 +948,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
     registered_from = fields.ForeignField('node', index=True)
     root = fields.ForeignField('node', index=True)
     parent_node = fields.ForeignField('node', index=True)
+    # Materialized path of primary ancestor ids, ordered from the root down to
+    # the immediate parent. Maintained in `save`; see `find_ancestors` and
+    # `find_descendants`.
+    ancestor_ids = fields.StringField(list=True, index=True)
 
     # The node (if any) used as a template for this node's creation
     template_node = fields.ForeignField('node', index=True)
@@ -1084,8 +1156,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
     @property
     def ids_above(self):
-        parents = self.parents
-        return {p._id for p in parents}
+        return set(self.ancestor_ids)
 
     @property
     def nodes_active(self):
@@ -1139,9 +1210,14 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
     def is_admin_parent(self, user):
         if self.has_permission(user, 'admin', check_parent=False):
             return True
-        if self.parent_node:
-            return self.parent_node.is_admin_parent(user)
-        return False
+        return permission_cache.has_inherited_admin(user, self)
+
+    def get_subtree_permissions(self, user):
+        """Return a dict mapping the ids of this node and its primary
+        descendants to the set of permissions `user` effectively holds,
+        including read access inherited from admin on an ancestor.
+        """
+        return permission_cache.get_subtree_permissions(user, self)
 
     def can_view(self, auth):
         if auth and getattr(auth.private_link, 'anonymous', False):
@@ -1231,6 +1307,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
     def set_permissions(self, user, permissions, save=False):
         self.permissions[user._id] = permissions
+        permission_cache.clear_request_cache()
         if save:
             self.save()
 
@@ -1253,17 +1330,27 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         """Checks if the given user has a given permission on any child nodes
             that are not registrations or deleted
         """
+        if user is None:
+            return False
         if self.has_permission(user, permission):
             return True
 
-        for node in self.nodes:
-            if not node.primary or node.is_deleted:
-                continue
-
-            if node.has_permission_on_children(user, permission):
-                return True
-
-        return False
+        # Components under a deleted component are out of reach even if they
+        # were not deleted themselves
+        deleted_ids = [
+            each['_id']
+            for each in database['node'].find(
+                {'ancestor_ids': self._id, 'is_deleted': True},
+                {'_id': True},
+            )
+        ]
+        query = (
+            Q('is_deleted', 'eq', False) &
+            Q('permissions.{0}'.format(user._id), 'eq', permission)
+        )
+        if deleted_ids:
+            query = query & Q('ancestor_ids', 'nin', deleted_ids)
+        return self.find_descendants(query).count() > 0
 
     def has_addon_on_children(self, addon):
         """Checks if a given node has a specific addon on child nodes
@@ -1304,9 +1391,15 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """List of ancestors, nearest first, fetched in a single query."""
+        if not self.ancestor_ids:
+            return []
+        ancestors = {node._id: node for node in self.find_ancestors()}
+        return [
+            ancestors[_id]
+            for _id in reversed(self.ancestor_ids)
+            if _id in ancestors
+        ]
 
     @property
     def admin_contributor_ids(self, contributors=None):
@@ -1526,6 +1619,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
         self.root = self._root._id
         self.parent_node = self._parent_node
+        if self.parent_node:
+            self.ancestor_ids = list(self.parent_node.ancestor_ids) + [self.parent_node._id]
+        else:
+            self.ancestor_ids = []
 
         # If you're saving a property, do it above this super call
         saved_fields = super(Node, self).save(*args, **kwargs)
@@ -1559,6 +1656,17 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
             project_signals.project_created.send(self)
 
+        if not first_save and 'ancestor_ids' in saved_fields:
+            NodeLog.update(Q('node', 'eq', self._id), data={'node_tree_ids': list(self.ancestor_ids) + [self._id]})
+        if not first_save and 'is_public' in saved_fields:
+            NodeLog.update(Q('node', 'eq', self._id), data={'node_is_public': self.is_public})
+
+        tree_changed = False
+        if first_save or {'ancestor_ids', 'nodes'}.intersection(saved_fields):
+            tree_changed = self._update_children_ancestor_ids()
+        if tree_changed or (not first_save and {'permissions', 'ancestor_ids', 'is_deleted'}.intersection(saved_fields)):
+            permission_cache.invalidate(self)
+
         # Only update Solr if at least one stored field has changed, and if
         # public or privacy setting has changed
         need_update = bool(self.SOLR_UPDATE_FIELDS.intersection(saved_fields))
@@ -1568,7 +1676,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         if self.is_collection or self.archiving:
             need_update = False
         if need_update:
-            self.update_search()
+            self.update_search(None if first_save else saved_fields)
 
         if 'node_license' in saved_fields:
             children = [c for c in self.get_descendants_recursive(
@@ -1799,7 +1907,51 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
     @property
     def depth(self):
-        return len(self.parents)
+        return len(self.ancestor_ids)
+
+    def find_ancestors(self, query=None):
+        """Return all ancestors of this node with a single query on the
+        materialized `ancestor_ids` path. Results are not ordered; use
+        `parents` for the nearest-first list.
+
+        :param Q query: Optional query to combine with the ancestor lookup
+        """
+        combined_query = Q('_id', 'in', list(self.ancestor_ids))
+        if query is not None:
+            combined_query = combined_query & query
+        return Node.find(combined_query)
+
+    def find_descendants(self, query=None):
+        """Return all primary (non-pointer) descendants of this node with a
+        single indexed query on `ancestor_ids`.
+
+        :param Q query: Optional query to combine with the subtree lookup
+        """
+        combined_query = Q('ancestor_ids', 'eq', self._id)
+        if query is not None:
+            combined_query = combined_query & query
+        return Node.find(combined_query)
+
+    def _update_children_ancestor_ids(self):
+        """Push this node's materialized path down to primary children whose
+        stored path is stale, e.g. after a fork, registration or template tree
+        has been attached. Subtrees that are already current are skipped.
+
+        :returns: Whether any descendant was updated
+        """
+        if self.is_deleted:
+            return False
+        path = list(self.ancestor_ids) + [self._id]
+        updated = False
+        for child in self.nodes_primary:
+            if list(child.ancestor_ids) == path:
+                continue
+            child.ancestor_ids = path
+            Node.update(Q('_id', 'eq', child._id), data={'ancestor_ids': path})
+            NodeLog.update(Q('node', 'eq', child._id), data={'node_tree_ids': path + [child._id]})
+            child._update_children_ancestor_ids()
+            updated = True
+        return updated
 
     def next_descendants(self, auth, condition=lambda auth, node: True):
         """
@@ -1818,24 +1970,72 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         return ret
 
     def get_descendants_recursive(self, include=lambda n: True):
+        # Load the whole primary subtree in one query so that the traversal
+        # below resolves `nodes` from the identity cache instead of issuing a
+        # `Node.load` per child.
+        list(self.find_descendants())
+        return self._get_descendants_recursive(include)
+
+    def _get_descendants_recursive(self, include):
         for node in self.nodes:
             if include(node):
                 yield node
             if node.primary:
-                for descendant in node.get_descendants_recursive(include):
+                for descendant in node._get_descendants_recursive(include):
                     if include(descendant):
                         yield descendant
 
     def get_aggregate_logs_query(self, auth):
-        ids = [self._id] + [n._id
-                            for n in self.get_descendants_recursive()
-                            if n.can_view(auth)]
-        query = Q('node', 'in', ids) & Q('should_hide', 'ne', True)
-        return query
+        """Query for the logs of this node and of the primary descendants
+        ``auth`` can view. Logs are matched on their node's materialized path,
+        so the subtree isn't loaded; only the private descendants ``auth.user``
+        contributes to are looked up.
+        """
+        query = Q('node_tree_ids', 'eq', self._id) & Q('should_hide', 'ne', True)
+        private_link = auth.private_link if auth else None
+        if private_link and private_link.anonymous:
+            return query & Q('node', 'in', private_link.nodes._to_primary_keys())
 
-    def get_aggregate_logs_queryset(self, auth):
+        user = auth.user if auth else None
+        if user and (self.has_permission(user, ADMIN) or self.is_admin_parent(user)):
+            # Admins can read the whole subtree
+            return query
+
+        visible = Q('node', 'eq', self._id) | Q('node_is_public', 'eq', True)
+        if private_link:
+            visible = visible | Q('node', 'in', private_link.nodes._to_primary_keys())
+        if user:
+            readable_ids = [
+                node._id for node in Node.find(
+                    Q('ancestor_ids', 'eq', self._id) &
+                    Q('is_public', 'eq', False) &
+                    Q('contributors', 'eq', user._id)
+                )
+            ]
+            if readable_ids:
+                visible = visible | Q('node', 'in', readable_ids)
+            root = Node.load(self.ancestor_ids[0]) if self.ancestor_ids else self
+            admin_ids = list(permission_cache.get_admin_node_ids(user, root))
+            if admin_ids:
+                # Admins can read everything below the nodes they administer
+                visible = visible | Q('node_tree_ids', 'in', admin_ids)
+        return query & visible
+
+    def get_aggregate_logs_queryset(self, auth, before=None):
+        """Return the aggregate logs newest first.
+
+        :param Auth auth: Consumer of the logs
+        :param NodeLog before: Only return logs older than this one. Pages
+            fetched this way use the ``node_tree_ids`` index instead of
+            skipping over earlier pages.
+        """
         query = self.get_aggregate_logs_query(auth)
-        return NodeLog.find(query).sort('-date')
+        if before is not None:
+            query = query & (
+                Q('date', 'lt', before.date) |
+                (Q('date', 'eq', before.date) & Q('_id', 'lt', before._id))
+            )
+        return NodeLog.find(query).sort('-date', '-_id')
 
     @property
     def nodes_pointer(self):
@@ -2010,20 +2210,19 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
             self.save()
         return None
 
-    def update_search(self):
+    def update_search(self, saved_fields=None):
         from website import search
         try:
-            search.search.update_node(self, bulk=False, async=True)
+            search.search.update_node(self, bulk=False, async=True, saved_fields=saved_fields)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
 
     @classmethod
-    def bulk_update_search(cls, nodes):
+    def bulk_update_search(cls, nodes, index=None):
         from website import search
         try:
-            serialize = functools.partial(search.search.update_node, bulk=True, async=False)
-            search.search.bulk_update_nodes(serialize, nodes)
+            search.search.update_nodes(nodes, index=index)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
@@ -2114,6 +2313,32 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
     def fork_node(self, auth, title=None):
         """Recursively fork a node.
 
+        :param Auth auth: Consolidated authorization
+        :param str title: Optional text to prepend to forked title
+        :return: Forked node
+        """
+        original = self.load(self._primary_key)
+        forked = original._fork_one(auth, title=title)
+
+        # Recursively fork child nodes
+        for node_contained in original.nodes:
+            if not node_contained.is_deleted:
+                forked_node = None
+                try:  # Catch the potential PermissionsError above
+                    forked_node = node_contained.fork_node(auth=auth, title='')
+                except PermissionsError:
+                    pass  # If this exception is thrown omit the node from the result set
+                if forked_node is not None:
+                    forked.nodes.append(forked_node)
+
+        if forked.nodes:
+            forked.save()
+
+        return forked
+
+    def _fork_one(self, auth, title=None):
+        """Fork this node without its children.
+
         :param Auth auth: Consolidated authorization
         :param str title: Optional text to prepend to forked title
         :return: Forked node
@@ -2138,17 +2363,6 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
 
         forked.tags = self.tags
 
-        # Recursively fork child nodes
-        for node_contained in original.nodes:
-            if not node_contained.is_deleted:
-                forked_node = None
-                try:  # Catch the potential PermissionsError above
-                    forked_node = node_contained.fork_node(auth=auth, title='')
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-                if forked_node is not None:
-                    forked.nodes.append(forked_node)
-
         if title is None:
             forked.title = PREFIX + original.title
         elif title == '':
@@ -2204,9 +2418,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         )
 
         # Clone each log from the original node for this fork.
-        logs = original.logs
-        for log in logs:
-            log.clone_node_log(forked._id)
+        NodeLog.clone_node_logs(original, forked)
 
         forked.reload()
 
@@ -2227,6 +2439,37 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         :param data: Form data
         :param parent Node: parent registration of registration to be created
         """
+        original = self.load(self._primary_key)
+        registered = original._register_one(schema, auth, data, parent=parent)
+
+        for node_contained in original.nodes:
+            if not node_contained.is_deleted:
+                child_registration = node_contained.register_node(
+                    schema=schema,
+                    auth=auth,
+                    data=data,
+                    parent=registered,
+                )
+                if child_registration and not child_registration.primary:
+                    registered.nodes.append(child_registration)
+
+        registered.save()
+
+        if settings.ENABLE_ARCHIVER:
+            registered.reload()
+            project_signals.after_create_registration.send(self, dst=registered, user=auth.user)
+
+        return registered
+
+    def _register_one(self, schema, auth, data, parent=None):
+        """Make a frozen copy of this node without its children. The archiver
+        is not started.
+
+        :param schema: Schema object
+        :param auth: All the auth information including user, API key.
+        :param data: Form data
+        :param parent Node: parent registration of registration to be created
+        """
         # TODO(lyndsysimon): "template" param is not necessary - use schema.name?
         # NOTE: Admins can register child nodes even if they don't have write access them
         if not self.can_edit(auth=auth) and not self.is_admin_parent(user=auth.user):
@@ -2266,18 +2509,13 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         registered.alternative_citations = self.alternative_citations
         registered.node_license = original.license.copy() if original.license else None
         registered.wiki_private_uuids = {}
+        # Registrations start out private; the copy has no children yet
+        registered.is_public = False
 
         registered.save()
 
         # Clone each log from the original node for this registration.
-        logs = original.logs
-        for log in logs:
-            log.clone_node_log(registered._id)
-
-        registered.is_public = False
-        for node in registered.get_descendants_recursive():
-            node.is_public = False
-            node.save()
+        NodeLog.clone_node_logs(original, registered)
 
         if parent:
             registered._parent_node = parent
@@ -2288,23 +2526,6 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
             if message:
                 status.push_status_message(message, kind='info', trust=False)
 
-        for node_contained in original.nodes:
-            if not node_contained.is_deleted:
-                child_registration = node_contained.register_node(
-                    schema=schema,
-                    auth=auth,
-                    data=data,
-                    parent=registered,
-                )
-                if child_registration and not child_registration.primary:
-                    registered.nodes.append(child_registration)
-
-        registered.save()
-
-        if settings.ENABLE_ARCHIVER:
-            registered.reload()
-            project_signals.after_create_registration.send(self, dst=registered, user=auth.user)
-
         return registered
 
     def remove_tag(self, tag, auth, save=True):
@@ -2748,6 +2969,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         self.contributors.remove(contributor._id)
 
         self.clear_permission(contributor)
+        permission_cache.clear_request_cache()
         if contributor._id in self.visible_contributor_ids:
             self.visible_contributor_ids.remove(contributor._id)
 
@@ -2983,6 +3205,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
             permissions = permissions or DEFAULT_CONTRIBUTOR_PERMISSIONS
             for permission in permissions:
                 self.add_permission(contrib_to_add, permission, save=False)
+            permission_cache.clear_request_cache()
 
             # Add contributor to recently added list for user
             if auth is not None:
@@ -3122,6 +3345,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable):
         else:
             return False
 
+        permission_cache.clear_request_cache()
+
         # After set permissions callback
         for addon in self.get_addons():
             message = addon.after_set_privacy(self, permissions)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Effective permission resolution for node trees.
+
+For a given user and project tree, the permissions the user holds on every node
+of the tree are resolved with a single query: the direct permissions stored on
+each node, plus read access on every node below a node the user administers.
+Admin access is not inherited through deleted nodes. The result is kept both
+for the rest of the request and in a process-wide LRU keyed by the root's
+``permissions_version``. ``Node.save`` replaces that token whenever
+permissions, deletion or tree membership change, so stale entries are never
+served by any process.
+
+``Node.has_permission`` still reads direct permissions straight off the
+(possibly unsaved) node, and only looks up inherited access here.
+"""
+import collections
+import weakref
+
+from framework.mongo import ObjectId, database, get_cache_key
+from framework.utils import LRUCache
+
+from website import settings
+from website.util.permissions import READ, ADMIN
+
+
+_shared_cache = LRUCache(maxsize=settings.PERMISSION_CACHE_SIZE)
+_request_caches = weakref.WeakKeyDictionary()
+
+# permissions: node id -> frozenset of effective permissions
+# ancestor_ids: node id -> stored ancestor ids
+# admin_ids: ids of the live nodes the user is a direct admin on
+# deleted_ids: ids of the deleted nodes of the tree
+TreePermissions = collections.namedtuple(
+    'TreePermissions',
+    ['permissions', 'ancestor_ids', 'admin_ids', 'deleted_ids'],
+)
+
+
+def _get_request_cache():
+    key = get_cache_key()
+    try:
+        return _request_caches[key]
+    except KeyError:
+        cache = _request_caches[key] = {}
+        return cache
+
+
+def clear_request_cache():
+    _request_caches.pop(get_cache_key(), None)
+
+
+def _root_id(node):
+    return node.ancestor_ids[0] if node.ancestor_ids else node._id
+
+
+def _inherits_admin(ancestor_ids, tree):
+    # Walk up from the parent; a deleted ancestor cuts the node off from
+    # everything above it
+    for ancestor_id in reversed(ancestor_ids):
+        if ancestor_id in tree.deleted_ids:
+            return False
+        if ancestor_id in tree.admin_ids:
+            return True
+    return False
+
+
+def get_tree_permissions(user, root):
+    """Resolve the effective permissions of ``user`` on every node of
+    ``root``'s tree.
+
+    :param User user: User to resolve
+    :param Node root: Top-level node of the tree
+    :returns: :class:`TreePermissions`
+    """
+    key = (user._id, root._id, root.permissions_version)
+    request_cache = _get_request_cache()
+    try:
+        return request_cache[key]
+    except KeyError:
+        pass
+
+    tree = _shared_cache.get(key)
+    if tree is None:
+        documents = list(database['node'].find(
+            {'$or': [{'_id': root._id}, {'ancestor_ids': root._id}]},
+            {'permissions': True, 'ancestor_ids': True, 'is_deleted': True},
+        ))
+        direct = {
+            document['_id']: (document.get('permissions') or {}).get(user._id) or []
+            for document in documents
+        }
+        deleted_ids = frozenset(document['_id'] for document in documents if document.get('is_deleted'))
+        tree = TreePermissions(
+            permissions={},
+            ancestor_ids={document['_id']: list(document.get('ancestor_ids') or []) for document in documents},
+            admin_ids=frozenset(
+                node_id for node_id, permissions in direct.items()
+                if ADMIN in permissions and node_id not in deleted_ids
+            ),
+            deleted_ids=deleted_ids,
+        )
+        for node_id, permissions in direct.items():
+            permissions = set(permissions)
+            if _inherits_admin(tree.ancestor_ids[node_id], tree):
+                permissions.add(READ)
+            tree.permissions[node_id] = frozenset(permissions)
+        _shared_cache.set(key, tree)
+    request_cache[key] = tree
+    return tree
+
+
+def get_admin_node_ids(user, root):
+    """Return the ids of all live nodes in ``root``'s tree on which ``user`` is
+    a direct admin.
+
+    :param User user: User to resolve
+    :param Node root: Top-level node of the tree
+    :returns: frozenset of node ids
+    """
+    return get_tree_permissions(user, root).admin_ids
+
+
+def has_inherited_admin(user, node):
+    """Whether ``user`` is an admin on an ancestor of ``node`` that is not cut
+    off from it by a deleted node.
+    """
+    from website.project.model import Node
+
+    if user is None or not node.ancestor_ids:
+        return False
+    tree = get_tree_permissions(user, Node.load(_root_id(node)))
+    return _inherits_admin(node.ancestor_ids, tree)
+
+
+def get_subtree_permissions(user, node):
+    """Return the effective permissions of ``user`` on ``node`` and all of its
+    primary descendants, as stored.
+
+    :param User user: User to resolve
+    :param Node node: Top of the subtree
+    :returns: dict mapping node id to a frozenset of permissions
+    """
+    from website.project.model import Node
+
+    if user is None:
+        return {}
+    root_id = _root_id(node)
+    tree = get_tree_permissions(user, node if root_id == node._id else Node.load(root_id))
+    return {
+        node_id: permissions
+        for node_id, permissions in tree.permissions.items()
+        if node_id == node._id or node._id in tree.ancestor_ids[node_id]
+    }
+
+
+def invalidate(node):
+    """Discard cached permissions for the tree containing ``node``. The new
+    version token is written directly so the node's pending changes are not
+    saved as a side effect.
+    """
+    root_id = _root_id(node)
+    database['node'].update(
+        {'_id': root_id},
+        {'$set': {'permissions_version': str(ObjectId())}},
+    )
+    _shared_cache.delete_where(lambda key: key[1] == root_id)
+    clear_request_cache()
@@ -14,6 +14,7 @@ from framework.mongo.utils import get_or_http_error, autoload
 from framework.exceptions import HTTPError
 from framework.status import push_status_message
 
+from website.copier import utils as copier_utils
 from website.exceptions import NodeStateError
 from website.util.permissions import ADMIN
 from website.project.decorators import (
@@ -179,6 +180,36 @@ def register_draft_registration(auth, node, draft, *args, **kwargs):
     registration_choice = data.get('registrationChoice', 'immediate')
     validate_registration_choice(registration_choice)
 
+    # Large trees are registered by a celery task so the request doesn't time out
+    if copier_utils.should_copy_async(node):
+        embargo_end_date = None
+        if registration_choice == 'embargo':
+            embargo_end_date = parse_date(data['embargoEndDate'], ignoretz=True)
+            if not node._is_embargo_date_valid(embargo_end_date):
+                raise HTTPError(http.BAD_REQUEST, data=dict(
+                    message_long='Embargo end date must be more than one day in the future '
+                                 'and no more than four years in the future.'
+                ))
+        try:
+            job = copier_utils.register_draft_async(
+                draft, auth,
+                registration_choice=registration_choice,
+                embargo_end_date=embargo_end_date,
+            )
+        except NodeStateError as err:
+            raise HTTPError(http.BAD_REQUEST, data=dict(message_long=err.message))
+        push_status_message(language.AFTER_REGISTER_ARCHIVING,
+                            kind='info',
+                            trust=False)
+        return {
+            'status': 'initiated',
+            'copy_job_id': job._id,
+            'urls': {
+                'registrations': node.web_url_for('node_registrations'),
+                'copy_job': job.absolute_api_v2_url,
+            }
+        }, http.ACCEPTED
+
     register = draft.register(auth)
     draft.save()
 
@@ -1,8 +1,12 @@
 """
 Files views.
 """
+import httplib as http
+
 from flask import request
 
+from framework.exceptions import HTTPError
+from website import settings
 from website.util import rubeus
 from website.project.decorators import must_be_contributor_or_public
 from website.project.views.node import _view_project
@@ -20,7 +24,17 @@ def collect_file_trees(auth, node, **kwargs):
 
 @must_be_contributor_or_public
 def grid_data(auth, node, **kwargs):
-    """View that returns the formatted data for rubeus.js/hgrid
+    """View that returns the formatted data for rubeus.js/hgrid. With
+    ``lazy``, returns one page of the node's direct children at a time.
     """
     data = request.args.to_dict()
-    return {'data': rubeus.to_hgrid(node, auth, **data)}
+    if not data.pop('lazy', None):
+        return {'data': rubeus.to_hgrid(node, auth, **data)}
+    cursor = data.pop('cursor', None)
+    try:
+        page_size = int(data.pop('page_size', settings.RUBEUS_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(http.BAD_REQUEST)
+    page_size = max(1, min(page_size, settings.RUBEUS_PAGE_SIZE))
+    collector = rubeus.NodeFileCollector(node, auth, **data)
+    return collector.to_hgrid_level(cursor=cursor, page_size=page_size)
@@ -10,7 +10,7 @@ from framework.auth.decorators import collect_auth
 from framework.transactions.handlers import no_auto_transaction
 
 
-from website.views import serialize_log, validate_page_num
+from website.views import serialize_log, serialize_logs, validate_page_num
 from website.project.model import NodeLog
 from website.project.model import has_anonymous_link
 from website.project.decorators import must_be_valid_project
@@ -31,29 +31,41 @@ def get_log(auth, log_id):
     return {'log': serialize_log(log, auth=auth)}
 
 
-def _get_logs(node, count, auth, page=0):
+def _get_logs(node, count, auth, page=0, cursor=None):
     """
 
     :param Node node:
     :param int count:
     :param auth:
+    :param str cursor: Id of the last log of the previous page. If given,
+        logs are read from there on instead of from ``page``
     :return list: List of serialized logs,
-            boolean: if there are more logs
+            int: total number of logs,
+            int: number of pages,
+            str: cursor for the next page, or None if there are no more logs
 
     """
     logs_set = node.get_aggregate_logs_queryset(auth)
     total = logs_set.count()
     pages = math.ceil(total / float(count))
-    validate_page_num(page, pages)
 
-    start = page * count
-    stop = start + count
-    logs = [
-        serialize_log(log, auth=auth, anonymous=has_anonymous_link(node, auth))
-        for log in logs_set[start:stop]
-    ]
+    if cursor:
+        before = NodeLog.load(cursor)
+        if before is None:
+            raise HTTPError(http.BAD_REQUEST, data=dict(
+                message_long='Invalid value for "cursor".'
+            ))
+        logs = list(node.get_aggregate_logs_queryset(auth, before=before).limit(count))
+    else:
+        validate_page_num(page, pages)
+        start = page * count
+        stop = start + count
+        logs = list(logs_set[start:stop])
+
+    next_cursor = logs[-1]._id if len(logs) == count else None
+    logs = serialize_logs(logs, auth=auth, anonymous=has_anonymous_link(node, auth))
 
-    return logs, total, pages
+    return logs, total, pages, next_cursor
 
 @no_auto_transaction
 @collect_auth
@@ -83,5 +95,5 @@ def get_logs(auth, node, **kwargs):
 
     # Serialize up to `count` logs in reverse chronological order; skip
     # logs that the current user / API key cannot access
-    logs, total, pages = _get_logs(node, count, auth, page)
-    return {'logs': logs, 'total': total, 'pages': pages, 'page': page}
+    logs, total, pages, next_cursor = _get_logs(node, count, auth, page, cursor=request.args.get('cursor'))
+    return {'logs': logs, 'total': total, 'pages': pages, 'page': page, 'cursor': next_cursor}
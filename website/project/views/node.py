@@ -19,6 +19,7 @@ from website import language
 
 from website.util import paths
 from website.util import rubeus
+from website.copier import utils as copier_utils
 from website.exceptions import NodeStateError
 from website.project import new_node, new_private_link
 from website.project.decorators import (
@@ -233,6 +234,24 @@ def project_before_template(auth, node, **kwargs):
 @must_be_valid_project
 @http_error_if_disk_saving_mode
 def node_fork_page(auth, node, **kwargs):
+    # Large trees are copied by a celery task so the request doesn't time out
+    if copier_utils.should_copy_async(node):
+        try:
+            job = copier_utils.fork_async(node, auth)
+        except PermissionsError:
+            raise HTTPError(
+                http.FORBIDDEN,
+                redirect_url=node.url
+            )
+        status.push_status_message(language.AFTER_FORK_COPYING, kind='info', trust=False)
+        return {
+            'status': 'initiated',
+            'copy_job_id': job._id,
+            'urls': {
+                'forks': node.web_url_for('node_forks'),
+                'copy_job': job.absolute_api_v2_url,
+            }
+        }, http.ACCEPTED
     try:
         fork = node.fork_node(auth)
     except PermissionsError:
@@ -800,12 +819,14 @@ def _get_badge(user):
     return {}
 
 
-def _get_children(node, auth, indent=0):
+def _get_children(node, auth, indent=0, permissions=None):
 
     children = []
+    if permissions is None:
+        permissions = node.get_subtree_permissions(auth.user)
 
     for child in node.nodes_primary:
-        if not child.is_deleted and child.has_permission(auth.user, ADMIN):
+        if not child.is_deleted and ADMIN in permissions.get(child._id, ()):
             children.append({
                 'id': child._primary_key,
                 'title': child.title,
@@ -813,7 +834,7 @@ def _get_children(node, auth, indent=0):
                 'is_public': child.is_public,
                 'parent_id': child.parent_id,
             })
-            children.extend(_get_children(child, auth, indent + 1))
+            children.extend(_get_children(child, auth, indent + 1, permissions=permissions))
 
     return children
 
@@ -12,7 +12,6 @@ from framework.flask import redirect  # VOL-aware redirect
 
 from framework.auth.decorators import must_be_signed
 
-from website.archiver import ARCHIVER_SUCCESS, ARCHIVER_FAILURE
 
 from website import settings
 from website.exceptions import NodeStateError
@@ -307,19 +306,12 @@ def get_referent_by_identifier(category, value):
 def registration_callbacks(node, payload, *args, **kwargs):
     errors = payload.get('errors')
     src_provider = payload['source']['provider']
-    if errors:
-        node.archive_job.update_target(
-            src_provider,
-            ARCHIVER_FAILURE,
-            errors=errors,
-        )
-    else:
+    if not errors:
         # Dataverse requires two seperate targets, one
         # for draft files and one for published files
         if src_provider == 'dataverse':
             src_provider += '-' + (payload['destination']['name'].split(' ')[-1].lstrip('(').rstrip(')').strip())
-        node.archive_job.update_target(
-            src_provider,
-            ARCHIVER_SUCCESS,
-        )
+    # Addons archived file by file are done once every copy called back
+    if not node.archive_job.record_copy(src_provider, errors=errors):
+        return
     project_signals.archive_callback.send(node)
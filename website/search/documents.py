@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Builders for node search documents.
+
+A :class:`NodeDocumentBuilder` serves a batch of nodes. The first time a
+section needs them, it loads the visible contributors, current wiki pages and
+affiliated institutions of every node in the batch with one query each. Tags
+need no query at all, since a tag's primary key is its name. Rendered wiki text
+is cached by wiki page id; every edit to a wiki creates a new page version with
+a new id, so cached text never goes stale.
+
+A search document is made up of sections, each built from a known set of node
+fields. :func:`get_sections` maps the fields changed by ``Node.save`` to the
+sections that must be rebuilt, so that e.g. a title edit neither renders wikis
+nor loads contributors.
+"""
+import unicodedata
+
+from modularodm import Q
+import six
+
+from framework.utils import LRUCache
+
+from website import settings
+from website.models import User, Node
+from website.project.licenses import serialize_node_license_record
+
+
+COMPONENT_CATEGORIES = set(settings.NODE_CATEGORY_MAP.keys())
+
+# Document sections that can be rebuilt on their own, and the node fields
+# they are built from
+SECTION_FIELDS = {
+    'title': {'title'},
+    'description': {'description'},
+    'contributors': {'visible_contributor_ids'},
+    'tags': {'tags'},
+    'wikis': {'wiki_pages_current'},
+    'license': {'node_license'},
+    'affiliated_institutions': {'_affiliated_institutions'},
+}
+SECTIONS = frozenset(SECTION_FIELDS)
+SECTIONED_FIELDS = frozenset(field for fields in SECTION_FIELDS.values() for field in fields)
+# Partial updates merge objects into the stored document, so keys removed from
+# these sections, e.g. deleted wiki pages, would stay searchable. Changes to
+# them rebuild the whole document.
+OBJECT_SECTIONS = frozenset(['wikis', 'license'])
+
+_wiki_text_cache = LRUCache(maxsize=settings.SEARCH_WIKI_TEXT_CACHE_SIZE)
+
+
+def get_doctype_from_node(node):
+    if node.is_registration:
+        return 'registration'
+    elif node.parent_node is None:
+        # ElasticSearch categorizes top-level projects differently than children
+        return 'project'
+    elif node.category in COMPONENT_CATEGORIES:
+        return 'component'
+    else:
+        return node.category
+
+
+def get_sections(saved_fields):
+    """Return the names of the document sections affected by a change to
+    ``saved_fields``, or None if the whole document must be rebuilt.
+
+    :param iterable saved_fields: Names of the changed node fields, or None if
+        they are unknown
+    """
+    if saved_fields is None:
+        return None
+    saved_fields = set(saved_fields)
+    # Privacy, deletion, category and registration state change the doc type
+    # or whether the document exists at all
+    if saved_fields.intersection(Node.SOLR_UPDATE_FIELDS - SECTIONED_FIELDS):
+        return None
+    sections = {
+        name for name, fields in SECTION_FIELDS.items()
+        if fields.intersection(saved_fields)
+    }
+    if sections.intersection(OBJECT_SECTIONS):
+        return None
+    return sections
+
+
+def get_wiki_text(wiki, node):
+    text = _wiki_text_cache.get(wiki._id)
+    if text is None:
+        text = wiki.raw_text(node)
+        _wiki_text_cache.set(wiki._id, text)
+    return text
+
+
+class NodeDocumentBuilder(object):
+    """Build search documents for a batch of nodes.
+
+    :param iterable nodes: Nodes that documents will be built for
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self._users = None
+        self._wikis = None
+        self._institutions = None
+
+    def _load_users(self):
+        if self._users is None:
+            user_ids = {
+                user_id
+                for node in self.nodes
+                for user_id in node.visible_contributor_ids
+            }
+            self._users = {
+                user._id: user
+                for user in User.find(Q('_id', 'in', list(user_ids)))
+            } if user_ids else {}
+        return self._users
+
+    def _load_wikis(self):
+        from website.addons.wiki.model import NodeWikiPage
+
+        if self._wikis is None:
+            wiki_ids = {
+                wiki_id
+                for node in self.nodes
+                if not node.is_retracted
+                for wiki_id in node.wiki_pages_current.values()
+            }
+            self._wikis = {
+                wiki._id: wiki
+                for wiki in NodeWikiPage.find(Q('_id', 'in', list(wiki_ids)))
+            } if wiki_ids else {}
+        return self._wikis
+
+    def _load_institutions(self):
+        if self._institutions is None:
+            institution_ids = {
+                institution_id
+                for node in self.nodes
+                for institution_id in node._affiliated_institutions._to_primary_keys()
+            }
+            self._institutions = {
+                institution._id: institution
+                for institution in Node.find(Q('_id', 'in', list(institution_ids)), allow_institution=True)
+            } if institution_ids else {}
+        return self._institutions
+
+    def build(self, node, sections=None):
+        """Build the search document for ``node``.
+
+        :param Node node: One of the nodes this builder was created for
+        :param set sections: Names of the sections to build; if None, the full
+            document is built
+        :returns: dict
+        """
+        if sections is None:
+            document = self.build_base(node)
+            sections = SECTIONS
+        else:
+            document = {}
+        for section in sections:
+            document.update(getattr(self, 'build_{}'.format(section))(node))
+        return document
+
+    def build_base(self, node):
+        return {
+            'id': node._id,
+            'category': get_doctype_from_node(node),
+            'public': node.is_public,
+            'url': node.url,
+            'is_registration': node.is_registration,
+            'is_pending_registration': node.is_pending_registration,
+            'is_retracted': node.is_retracted,
+            'is_pending_retraction': node.is_pending_retraction,
+            'embargo_end_date': node.embargo_end_date.strftime('%A, %b. %d, %Y') if node.embargo_end_date else False,
+            'is_pending_embargo': node.is_pending_embargo,
+            'registered_date': node.registered_date,
+            'parent_id': node.parent_id,
+            'date_created': node.date_created,
+            'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
+        }
+
+    def build_title(self, node):
+        try:
+            normalized_title = six.u(node.title)
+        except TypeError:
+            normalized_title = node.title
+        normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
+        return {
+            'title': node.title,
+            'normalized_title': normalized_title,
+        }
+
+    def build_description(self, node):
+        return {'description': node.description}
+
+    def build_contributors(self, node):
+        users = self._load_users()
+        return {
+            'contributors': [
+                {
+                    'fullname': user.fullname,
+                    'url': user.profile_url if user.is_active else None
+                }
+                for user in (users.get(user_id) for user_id in node.visible_contributor_ids)
+                if user is not None
+            ]
+        }
+
+    def build_tags(self, node):
+        return {'tags': [tag_id for tag_id in node.tags._to_primary_keys() if tag_id]}
+
+    def build_wikis(self, node):
+        wikis = {}
+        if not node.is_retracted:
+            pages = self._load_wikis()
+            for wiki_id in node.wiki_pages_current.values():
+                wiki = pages.get(wiki_id)
+                if wiki is not None:
+                    wikis[wiki.page_name] = get_wiki_text(wiki, node)
+        return {'wikis': wikis}
+
+    def build_license(self, node):
+        return {'license': serialize_node_license_record(node.license)}
+
+    def build_affiliated_institutions(self, node):
+        institutions = self._load_institutions()
+        return {
+            'affiliated_institutions': [
+                institutions[institution_id].title
+                for institution_id in node._affiliated_institutions._to_primary_keys()
+                if institution_id in institutions
+            ]
+        }
@@ -2,11 +2,15 @@
 
 from __future__ import division
 
-import copy
+import collections
+import contextlib
 import functools
+import json
 import logging
 import math
 import re
+import threading
+import time
 import unicodedata
 
 from elasticsearch import (
@@ -22,13 +26,19 @@ import six
 
 from framework import sentry
 from framework.celery_tasks import app as celery_app
+from framework.mongo import database
 from framework.mongo.utils import paginated
+from framework.utils import LRUCache
 
 from website import settings
 from website.filters import gravatar
 from website.models import User, Node
-from website.project.licenses import serialize_node_license_record
 from website.search import exceptions
+from website.search.documents import (
+    NodeDocumentBuilder,
+    get_doctype_from_node,
+    get_sections,
+)
 from website.search.util import build_query
 from website.util import sanitize
 from website.views import validate_page_num
@@ -55,6 +65,9 @@ ENGLISH_ANALYZER_PROPERTY = {'type': 'string', 'analyzer': 'english'}
 
 INDEX = settings.ELASTIC_INDEX
 
+# Indices being built by a reindex, keyed by the alias they will replace
+REINDEX_TARGETS_COLLECTION = 'searchreindextarget'
+
 try:
     es = Elasticsearch(
         settings.ELASTIC_URI,
@@ -101,17 +114,228 @@ def requires_search(func):
     return wrapped
 
 
-@requires_search
-def get_aggregations(query, doc_type):
-    query['aggregations'] = {
-        'licenses': {
-            'terms': {
-                'field': 'license.id'
-            }
+_local = threading.local()
+
+
+class IndexingPipeline(object):
+    """Buffer search document writes and submit them through the bulk API.
+
+    Writes to the same document replace each other, so only its latest state
+    is sent. Documents are not refreshed individually; if ``refresh`` is set,
+    every index touched is refreshed once per flush. The buffer is flushed
+    automatically whenever it reaches ``chunk_size`` documents.
+    """
+
+    def __init__(self, chunk_size=None, refresh=False):
+        self.chunk_size = chunk_size or settings.ELASTIC_BULK_CHUNK_SIZE
+        self.refresh = refresh
+        self.succeeded = 0
+        self.failures = []
+        self.missing = []
+        self._actions = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._actions)
+
+    def _add(self, action):
+        key = (action['_index'], action['_type'], action['_id'])
+        self._actions.pop(key, None)
+        self._actions[key] = action
+        if len(self._actions) >= self.chunk_size:
+            self.flush()
+
+    def index(self, index, doc_type, doc_id, body):
+        self._add({
+            '_op_type': 'index',
+            '_index': index,
+            '_type': doc_type,
+            '_id': doc_id,
+            '_source': body,
+        })
+
+    def update(self, index, doc_type, doc_id, doc):
+        """Queue a partial update. If the full document is already queued,
+        the partial document is merged into it instead.
+        """
+        pending = self._actions.get((index, doc_type, doc_id))
+        if pending is not None and pending['_op_type'] == 'index':
+            pending['_source'].update(doc)
+            return
+        if pending is not None and pending['_op_type'] == 'delete':
+            return
+        self._add({
+            '_op_type': 'update',
+            '_index': index,
+            '_type': doc_type,
+            '_id': doc_id,
+            'doc': doc,
+        })
+
+    def delete(self, index, doc_type, doc_id):
+        self._add({
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': doc_type,
+            '_id': doc_id,
+        })
+
+    @requires_search
+    def flush(self):
+        """Submit all buffered writes. Failed documents are logged and
+        collected in ``failures``; deleting a missing document is not a failure.
+        Partial updates of documents that don't exist are collected in
+        ``missing``.
+        """
+        if not self._actions:
+            return
+        actions = self._actions.values()
+        self._actions = collections.OrderedDict()
+        indices = {action['_index'] for action in actions}
+
+        for ok, item in helpers.streaming_bulk(es, actions, chunk_size=self.chunk_size, raise_on_error=False):
+            op_type, result = item.items()[0]
+            if ok or (op_type == 'delete' and result.get('status') == 404):
+                self.succeeded += 1
+            elif op_type == 'update' and result.get('status') == 404:
+                self.missing.append((result.get('_index'), result.get('_type'), result.get('_id')))
+            else:
+                self.failures.append(item)
+                logger.error('Could not {0} search document {1}: {2}'.format(
+                    op_type, result.get('_id'), result.get('error')
+                ))
+
+        if self.refresh:
+            es.indices.refresh(index=','.join(indices))
+
+
+def current_pipeline():
+    """Return the innermost active :class:`IndexingPipeline`, if any."""
+    pipelines = getattr(_local, 'pipelines', None)
+    return pipelines[-1] if pipelines else None
+
+
+@contextlib.contextmanager
+def bulk_indexing(refresh=False, chunk_size=None):
+    """Collect every document written by ``update_node``, ``update_file``,
+    ``update_user``, ``update_institution`` and ``delete_doc`` inside the block
+    and submit them in bulk on exit. Nested blocks share the outermost pipeline.
+    """
+    pipeline = current_pipeline()
+    if pipeline is not None:
+        yield pipeline
+        return
+
+    pipeline = IndexingPipeline(chunk_size=chunk_size, refresh=refresh)
+    _local.pipelines = [pipeline]
+    try:
+        yield pipeline
+    finally:
+        _local.pipelines = []
+    pipeline.flush()
+
+
+# Alias -> (indices being built to replace it, time they were looked up)
+_reindex_targets = {}
+
+
+def start_dual_writes(alias, index):
+    """Send every later write to ``alias`` to ``index`` as well, in every
+    process, until :func:`stop_dual_writes` is called. Processes notice within
+    ``SEARCH_DUAL_WRITE_CHECK_INTERVAL`` seconds.
+    """
+    database[REINDEX_TARGETS_COLLECTION].update(
+        {'_id': alias},
+        {'$addToSet': {'indices': index}},
+        upsert=True,
+    )
+    _reindex_targets.pop(alias, None)
+
+
+def stop_dual_writes(alias):
+    database[REINDEX_TARGETS_COLLECTION].remove({'_id': alias})
+    _reindex_targets.pop(alias, None)
+
+
+def get_write_indices(index):
+    """Return ``index`` and the indices being built to replace it, which
+    writes to ``index`` are copied to.
+    """
+    now = time.time()
+    targets, checked = _reindex_targets.get(index, ((), None))
+    if checked is None or now - checked >= settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL:
+        document = database[REINDEX_TARGETS_COLLECTION].find_one({'_id': index})
+        targets = tuple(document['indices']) if document else ()
+        _reindex_targets[index] = (targets, now)
+    return [index] + [target for target in targets if target != index]
+
+
+def _index_doc(index, doc_type, doc_id, body):
+    pipeline = current_pipeline()
+    for write_index in get_write_indices(index):
+        if pipeline is not None:
+            pipeline.index(write_index, doc_type, doc_id, dict(body))
+        else:
+            es.index(index=write_index, doc_type=doc_type, id=doc_id, body=body, refresh=True)
+
+
+def _update_doc(index, doc_type, doc_id, doc):
+    """Apply a partial update to a search document. Returns False if the
+    document does not exist in the index or an index being built to replace
+    it. Within :func:`bulk_indexing` the update is queued and missing documents
+    are reported in the pipeline's ``missing`` instead.
+    """
+    pipeline = current_pipeline()
+    updated = True
+    for write_index in get_write_indices(index):
+        if pipeline is not None:
+            pipeline.update(write_index, doc_type, doc_id, doc)
+            continue
+        try:
+            es.update(index=write_index, doc_type=doc_type, id=doc_id, body={'doc': doc}, refresh=True)
+        except NotFoundError:
+            updated = False
+    return updated
+
+
+def _delete_doc(index, doc_type, doc_id):
+    pipeline = current_pipeline()
+    for write_index in get_write_indices(index):
+        if pipeline is not None:
+            pipeline.delete(write_index, doc_type, doc_id)
+        else:
+            es.delete(index=write_index, doc_type=doc_type, id=doc_id, refresh=True, ignore=[404])
+
+
+LICENSE_AGGREGATION = {
+    'licenses': {
+        'terms': {
+            'field': 'license.id'
         }
     }
+}
 
-    res = es.search(index=INDEX, doc_type=doc_type, search_type='count', body=query)
+TYPE_AGGREGATION = {
+    'counts': {
+        'terms': {
+            'field': '_type',
+        }
+    }
+}
+
+TAG_AGGREGATION = {
+    'tag_cloud': {
+        'terms': {'field': 'tags'}
+    }
+}
+
+# Formatted results of anonymous searches, keyed by (index, doc_type, query)
+_search_cache = LRUCache(
+    maxsize=settings.SEARCH_RESULTS_CACHE_SIZE,
+    ttl=settings.SEARCH_RESULTS_CACHE_TTL,
+)
+
+
+def parse_aggregations(res):
     ret = {
         doc_type: {
             item['key']: item['doc_count']
@@ -123,44 +347,74 @@ def get_aggregations(query, doc_type):
     return ret
 
 
-@requires_search
-def get_counts(count_query, clean=True):
-    count_query['aggregations'] = {
-        'counts': {
-            'terms': {
-                'field': '_type',
-            }
-        }
-    }
-
-    res = es.search(index=INDEX, doc_type=None, search_type='count', body=count_query)
+def parse_counts(res):
     counts = {x['key']: x['doc_count'] for x in res['aggregations']['counts']['buckets'] if x['key'] in ALIASES.keys()}
 
     counts['total'] = sum([val for val in counts.values()])
     return counts
 
 
-@requires_search
-def get_tags(query, index):
-    query['aggregations'] = {
-        'tag_cloud': {
-            'terms': {'field': 'tags'}
-        }
+def parse_tags(res):
+    return res['aggregations']['tag_cloud']['buckets']
+
+
+def _without_pagination(query):
+    return {
+        key: value
+        for key, value in query.iteritems()
+        if key not in ('from', 'size', 'sort')
     }
 
-    results = es.search(index=index, doc_type=None, body=query)
-    tags = results['aggregations']['tag_cloud']['buckets']
 
-    return tags
+def _without_filter(query):
+    """Return a shallow copy of ``query`` with the filter of a filtered query
+    removed, leaving the original untouched.
+    """
+    try:
+        filtered = query['query']['filtered']
+    except (KeyError, TypeError):
+        return query
+    if 'filter' not in filtered:
+        return query
+    filtered = {key: value for key, value in filtered.iteritems() if key != 'filter'}
+    return dict(query, query=dict(query['query'], filtered=filtered))
+
+
+def _raise_for_response(response):
+    """Raise the same exceptions as ``requires_search`` for a failed entry of
+    a multi-search response.
+    """
+    error = response.get('error')
+    if not error:
+        return
+    if 'IndexMissingException' in error:
+        raise exceptions.IndexNotFoundError(error)
+    if 'ParseException' in error:
+        raise exceptions.MalformedQueryError(error)
+    raise exceptions.SearchException(error)
+
+
+def _search_header(index, doc_type=None, count=False):
+    header = {'index': index}
+    if doc_type:
+        header['type'] = doc_type
+    if count:
+        header['search_type'] = 'count'
+    return header
 
 
 @requires_search
-def search(query, index=None, doc_type='_all'):
+def search(query, index=None, doc_type='_all', cache=False):
     """Search for a query
 
+    Hits, the tag cloud, license aggregations and per-type counts are fetched
+    together in a single multi-search request.
+
     :param query: The substring of the username/project name/tag to search for
     :param index:
     :param doc_type:
+    :param bool cache: Serve and store results in a short-lived cache. Only
+        use for searches whose results do not depend on the current user.
 
     :return: List of dictionaries, each containing the results, counts, tags and typeAliases
         results: All results returned by the query, that are within the index and search type
@@ -169,57 +423,65 @@ def search(query, index=None, doc_type='_all'):
         typeAliases: the doc_types that exist in the search database
     """
     index = index or INDEX
-    tag_query = copy.deepcopy(query)
-    aggs_query = copy.deepcopy(query)
-    count_query = copy.deepcopy(query)
-
-    for key in ['from', 'size', 'sort']:
-        try:
-            del tag_query[key]
-            del aggs_query[key]
-            del count_query[key]
-        except KeyError:
-            pass
-
-    tags = get_tags(tag_query, index)
-    try:
-        del aggs_query['query']['filtered']['filter']
-        del count_query['query']['filtered']['filter']
-    except KeyError:
-        pass
-    aggregations = get_aggregations(aggs_query, doc_type=doc_type)
-    counts = get_counts(count_query, index)
-
-    # Run the real query and get the results
-    raw_results = es.search(index=index, doc_type=doc_type, body=query)
+    if cache:
+        cache_key = (index, doc_type, json.dumps(query, sort_keys=True))
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+    tag_query = _without_pagination(query)
+    count_query = _without_filter(tag_query)
+
+    body = [
+        _search_header(index, doc_type), query,
+        _search_header(index, count=True), dict(tag_query, aggregations=TAG_AGGREGATION),
+        _search_header(index, doc_type, count=True), dict(count_query, aggregations=LICENSE_AGGREGATION),
+        _search_header(index, count=True), dict(count_query, aggregations=TYPE_AGGREGATION),
+    ]
+    responses = es.msearch(body=body)['responses']
+    for response in responses:
+        _raise_for_response(response)
+    raw_results, tag_results, aggs_results, count_results = responses
 
     results = [hit['_source'] for hit in raw_results['hits']['hits']]
     return_value = {
         'results': format_results(results),
-        'counts': counts,
-        'aggs': aggregations,
-        'tags': tags,
+        'counts': parse_counts(count_results),
+        'aggs': parse_aggregations(aggs_results),
+        'tags': parse_tags(tag_results),
         'typeAliases': ALIASES
     }
+    if cache:
+        _search_cache.set(cache_key, return_value)
+        return dict(return_value)
     return return_value
 
 
 def format_results(results):
+    # Load the parents of every hit on the page in one query
+    parents = load_parents(
+        result.get('parent_id')
+        for result in results
+        if result.get('category') != 'user'
+    )
     ret = []
     for result in results:
         if result.get('category') == 'user':
             result['url'] = '/profile/' + result['id']
         elif result.get('category') == 'file':
-            parent_info = load_parent(result.get('parent_id'))
+            parent_info = parents.get(result.get('parent_id'))
             result['parent_url'] = parent_info.get('url') if parent_info else None
             result['parent_title'] = parent_info.get('title') if parent_info else None
         elif result.get('category') in {'project', 'component', 'registration'}:
-            result = format_result(result, result.get('parent_id'))
+            result = format_result(result, result.get('parent_id'), parents=parents)
         ret.append(result)
     return ret
 
-def format_result(result, parent_id=None):
-    parent_info = load_parent(parent_id)
+def format_result(result, parent_id=None, parents=None):
+    if parents is not None:
+        parent_info = parents.get(parent_id)
+    else:
+        parent_info = load_parent(parent_id)
     formatted_result = {
         'contributors': result['contributors'],
         'wiki_link': result['url'] + 'wiki/',
@@ -252,6 +514,23 @@ def load_parent(parent_id):
     parent = Node.load(parent_id)
     if parent is None:
         return None
+    return serialize_parent(parent)
+
+
+def load_parents(parent_ids):
+    """Return a dict mapping each existing id in ``parent_ids`` to its
+    serialized parent info, loading all of them with a single query.
+    """
+    parent_ids = list({parent_id for parent_id in parent_ids if parent_id})
+    if not parent_ids:
+        return {}
+    return {
+        parent._id: serialize_parent(parent)
+        for parent in Node.find(Q('_id', 'in', parent_ids))
+    }
+
+
+def serialize_parent(parent):
     parent_info = {}
     if parent is not None and parent.is_public:
         parent_info['title'] = parent.title
@@ -266,92 +545,68 @@ def load_parent(parent_id):
     return parent_info
 
 
-COMPONENT_CATEGORIES = set(settings.NODE_CATEGORY_MAP.keys())
-
-def get_doctype_from_node(node):
-    if node.is_registration:
-        return 'registration'
-    elif node.parent_node is None:
-        # ElasticSearch categorizes top-level projects differently than children
-        return 'project'
-    elif node.category in COMPONENT_CATEGORIES:
-        return 'component'
-    else:
-        return node.category
-
 @celery_app.task(bind=True, max_retries=5, default_retry_delay=60)
-def update_node_async(self, node_id, index=None, bulk=False):
+def update_node_async(self, node_id, index=None, bulk=False, saved_fields=None):
     node = Node.load(node_id)
     try:
-        update_node(node=node, index=index, bulk=bulk)
+        # Send the node and all of its files in one bulk request
+        with bulk_indexing(refresh=True) as pipeline:
+            update_node(node=node, index=index, bulk=bulk, saved_fields=saved_fields)
+        if saved_fields is not None and node._id in {doc_id for _, _, doc_id in pipeline.missing}:
+            # A partial update can't be applied to a node that isn't indexed yet
+            with bulk_indexing(refresh=True):
+                update_node(node=node, index=index, bulk=bulk)
     except Exception as exc:
         self.retry(exc=exc)
 
 @requires_search
-def update_node(node, index=None, bulk=False):
+def update_node(node, index=None, bulk=False, saved_fields=None, builder=None):
+    """Index, partially update or delete the search document of ``node`` and
+    its files.
+
+    :param Node node: Node to update
+    :param str index: Index of the node
+    :param bool bulk: Return the full document instead of indexing it
+    :param iterable saved_fields: Node fields changed since the node was last
+        indexed. Only the document sections built from them are updated. If
+        None, the whole document is rebuilt.
+    :param NodeDocumentBuilder builder: Builder shared by a batch of nodes
+    """
     index = index or INDEX
-    from website.addons.wiki.model import NodeWikiPage
+    builder = builder or NodeDocumentBuilder([node])
+    sections = None if bulk else get_sections(saved_fields)
 
     category = get_doctype_from_node(node)
-
     elastic_document_id = node._id
-    parent_id = node.parent_id
 
-    from website.files.models.osfstorage import OsfStorageFile
-    for file_ in paginated(OsfStorageFile, Q('node', 'eq', node)):
-        update_file(file_, index=index)
+    # File documents include the title of their node
+    if sections is None or 'title' in sections:
+        from website.files.models.osfstorage import OsfStorageFile
+        for file_ in paginated(OsfStorageFile, Q('node', 'eq', node)):
+            update_file(file_, index=index)
 
     if node.is_deleted or not node.is_public or node.archiving:
-        delete_doc(elastic_document_id, node)
-    else:
-        try:
-            normalized_title = six.u(node.title)
-        except TypeError:
-            normalized_title = node.title
-        normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
-
-        elastic_document = {
-            'id': elastic_document_id,
-            'contributors': [
-                {
-                    'fullname': x.fullname,
-                    'url': x.profile_url if x.is_active else None
-                }
-                for x in node.visible_contributors
-                if x is not None
-            ],
-            'title': node.title,
-            'normalized_title': normalized_title,
-            'category': category,
-            'public': node.is_public,
-            'tags': [tag._id for tag in node.tags if tag],
-            'description': node.description,
-            'url': node.url,
-            'is_registration': node.is_registration,
-            'is_pending_registration': node.is_pending_registration,
-            'is_retracted': node.is_retracted,
-            'is_pending_retraction': node.is_pending_retraction,
-            'embargo_end_date': node.embargo_end_date.strftime('%A, %b. %d, %Y') if node.embargo_end_date else False,
-            'is_pending_embargo': node.is_pending_embargo,
-            'registered_date': node.registered_date,
-            'wikis': {},
-            'parent_id': parent_id,
-            'date_created': node.date_created,
-            'license': serialize_node_license_record(node.license),
-            'affiliated_institutions': [inst.name for inst in node.affiliated_institutions],
-            'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
-        }
-        if not node.is_retracted:
-            for wiki in [
-                NodeWikiPage.load(x)
-                for x in node.wiki_pages_current.values()
-            ]:
-                elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
-
+        delete_doc(elastic_document_id, node, index=index)
+    elif sections is None:
+        elastic_document = builder.build(node)
         if bulk:
             return elastic_document
         else:
-            es.index(index=index, doc_type=category, id=elastic_document_id, body=elastic_document, refresh=True)
+            _index_doc(index, category, elastic_document_id, elastic_document)
+    elif sections:
+        updated = _update_doc(index, category, elastic_document_id, builder.build(node, sections))
+        if not updated:
+            _index_doc(index, category, elastic_document_id, builder.build(node))
+
+def update_nodes(nodes, index=None):
+    """Update the search documents of ``nodes``, loading the related records
+    of all of them together.
+    """
+    nodes = list(nodes)
+    builder = NodeDocumentBuilder(nodes)
+    with bulk_indexing():
+        for node in nodes:
+            update_node(node, index=index, builder=builder)
 
 def bulk_update_nodes(serialize, nodes, index=None):
     """Updates the list of input projects
@@ -359,22 +614,16 @@ def bulk_update_nodes(serialize, nodes, index=None):
     :param function Node-> dict serialize:
     :param Node[] nodes: Projects, components or registrations
     :param str index: Index of the nodes
-    :return:
+    :return: The :class:`IndexingPipeline` the updates were submitted through
     """
     index = index or INDEX
-    actions = []
-    for node in nodes:
-        serialized = serialize(node)
-        if serialized:
-            actions.append({
-                '_op_type': 'update',
-                '_index': index,
-                '_id': node._id,
-                '_type': get_doctype_from_node(node),
-                'doc': serialized
-            })
-    if actions:
-        return helpers.bulk(es, actions)
+    with bulk_indexing() as pipeline:
+        for node in nodes:
+            serialized = serialize(node)
+            if serialized:
+                for write_index in get_write_indices(index):
+                    pipeline.update(write_index, get_doctype_from_node(node), node._id, serialized)
+    return pipeline
 
 def serialize_contributors(node):
     return {
@@ -397,7 +646,7 @@ def update_user(user, index=None):
     index = index or INDEX
     if not user.is_active:
         try:
-            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+            _delete_doc(index, 'user', user._id)
         except NotFoundError:
             pass
         return
@@ -436,7 +685,7 @@ def update_user(user, index=None):
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
     }
 
-    es.index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
+    _index_doc(index, 'user', user._id, user_doc)
 
 @requires_search
 def update_file(file_, index=None, delete=False):
@@ -444,13 +693,7 @@ def update_file(file_, index=None, delete=False):
     index = index or INDEX
 
     if not file_.node.is_public or delete or file_.node.is_deleted or file_.node.archiving:
-        es.delete(
-            index=index,
-            doc_type='file',
-            id=file_._id,
-            refresh=True,
-            ignore=[404]
-        )
+        _delete_doc(index, 'file', file_._id)
         return
 
     # We build URLs manually here so that this function can be
@@ -475,20 +718,14 @@ def update_file(file_, index=None, delete=False):
         'is_retracted': file_.node.is_retracted
     }
 
-    es.index(
-        index=index,
-        doc_type='file',
-        body=file_doc,
-        id=file_._id,
-        refresh=True
-    )
+    _index_doc(index, 'file', file_._id, file_doc)
 
 @requires_search
 def update_institution(institution, index=None):
     index = index or INDEX
     id_ = institution._id
     if institution.is_deleted:
-        es.delete(index=index, doc_type='institution', id=id_, refresh=True, ignore=[404])
+        _delete_doc(index, 'institution', id_)
     else:
         institution_doc = {
             'id': id_,
@@ -498,7 +735,7 @@ def update_institution(institution, index=None):
             'name': institution.name,
         }
 
-        es.index(index=index, doc_type='institution', body=institution_doc, id=id_, refresh=True)
+        _index_doc(index, 'institution', id_, institution_doc)
 
 @requires_search
 def delete_all():
@@ -564,7 +801,7 @@ def create_index(index=None):
 def delete_doc(elastic_document_id, node, index=None, category=None):
     index = index or INDEX
     category = category or 'registration' if node.is_registration else node.project_or_component
-    es.delete(index=index, doc_type=category, id=elastic_document_id, refresh=True, ignore=[404])
+    _delete_doc(index, category, elastic_document_id)
 
 
 @requires_search
@@ -603,21 +840,30 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
     pages = math.ceil(results['counts'].get('user', 0) / size)
     validate_page_num(page, pages)
 
+    # Load every user on the page, and their projects in common with the
+    # current user, with one query each
+    user_ids = [doc['id'] for doc in docs]
+    users_by_id = {
+        user._id: user
+        for user in User.find(Q('_id', 'in', user_ids))
+    } if user_ids else {}
+    projects_in_common = current_user.get_n_projects_in_common(user_ids) if current_user else {}
+
     users = []
     for doc in docs:
         # TODO: use utils.serialize_user
-        user = User.load(doc['id'])
+        user = users_by_id.get(doc['id'])
+
+        if user is None:
+            logger.error('Could not load user {0}'.format(doc['id']))
+            continue
 
         if current_user and current_user._id == user._id:
             n_projects_in_common = -1
         elif current_user:
-            n_projects_in_common = current_user.n_projects_in_common(user)
+            n_projects_in_common = projects_in_common.get(user._id, 0)
         else:
             n_projects_in_common = 0
-
-        if user is None:
-            logger.error('Could not load user {0}'.format(doc['id']))
-            continue
         if user.is_active:  # exclude merged, unregistered, etc.
             current_employment = None
             education = None
@@ -1,4 +1,5 @@
 import logging
+import contextlib
 
 from framework.celery_tasks.handlers import enqueue_task
 
@@ -21,12 +22,15 @@ def requires_search(func):
 
 
 @requires_search
-def search(query, index=None, doc_type=None):
+def search(query, index=None, doc_type=None, cache=False):
     index = index or settings.ELASTIC_INDEX
-    return search_engine.search(query, index=index, doc_type=doc_type)
+    return search_engine.search(query, index=index, doc_type=doc_type, cache=cache)
 
 @requires_search
-def update_node(node, index=None, bulk=False, async=True):
+def update_node(node, index=None, bulk=False, async=True, saved_fields=None):
+    if saved_fields is not None:
+        # Only the parts of the document built from these fields are updated
+        saved_fields = list(saved_fields)
     if async:
         node_id = node._id
         # We need the transaction to be committed before trying to run celery tasks.
@@ -34,17 +38,33 @@ def update_node(node, index=None, bulk=False, async=True):
         # database in order for method that updates the Node's elastic search document
         # to run correctly.
         if settings.USE_CELERY:
-            enqueue_task(search_engine.update_node_async.s(node_id=node_id, index=index, bulk=bulk))
+            enqueue_task(search_engine.update_node_async.s(node_id=node_id, index=index, bulk=bulk, saved_fields=saved_fields))
         else:
-            search_engine.update_node_async(node_id=node_id, index=index, bulk=bulk)
+            search_engine.update_node_async(node_id=node_id, index=index, bulk=bulk, saved_fields=saved_fields)
     else:
         index = index or settings.ELASTIC_INDEX
-        return search_engine.update_node(node, index=index, bulk=bulk)
+        return search_engine.update_node(node, index=index, bulk=bulk, saved_fields=saved_fields)
+
+@requires_search
+def update_nodes(nodes, index=None):
+    index = index or settings.ELASTIC_INDEX
+    search_engine.update_nodes(nodes, index=index)
 
 @requires_search
 def bulk_update_nodes(serialize, nodes, index=None):
     index = index or settings.ELASTIC_INDEX
-    search_engine.bulk_update_nodes(serialize, nodes, index=index)
+    return search_engine.bulk_update_nodes(serialize, nodes, index=index)
+
+@contextlib.contextmanager
+def bulk_indexing(refresh=False):
+    """Buffer the index writes made inside the block and send them in bulk
+    on exit. Yields the engine's pipeline, or None if search is disabled.
+    """
+    if search_engine is None:
+        yield None
+    else:
+        with search_engine.bulk_indexing(refresh=refresh) as pipeline:
+            yield pipeline
 
 @requires_search
 def delete_node(node, index=None):
@@ -61,20 +61,24 @@ def handle_search_errors(func):
 
 
 @handle_search_errors
+@collect_auth
 def search_search(**kwargs):
     _type = kwargs.get('type', None)
+    # Results only contain public content, but only anonymous searches are
+    # cached so that logged-in users always see their own changes promptly
+    cache = not kwargs['auth'].logged_in
 
     tick = time.time()
     results = {}
 
     if request.method == 'POST':
-        results = search.search(request.get_json(), doc_type=_type)
+        results = search.search(request.get_json(), doc_type=_type, cache=cache)
     elif request.method == 'GET':
         q = request.args.get('q', '*')
         # TODO Match javascript params?
         start = request.args.get('from', '0')
         size = request.args.get('size', '10')
-        results = search.search(build_query(q, start, size), doc_type=_type)
+        results = search.search(build_query(q, start, size), doc_type=_type, cache=cache)
 
     results['time'] = round(time.time() - tick, 2)
     return results
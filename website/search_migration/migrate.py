@@ -4,6 +4,7 @@
 from __future__ import absolute_import
 
 import logging
+import time
 
 from elasticsearch import helpers
 from modularodm.query.querydialect import DefaultQueryDialect as Q
@@ -15,6 +16,7 @@ from website.models import Node
 from website.app import init_app
 import website.search.search as search
 from scripts import utils as script_utils
+from website.search import elastic_search
 from website.search.elastic_search import es
 
 
@@ -27,12 +29,15 @@ def migrate_nodes(index):
     increment = 1000
     total_pages = (total // increment) + 1
     pages = paginated(Node, query=query, increment=increment, each=False)
-    for page_number, page in enumerate(pages):
-        logger.info('Updating page {} / {}'.format(page_number + 1, total_pages))
-        Node.bulk_update_search(page)
-        Node._clear_caches()
+    with search.bulk_indexing() as pipeline:
+        for page_number, page in enumerate(pages):
+            logger.info('Updating page {} / {}'.format(page_number + 1, total_pages))
+            Node.bulk_update_search(page, index=index)
+            Node._clear_caches()
 
     logger.info('Nodes migrated: {}'.format(total))
+    if pipeline and pipeline.failures:
+        logger.error('{} node or file documents could not be indexed'.format(len(pipeline.failures)))
 
 
 def migrate_users(index):
@@ -40,13 +45,16 @@ def migrate_users(index):
     n_migr = 0
     n_iter = 0
     users = paginated(User, query=None, increment=1000, each=True)
-    for user in users:
-        if user.is_active:
-            search.update_user(user, index=index)
-            n_migr += 1
-        n_iter += 1
+    with search.bulk_indexing() as pipeline:
+        for user in users:
+            if user.is_active:
+                search.update_user(user, index=index)
+                n_migr += 1
+            n_iter += 1
 
     logger.info('Users iterated: {0}\nUsers migrated: {1}'.format(n_iter, n_migr))
+    if pipeline and pipeline.failures:
+        logger.error('{} users could not be indexed'.format(len(pipeline.failures)))
 
 
 def migrate(delete, index=None, app=None):
@@ -61,11 +69,15 @@ def migrate(delete, index=None, app=None):
     ctx.push()
 
     new_index = set_up_index(index)
+    # Copy live writes to the new index so that none are lost at the swap
+    elastic_search.start_dual_writes(index, new_index)
+    time.sleep(settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL)
 
     migrate_nodes(new_index)
     migrate_users(new_index)
 
     set_up_alias(index, new_index)
+    elastic_search.stop_dual_writes(index)
 
     if delete:
         delete_old(new_index)
@@ -95,12 +107,18 @@ def set_up_index(idx):
 
 
 def set_up_alias(old_index, index):
-    alias = es.indices.get_aliases(index=old_index)
-    if alias:
+    alias = es.indices.get_aliases(index=old_index) or {}
+    # Move the alias in one request so that searches never find it missing
+    actions = [
+        {'remove': {'index': name, 'alias': old_index}}
+        for name, aliases in alias.items()
+        if old_index in aliases.get('aliases', {})
+    ]
+    if actions:
         logger.info('Removing old aliases to {}'.format(old_index))
-        es.indices.delete_alias(index=old_index, name='_all', ignore=404)
     logger.info('Creating new alias from {0} to {1}'.format(old_index, index))
-    es.indices.put_alias(old_index, index)
+    actions.append({'add': {'index': index, 'alias': old_index}})
+    es.indices.update_aliases(body={'actions': actions})
 
 
 def delete_old(index):
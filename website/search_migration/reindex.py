@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''Parallel, resumable reindexing of the search-enabled models.
+
+The ``_id`` keyspace of every model is split into shards of roughly equal
+size, and a pool of worker processes indexes the shards into a new versioned
+index through bulk requests. Each shard's progress is stored in a checkpoint
+collection after every batch, so an interrupted run resumes where it stopped.
+The alias is only moved to the new index once every shard is done. Searches
+use the old index until then. Writes to the alias are copied to the new index
+from before the first shard is read until the alias has moved, so documents
+changed after their shard was indexed are not lost at the swap.
+'''
+from __future__ import absolute_import, division
+
+import collections
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from elasticsearch import Elasticsearch
+from modularodm import Q
+
+from framework.auth import User
+from framework.mongo import database, handlers
+from website import settings
+from website.app import init_app
+from website.models import Node
+from website.search import elastic_search
+import website.search.search as search
+from website.search_migration.migrate import set_up_index, set_up_alias, delete_old
+from scripts import utils as script_utils
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = 'searchreindexcheckpoint'
+
+# Number of records loaded and indexed between checkpoints
+BATCH_SIZE = 500
+
+
+def index_nodes(nodes, index):
+    search.update_nodes(nodes, index=index)
+
+
+def index_users(users, index):
+    for user in users:
+        if user.is_active:
+            search.update_user(user, index=index)
+
+
+# Model name -> (model, query for the records to index, indexing function)
+MODELS = collections.OrderedDict([
+    ('node', (Node, Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False), index_nodes)),
+    ('user', (User, None, index_users)),
+])
+
+
+def checkpoints():
+    return database[CHECKPOINT_COLLECTION]
+
+
+def get_shard_bounds(model, n_shards):
+    """Split the ``_id`` keyspace of ``model`` into at most ``n_shards``
+    contiguous ranges holding roughly the same number of records.
+
+    :returns: list of ``(lower, upper)`` tuples; ``lower`` is inclusive and
+        ``upper`` exclusive, and None means unbounded
+    """
+    collection = database[model._name]
+    count = collection.count()
+    bounds = []
+    for shard in range(1, n_shards):
+        cursor = collection.find({}, {'_id': True}).sort('_id', 1).skip(shard * count // n_shards).limit(1)
+        for record in cursor:
+            if not bounds or record['_id'] != bounds[-1]:
+                bounds.append(record['_id'])
+    edges = [None] + bounds + [None]
+    return zip(edges[:-1], edges[1:])
+
+
+def create_checkpoints(alias, index, n_shards):
+    docs = []
+    for name, (model, _, _) in MODELS.items():
+        for number, (lower, upper) in enumerate(get_shard_bounds(model, n_shards)):
+            docs.append({
+                '_id': '{0}:{1}:{2}'.format(index, name, number),
+                'alias': alias,
+                'index': index,
+                'model': name,
+                'lower': lower,
+                'upper': upper,
+                'last_id': None,
+                'done': False,
+                'indexed': 0,
+                'failed': 0,
+            })
+    checkpoints().insert(docs)
+    return docs
+
+
+def _init_worker():
+    # Connections opened by the parent process must not be shared with
+    # forked workers
+    handlers.CLIENT_POOL = handlers.ClientPool()
+    elastic_search.es = Elasticsearch(
+        settings.ELASTIC_URI,
+        request_timeout=settings.ELASTIC_TIMEOUT
+    )
+
+
+def reindex_shard(checkpoint_id, batch_size=BATCH_SIZE):
+    """Index the records of one shard, starting after its last checkpoint.
+
+    :returns: ``(pid, model name, documents indexed, seconds spent)``
+    """
+    checkpoint = checkpoints().find_one({'_id': checkpoint_id})
+    model, query, index_records = MODELS[checkpoint['model']]
+    if checkpoint['lower'] is not None:
+        query = Q('_id', 'gte', checkpoint['lower']) & query if query else Q('_id', 'gte', checkpoint['lower'])
+    if checkpoint['upper'] is not None:
+        query = Q('_id', 'lt', checkpoint['upper']) & query if query else Q('_id', 'lt', checkpoint['upper'])
+
+    last_id = checkpoint['last_id']
+    indexed = 0
+    start = time.time()
+    while True:
+        page_query = Q('_id', 'gt', last_id) & query if last_id is not None else query
+        page = list(model.find(page_query).sort('_id').limit(batch_size))
+        if not page:
+            break
+        with search.bulk_indexing() as pipeline:
+            index_records(page, checkpoint['index'])
+        last_id = page[-1]._id
+        indexed += pipeline.succeeded
+        checkpoints().update(
+            {'_id': checkpoint_id},
+            {
+                '$set': {'last_id': last_id},
+                '$inc': {'indexed': pipeline.succeeded, 'failed': len(pipeline.failures)},
+            }
+        )
+        model._clear_caches()
+
+    checkpoints().update({'_id': checkpoint_id}, {'$set': {'done': True}})
+    elapsed = time.time() - start
+    logger.info('Shard {0} done: {1} documents in {2:.1f}s ({3:.1f} docs/sec)'.format(
+        checkpoint_id, indexed, elapsed, indexed / elapsed if elapsed else 0
+    ))
+    return os.getpid(), checkpoint['model'], indexed, elapsed
+
+
+def reindex(alias=None, workers=4, shards_per_worker=4, resume=True, delete=False):
+    """Index every search-enabled record into a new version of ``alias``,
+    then point ``alias`` at it.
+
+    :param str alias: Alias searches are made against
+    :param int workers: Number of worker processes. With fewer than two,
+        shards are indexed in this process.
+    :param int shards_per_worker: Shards per model for every worker; more
+        shards balance the load better and lose less work on a crash
+    :param bool resume: Continue an interrupted run for ``alias`` if any
+    :param bool delete: Delete the previous index version afterwards
+    :returns: dict mapping worker pid to its ``(documents, seconds)``
+    """
+    alias = alias or settings.ELASTIC_INDEX
+    pending = list(checkpoints().find({'alias': alias}))
+    if pending and resume:
+        index = pending[0]['index']
+        logger.info('Resuming reindex of {0} into {1}'.format(alias, index))
+    else:
+        checkpoints().remove({'alias': alias})
+        index = set_up_index(alias)
+        pending = create_checkpoints(alias, index, max(workers, 1) * shards_per_worker)
+    elastic_search.start_dual_writes(alias, index)
+    # Wait for every process to copy its writes before any record is read
+    time.sleep(settings.SEARCH_DUAL_WRITE_CHECK_INTERVAL)
+    shard_ids = [checkpoint['_id'] for checkpoint in pending if not checkpoint['done']]
+    logger.info('Reindexing {0} shards into {1} with {2} workers'.format(len(shard_ids), index, workers))
+
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker)
+        try:
+            results = list(pool.imap_unordered(reindex_shard, shard_ids))
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        results = [reindex_shard(shard_id) for shard_id in shard_ids]
+
+    throughput = collections.defaultdict(lambda: [0, 0.0])
+    for pid, _, indexed, elapsed in results:
+        throughput[pid][0] += indexed
+        throughput[pid][1] += elapsed
+    for pid, (indexed, elapsed) in sorted(throughput.items()):
+        logger.info('Worker {0}: {1} documents in {2:.1f}s ({3:.1f} docs/sec)'.format(
+            pid, indexed, elapsed, indexed / elapsed if elapsed else 0
+        ))
+
+    failed = sum(checkpoint['failed'] for checkpoint in checkpoints().find({'alias': alias}))
+    if failed:
+        logger.error('{} documents could not be indexed'.format(failed))
+
+    elastic_search.es.indices.refresh(index=index)
+    set_up_alias(alias, index)
+    elastic_search.stop_dual_writes(alias)
+    checkpoints().remove({'alias': alias})
+    if delete:
+        delete_old(index)
+    return dict(throughput)
+
+
+def main():
+    app = init_app('website.settings', set_backends=True, routes=True)
+    script_utils.add_file_logger(logger, __file__)
+    # NOTE: Not used as a context manager so that the teardown_request
+    # functions are not triggered
+    ctx = app.test_request_context()
+    ctx.push()
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else multiprocessing.cpu_count()
+    reindex(workers=workers, delete='delete' in sys.argv)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
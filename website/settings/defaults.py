@@ -74,6 +74,16 @@ ALLOW_LOGIN = True
 SEARCH_ENGINE = 'elastic'  # Can be 'elastic', or None
 ELASTIC_URI = 'localhost:9200'
 ELASTIC_TIMEOUT = 10
+# Number of documents sent per bulk indexing request
+ELASTIC_BULK_CHUNK_SIZE = 500
+# Anonymous search results are cached in-process for this many seconds
+SEARCH_RESULTS_CACHE_TTL = 30
+SEARCH_RESULTS_CACHE_SIZE = 500
+# Number of rendered wiki pages kept for building node search documents
+SEARCH_WIKI_TEXT_CACHE_SIZE = 1000
+# Seconds between checks for a reindex in progress, whose new index receives a
+# copy of every write to the live index
+SEARCH_DUAL_WRITE_CHECK_INTERVAL = 5
 ELASTIC_INDEX = 'website'
 SHARE_ELASTIC_URI = ELASTIC_URI
 SHARE_ELASTIC_INDEX = 'share'
@@ -86,6 +96,28 @@ OSF_COOKIE_DOMAIN = None
 COOKIE_NAME = 'osf'
 # server-side verification timeout
 OSF_SESSION_TIMEOUT = 30 * 24 * 60 * 60  # 30 days in seconds
+# 'mongo' or 'cached'; the cached backend keeps recently used sessions in memory
+SESSION_BACKEND = 'cached'
+SESSION_CACHE_SIZE = 10000
+# Seconds a session is served from memory before it is read from the database again
+SESSION_CACHE_TTL = 10
+# Seconds a cached session is used without checking that it is unchanged in the
+# database. A session removed by another process, e.g. on logout, may be served
+# this long
+SESSION_CACHE_CHECK_INTERVAL = 1
+# Unchanged sessions are saved at most this often, so that scripts/clear_sessions.py
+# can tell they are in use
+SESSION_TOUCH_INTERVAL = 24 * 60 * 60
+# Seconds between writes of a user's date_last_login
+SESSION_LAST_LOGIN_INTERVAL = 60
+
+# Seconds page and user activity counts are added up in memory before they are
+# written; see framework/analytics/counters.py
+ANALYTICS_FLUSH_INTERVAL = 10
+# Size in bits, and bits set per page, of the filters of visited pages kept in
+# each session. Around 1000 distinct pages fill a filter to 2% false positives.
+ANALYTICS_BLOOM_BITS = 8192
+ANALYTICS_BLOOM_HASHES = 4
 # TODO: Override SECRET_KEY in local.py in production
 SECRET_KEY = 'CHANGEME'
 
@@ -134,9 +166,27 @@ MFR_TEMP_PATH = os.path.join(BASE_PATH, 'mfrtemp')
 # Use Celery for file rendering
 USE_CELERY = True
 
+# Postcommit tasks run in greenlets shared by every request of a process
+POSTCOMMIT_POOL_SIZE = 30
+# Seconds a postcommit task may run before it is killed
+POSTCOMMIT_TASK_TIMEOUT = 5.0
+# Seconds to wait for a free greenlet before a request runs a task itself
+POSTCOMMIT_SPAWN_TIMEOUT = 0.5
+# Seconds a response waits for its postcommit tasks
+POSTCOMMIT_JOIN_TIMEOUT = 5.0
+# Whether responses also wait for non-critical postcommit tasks, e.g. cache
+# bans. Only disable this when serving with monkey-patched gevent, since
+# greenlets of an unpatched server may not run until its next request.
+POSTCOMMIT_WAIT_FOR_NONCRITICAL = True
+
 # Use GnuPG for encryption
 USE_GNUPG = True
 
+# Seconds to wait for an addon's files in the project files grid
+RUBEUS_ADDON_TIMEOUT = 10
+# Components per page of the lazily loaded files grid
+RUBEUS_PAGE_SIZE = 50
+
 # File rendering timeout (in ms)
 MFR_TIMEOUT = 30000
 
@@ -146,6 +196,15 @@ DB_PORT = os_env.get('OSF_DB_PORT', 27017)
 DB_NAME = 'osf20130903'
 DB_USER = None
 DB_PASS = None
+# MongoDB clients per process; each request or thread holds one at a time
+DB_POOL_MIN_SIZE = 5
+DB_POOL_MAX_SIZE = 100
+# Seconds before an idle client is closed
+DB_POOL_MAX_IDLE_TIME = 300
+# Seconds to wait for a client when all are in use
+DB_POOL_WAIT_TIMEOUT = 10
+# Seconds before an idle client is pinged before reuse
+DB_POOL_CHECK_INTERVAL = 30
 
 # Cache settings
 SESSION_HISTORY_LENGTH = 5
@@ -313,6 +372,29 @@ ARCHIVE_TIMEOUT_TIMEDELTA = timedelta(1)  # 24 hours
 
 ENABLE_ARCHIVER = True
 
+# Skip copying files whose content ARCHIVE_PROVIDER already stores, matched by
+# sha256, and rebuild the archive from the stored versions instead
+ARCHIVE_DEDUPLICATE = True
+# Copy an addon whole rather than file by file if more files than this are new
+ARCHIVE_DEDUPLICATE_MAX_COPIES = 50
+
+# Folders of an addon listed at once when crawling its file tree
+WATERBUTLER_CRAWL_WORKERS = 8
+# Folder listings per second, per provider, shared by all crawls in a process
+WATERBUTLER_CRAWL_RATE_LIMITS = {
+    'default': 10,
+    'box': 5,
+}
+# Retries of a listing that fails with 429 or 5xx, waiting BACKOFF * 2 ** attempt
+# seconds unless the response has Retry-After
+WATERBUTLER_CRAWL_MAX_RETRIES = 3
+WATERBUTLER_CRAWL_BACKOFF = 0.5
+WATERBUTLER_CRAWL_TIMEOUT = 60
+
+# Project trees with at least this many nodes are forked and registered by a
+# celery task instead of during the request
+COPY_ASYNC_MIN_NODES = 10
+
 JWT_SECRET = 'changeme'
 JWT_ALGORITHM = 'HS256'
 
@@ -350,6 +432,7 @@ HIGH_PRI_MODULES = {
     'scripts.refresh_addon_tokens',
     'scripts.retract_registrations',
     'website.archiver.tasks',
+    'website.copier.tasks',
 }
 
 try:
@@ -387,6 +470,7 @@ CELERY_IMPORTS = (
     'framework.analytics.tasks',
     'website.mailchimp_utils',
     'website.notifications.tasks',
+    'website.notifications.emails',
     'website.archiver.tasks',
     'website.search.search',
     'scripts.populate_new_and_noteworthy_projects',
@@ -536,7 +620,33 @@ ENABLE_INSTITUTIONS = False
 ENABLE_VARNISH = False
 ENABLE_ESI = False
 VARNISH_SERVERS = []  # This should be set in local.py or cache invalidation won't work
+# Seconds to collect the bans of a request for before merging them and sending
+# them to Varnish. The postcommit tasks of the request wait this long for them
+VARNISH_BAN_WINDOW = 0.1
+# Timeout of a BAN request, in seconds
+VARNISH_BAN_TIMEOUT = 0.3
+# Longest URL a merged BAN request may have
+VARNISH_BAN_MAX_URL_LENGTH = 2000
+# Keep-alive connections kept open to every Varnish server
+VARNISH_BAN_POOL_SIZE = 4
 ESI_MEDIA_TYPES = {'application/vnd.api+json', 'application/json'}
 
 # Used for gathering meta information about the current build
 GITHUB_API_TOKEN = None
+
+# Number of (user, project tree) entries kept by the in-process effective
+# permission cache; see website/project/permission_cache.py
+PERMISSION_CACHE_SIZE = 10000
+
+# Number of (node, event) entries kept by the in-process cache of resolved
+# notification subscriptions; see website/notifications/resolver.py
+SUBSCRIPTION_CACHE_SIZE = 10000
+
+# Notification digests claimed at a time, and users emailed at a time, by the
+# digest sender; see website/notifications/tasks.py
+NOTIFICATION_DIGEST_BATCH_SIZE = 100
+# Threads each batch of digest emails is sent from
+NOTIFICATION_DIGEST_SEND_WORKERS = 8
+# Seconds before digests claimed by a sender that did not remove them can be
+# claimed by another
+NOTIFICATION_DIGEST_LEASE = 60 * 30
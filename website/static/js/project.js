@@ -49,7 +49,8 @@ NodeActions.forkNode = function() {
             ctx.node.urls.api + 'fork/',
             {}
         ).done(function(response) {
-            window.location = response;
+            // Large projects are forked in the background
+            window.location = response.urls ? response.urls.forks : response;
         }).fail(function(response) {
             $osf.unblock();
             if (response.status === 403) {
@@ -4,8 +4,11 @@ formatted hgrid list/folders.
 """
 import logging
 import datetime
+import functools
 
+import gevent
 import hurry.filesize
+from flask import _app_ctx_stack, _request_ctx_stack
 
 from framework import sentry
 from framework.auth.decorators import Auth
@@ -13,6 +16,7 @@ from framework.auth.decorators import Auth
 from website import settings
 from website.util import paths
 from website.util import sanitize
+from website.util.permissions import READ, WRITE
 from website.settings import DISK_SAVING_MODE
 
 
@@ -146,6 +150,24 @@ def sort_by_name(hgrid_data):
     return return_value
 
 
+def _call_in_context(func, app_ctx, request_ctx):
+    """Call ``func`` with the app and request contexts of the greenlet that
+    spawned it. The contexts are not pushed as contexts would be, so their
+    teardown handlers do not run when ``func`` returns.
+    """
+    if app_ctx is not None:
+        _app_ctx_stack.push(app_ctx)
+    if request_ctx is not None:
+        _request_ctx_stack.push(request_ctx)
+    try:
+        return func()
+    finally:
+        if request_ctx is not None:
+            _request_ctx_stack.pop()
+        if app_ctx is not None:
+            _app_ctx_stack.pop()
+
+
 class NodeFileCollector(object):
 
     """A utility class for creating rubeus formatted node data"""
@@ -153,8 +175,12 @@ class NodeFileCollector(object):
         self.node = node
         self.auth = auth
         self.extra = kwargs
-        self.can_view = node.can_view(auth)
-        self.can_edit = node.can_edit(auth) and not node.is_registration
+        # Permissions of the user on the node and its components, resolved at
+        # once
+        self._subtree_permissions = node.resolve().get_subtree_permissions(getattr(auth, 'user', None))
+        # Node id -> (can view, can edit)
+        self._permissions = {}
+        self.can_view, self.can_edit = self._get_permissions(node)
 
     def to_hgrid(self):
         """Return the Rubeus.JS representation of the node's file data, including
@@ -163,18 +189,72 @@ class NodeFileCollector(object):
         root = self._serialize_node(self.node)
         return [root]
 
+    def to_hgrid_level(self, cursor=None, page_size=None):
+        """Return the Rubeus.JS representation of the node and one page of its
+        direct children. Components are not expanded; their ``fetch`` URL
+        returns their own first page.
+
+        :param str cursor: Cursor returned with the previous page, or None for
+            the first page, which also has the node's addon roots
+        :param int page_size: Maximum number of components in the page
+        :returns: dict with ``data``, the serialized node in a list, and
+            ``next``, the cursor of the next page or None
+        """
+        page_size = page_size or settings.RUBEUS_PAGE_SIZE
+        try:
+            start = int(cursor or 0)
+        except ValueError:
+            start = 0
+        ret = self._serialize_folder(self.node)
+        if not ret['permissions']['view']:
+            return {'data': [ret], 'next': None}
+
+        children = self._collect_addons(self.node) if not start else []
+        nodes = self.node.nodes
+        end = start
+        while end < len(nodes) and end - start < page_size:
+            child = nodes[end]
+            end += 1
+            if child.is_deleted:
+                continue
+            folder = self._serialize_folder(child)
+            folder['urls']['fetch'] = child.resolve().api_url_for('grid_data', lazy=True)
+            children.append(folder)
+        ret['children'] = children
+        return {'data': [ret], 'next': str(end) if end < len(nodes) else None}
+
+    def _get_permissions(self, node):
+        """Return whether the user can view and edit ``node``, computing them
+        once per node.
+        """
+        node_id = node.resolve()._id
+        try:
+            return self._permissions[node_id]
+        except KeyError:
+            pass
+        permissions = self._subtree_permissions.get(node_id, frozenset())
+        if getattr(getattr(self.auth, 'private_link', None), 'anonymous', False):
+            # Anonymous links only show the nodes they were made for
+            can_view = node.can_view(self.auth)
+        else:
+            can_view = READ in permissions or node.can_view(self.auth)
+        can_edit = can_view and (WRITE in permissions or node.can_edit(self.auth)) and not node.is_registration
+        self._permissions[node_id] = (can_view, can_edit)
+        return can_view, can_edit
+
     def _collect_components(self, node, visited):
         rv = []
         for child in node.nodes:
-            if child.resolve()._id not in visited and not child.is_deleted and node.can_view(self.auth):
-                visited.append(child.resolve()._id)
+            child_id = child.resolve()._id
+            if child_id not in visited and not child.is_deleted:
+                visited.add(child_id)
                 rv.append(self._serialize_node(child, visited=visited))
         return rv
 
     def _get_node_name(self, node):
         """Input node object, return the project name to be display.
         """
-        can_view = node.can_view(auth=self.auth)
+        can_view, _ = self._get_permissions(node)
 
         if can_view:
             node_name = sanitize.unescape_entities(node.title)
@@ -189,66 +269,91 @@ class NodeFileCollector(object):
 
         return node_name
 
-    def _serialize_node(self, node, visited=None):
-        """Returns the rubeus representation of a node folder.
+    def _serialize_folder(self, node):
+        """Returns the rubeus representation of a node folder, without its
+        children.
         """
-        visited = visited or []
-        visited.append(node.resolve()._id)
-        can_view = node.can_view(auth=self.auth)
-        if can_view:
-            children = self._collect_addons(node) + self._collect_components(node, visited)
-        else:
-            children = []
-
+        can_view, can_edit = self._get_permissions(node)
         return {
             # TODO: Remove safe_unescape_html when mako html safe comes in
             'name': self._get_node_name(node),
             'category': node.category,
             'kind': FOLDER,
             'permissions': {
-                'edit': node.can_edit(self.auth) and not node.is_registration,
+                'edit': can_edit,
                 'view': can_view,
             },
             'urls': {
                 'upload': None,
                 'fetch': None,
             },
-            'children': children,
+            'children': [],
             'isPointer': not node.primary,
             'isSmartFolder': False,
             'nodeType': node.project_or_component,
             'nodeID': node.resolve()._id,
         }
 
+    def _serialize_node(self, node, visited=None):
+        """Returns the rubeus representation of a node folder.
+        """
+        visited = visited if visited is not None else set()
+        visited.add(node.resolve()._id)
+        ret = self._serialize_folder(node)
+        if ret['permissions']['view']:
+            ret['children'] = self._collect_addons(node) + self._collect_components(node, visited)
+        return ret
+
     def _collect_addons(self, node):
+        """Fetch the hgrid data of the node's addons in parallel. An addon
+        that fails or takes longer than ``RUBEUS_ADDON_TIMEOUT`` seconds is
+        shown as unavailable.
+        """
+        addons = [addon for addon in node.get_addons() if addon.config.has_hgrid_files]
+        contexts = (_app_ctx_stack.top, _request_ctx_stack.top)
+        greenlets = [
+            gevent.spawn(_call_in_context, functools.partial(self._get_addon_data, addon), *contexts)
+            for addon in addons
+        ]
+        gevent.joinall(greenlets, timeout=settings.RUBEUS_ADDON_TIMEOUT)
+
         rv = []
-        for addon in node.get_addons():
-            if addon.config.has_hgrid_files:
-                # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
-                try:
-                    temp = addon.config.get_hgrid_data(addon, self.auth, **self.extra)
-                except Exception as e:
-                    logger.warn(
-                        getattr(
-                            e,
-                            'data',
-                            'Unexpected error when fetching file contents for {0}.'.format(addon.config.full_name)
-                        )
-                    )
-                    sentry.log_exception()
-                    rv.append({
-                        KIND: FOLDER,
-                        'unavailable': True,
-                        'iconUrl': addon.config.icon_url,
-                        'provider': addon.config.short_name,
-                        'addonFullname': addon.config.full_name,
-                        'permissions': {'view': False, 'edit': False},
-                        'name': '{} is currently unavailable'.format(addon.config.full_name),
-                    })
-                    continue
-                rv.extend(sort_by_name(temp) or [])
+        for addon, greenlet in zip(addons, greenlets):
+            if greenlet.ready():
+                rv.extend(greenlet.value)
+            else:
+                greenlet.kill(block=False)
+                logger.warn('Timed out fetching file contents for {0}.'.format(addon.config.full_name))
+                rv.append(self._unavailable_addon(addon))
         return rv
 
+    def _get_addon_data(self, addon):
+        # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
+        try:
+            temp = addon.config.get_hgrid_data(addon, self.auth, **self.extra)
+        except Exception as e:
+            logger.warn(
+                getattr(
+                    e,
+                    'data',
+                    'Unexpected error when fetching file contents for {0}.'.format(addon.config.full_name)
+                )
+            )
+            sentry.log_exception()
+            return [self._unavailable_addon(addon)]
+        return sort_by_name(temp) or []
+
+    def _unavailable_addon(self, addon):
+        return {
+            KIND: FOLDER,
+            'unavailable': True,
+            'iconUrl': addon.config.icon_url,
+            'provider': addon.config.short_name,
+            'addonFullname': addon.config.full_name,
+            'permissions': {'view': False, 'edit': False},
+            'name': '{} is currently unavailable'.format(addon.config.full_name),
+        }
+
 
 # TODO: these might belong in addons module
 def collect_addon_assets(node):
@@ -15,6 +15,7 @@ from framework.auth.core import User
 from framework.flask import redirect  # VOL-aware redirect
 from framework.routing import proxy_url
 from framework.exceptions import HTTPError
+from framework.mongo.utils import bulk_load, prefetch
 from framework.auth.forms import SignInForm
 from framework.forms import utils as form_utils
 from framework.auth.forms import RegistrationForm
@@ -147,12 +148,13 @@ def watched_logs_get(**kwargs):
             message_long='Invalid value for "size".'
         ))
 
-    total = sum(1 for x in user.get_recent_log_ids())
+    total = user.get_recent_log_count()
     paginated_logs, pages = paginate(user.get_recent_log_ids(), total, page, size)
-    logs = (model.NodeLog.load(id) for id in paginated_logs)
+    log_ids = list(paginated_logs)
+    logs = bulk_load(model.NodeLog, log_ids)
 
     return {
-        'logs': [serialize_log(log) for log in logs],
+        'logs': serialize_logs(logs[log_id] for log_id in log_ids if log_id in logs),
         'total': total,
         'pages': pages,
         'page': page
@@ -175,6 +177,20 @@ def serialize_log(node_log, auth=None, anonymous=False):
     }
 
 
+def serialize_logs(logs, auth=None, anonymous=False):
+    '''Return dictionary representations of ``logs``, loading their users,
+    nodes and contributors in batches.'''
+    logs = list(logs)
+    prefetch(logs, 'user', 'node', 'original_node')
+    bulk_load(User, (
+        contributor
+        for log in logs
+        for contributor in log.params.get('contributors', [])
+        if isinstance(contributor, basestring)
+    ))
+    return [serialize_log(log, auth=auth, anonymous=anonymous) for log in logs]
+
+
 def reproducibility():
     return redirect('/ezcuj/wiki')
 